@@ -1,48 +1,66 @@
-import json
+import hmac
 import logging
 # Fixing MIME types for static files under Windows
 import mimetypes
 import os
-
-import openai
-import requests
-
-from backend.utilities.employee_data.word_search import find_in_value, search_json
-from backend.utilities.orchestrator.LangChainAgent import LangChainAgent
-from eds_util import USER_DETAILS_KEYS, EXCLUSION_KEYS_1, EXCLUSION_KEYS_2, USER_KEYS_1, USER_KEYS_2
+import threading
+
+from backend.utilities.common.AdmissionController import AdmissionController, AdmissionRejected
+from backend.utilities.common.ConversationStore import ConversationStore
+from backend.utilities.common.SingleFlight import SingleFlight
+from backend.utilities.employee_data.word_search import search_json, is_manager_personal_info, is_user, \
+    is_user_details, answer_cache, get_employee_data
+from backend.utilities.helpers.EnvHelper import EnvHelper
+from backend.utilities.helpers.HttpSessionHelper import HttpSessionHelper
+from backend.utilities.helpers.JsonHelper import JsonHelper
+from backend.utilities.helpers.PromptBudgetHelper import PromptBudgetHelper
+from backend.utilities.orchestrator.IntentRouter import IntentRouter
+from backend.utilities.helpers.ServiceHelper import ServiceContainer
+from backend.utilities.helpers.StreamingHelper import STREAM_MODE_HEADER, DELTA_STREAM_MODE, is_delta_stream, \
+    to_chunk, new_data_stream_response, iter_data_stream_chunks, format_without_data_chunk, get_without_data_response, \
+    moderate_data_stream_line, get_moderated_data_lines, moderate_without_data_line, get_moderated_without_data_lines
+from backend.utilities.tools.ContentSafetyChecker import ContentSafetyChecker, StreamModerator
 
 mimetypes.add_type('application/javascript', '.js')
 mimetypes.add_type('text/css', '.css')
 
 from flask import Flask, Response, request, jsonify
+from flask.json.provider import JSONProvider
 from dotenv import load_dotenv
-from typing import List
-
-from langchain.prompts import ChatPromptTemplate
-from langchain.chat_models import ChatOpenAI
-from langchain.schema import BaseOutputParser
 
 load_dotenv()
 
-app = Flask(__name__)
-langchain_agent = LangChainAgent()
 
-class CommaSeparatedListOutputParser(BaseOutputParser[List[str]]):
-    """Parse the output of an LLM call to a comma-separated list."""
-    def parse(self, text: str) -> List[str]:
-        """Parse the output of an LLM call."""
-        return text.strip().split(", ")
+class JsonHelperProvider(JSONProvider):
+    """Serializes the jsonify responses and parses the request bodies with JsonHelper."""
 
-template = """
-Hello, I'm your virtual assistance.
-How can I help you?
-"""
-human_template = "{text}"
+    def dumps(self, obj, **kwargs):
+        return JsonHelper.dumps(obj)
+
+    def loads(self, s, **kwargs):
+        return JsonHelper.loads(s)
+
+
+app = Flask(__name__)
+app.json = JsonHelperProvider(app)
+# shared by every outbound call, including the openai SDK
+http_session = HttpSessionHelper.get_session()
+# config and orchestrator shared by the custom conversations, rebuilt when the active config changes
+services = ServiceContainer(check_interval=EnvHelper().CONFIG_CHECK_INTERVAL)
+# identical conversations in flight share one upstream call, off unless REQUEST_COALESCING is true
+single_flight = SingleFlight(enabled=os.environ.get("REQUEST_COALESCING", "false").lower() == "true")
+# paces the upstream chat calls to the quota of their deployment
+admission_controller = AdmissionController.from_env(EnvHelper())
+# history of the conversations whose clients send only the new message
+conversation_store = ConversationStore.from_env(EnvHelper())
+# keeps the history sent to the model within PROMPT_HISTORY_MAX_TOKENS
+prompt_budget_helper = PromptBudgetHelper(admission_controller=admission_controller)
+# checks the streamed answers in sentence windows while they are generated, CONTENT_SAFETY_STREAMING
+content_safety_checker = ContentSafetyChecker() if EnvHelper().CONTENT_SAFETY_STREAMING else None
+# tokens of the conversation a prompt carries: the summary of the older turns, the recent turns and the question
+PROMPT_TOKENS_HEADER = 'X-Prompt-Tokens'
+RELOAD_TOKEN_HEADER = 'X-Reload-Token'
 
-chat_prompt = ChatPromptTemplate.from_messages([
-    ("system", template),
-    ("human", human_template),
-])
 
 @app.route("/", defaults={"path": "index.html"})
 @app.route("/<path:path>")
@@ -79,6 +97,7 @@ AZURE_OPENAI_MODEL_NAME = os.environ.get("AZURE_OPENAI_MODEL_NAME",
                                          "gpt-35-turbo")  # Name of the model, e.g. 'gpt-35-turbo' or 'gpt-4'
 
 SHOULD_STREAM = True if AZURE_OPENAI_STREAM.lower() == "true" else False
+CHAT_WITH_DATA_ENDPOINT = f"https://{AZURE_OPENAI_RESOURCE}.openai.azure.com/openai/deployments/{AZURE_OPENAI_MODEL}/extensions/chat/completions?api-version={AZURE_OPENAI_API_VERSION}"
 
 
 def is_chat_model():
@@ -93,8 +112,7 @@ def should_use_data():
     return False
 
 
-def prepare_body_headers_with_data(request):
-    request_messages = request.json["messages"]
+def prepare_body_headers_with_data(request_messages):
     body = {
         "messages": request_messages,
         "temperature": AZURE_OPENAI_TEMPERATURE,
@@ -142,59 +160,100 @@ def prepare_body_headers_with_data(request):
     return body, headers
 
 
-def stream_with_data(body, headers, endpoint, emp_data=None):
-    s = requests.Session()
-    response = {
-        "id": "",
-        "model": "",
-        "created": 0,
-        "object": "",
-        "choices": [{
-            "messages": []
-        }]
-    }
-    try:
-        # Added this block of code to resolve 400 - validation error.
-        if 'stop' in body and not body.get('stop'):
-            del body['stop']
-
-        with s.post(endpoint, json=body, headers=headers, stream=True) as r:
-            for line in r.iter_lines(chunk_size=10):
-                if line:
-                    lineJson = json.loads(line.lstrip(b'data:').decode('utf-8'))
-                    # print(f'Print response: {lineJson}')
-                    if 'error' in lineJson:
-                        yield json.dumps(lineJson).replace("\n", "\\n") + "\n"
-                    response["id"] = lineJson["id"]
-                    response["model"] = lineJson["model"]
-                    response["created"] = lineJson["created"]
-                    response["object"] = lineJson["object"]
-
-                    role = lineJson["choices"][0]["messages"][0]["delta"].get("role")
-                    if role == "tool":
-                        response["choices"][0]["messages"].append(lineJson["choices"][0]["messages"][0]["delta"])
-                    elif role == "assistant":
-                        print_msg = ""
-                        if emp_data:
-                            print_msg = f"As per the available data, {emp_data} \n\n"
-                        response["choices"][0]["messages"].append({
-                            "role": "assistant",
-                            "content": f"{print_msg}"
-                        })
-                    else:
-                        deltaText = lineJson["choices"][0]["messages"][0]["delta"]["content"]
-                        if deltaText != "[DONE]":
-                            response["choices"][0]["messages"][1]["content"] += deltaText
+def get_coalescing_key(kind, request_messages, **context):
+    """
+    Conversations with the same messages share the key, and so their upstream call. Only the leading and
+    trailing whitespace of a message is ignored, anything else may change the answer.
+    """
+    messages = tuple((m.get('role'), str(m.get('content', '')).strip()) for m in request_messages)
+    return kind, messages, JsonHelper.dumps(context) if context else None
+
+
+def get_conversation_messages(request_json, employee_number=None):
+    """
+    The messages of the conversation so far, the stored ones when the client sent only the new message.
+    A conversation of an employee is stored for that employee number only.
+    """
+    return conversation_store.get_messages(request_json.get("conversation_id"), request_json["messages"],
+                                           employee_number)
+
+
+def saving_reply(request_json, messages, employee_number=None):
+    """Returns the callback storing the conversation once the reply messages to its last message are known."""
+    return lambda reply_messages: conversation_store.save(request_json.get("conversation_id"), messages,
+                                                          reply_messages, employee_number)
+
+
+def get_prompt_headers(budget, headers=None):
+    headers = dict(headers or {})
+    if budget is not None:
+        headers[PROMPT_TOKENS_HEADER] = str(budget.prompt_tokens)
+    return headers
+
+
+def admitted(fn, *args, **kwargs):
+    """Calls fn once the admission controller lets a call to the chat deployment through."""
+    admission_controller.admit(AZURE_OPENAI_MODEL)
+    return fn(*args, **kwargs)
+
+
+def admission_rejected_response(e):
+    return jsonify({"error": str(e)}), 429, {"Retry-After": e.get_retry_after_header()}
+
+
+def iter_upstream_lines(body, headers, endpoint):
+    with http_session.post(endpoint, json=body, headers=headers, stream=True) as r:
+        for line in r.iter_lines(chunk_size=10):
+            if line:
+                yield line
+
+
+def open_with_data_stream(body, headers, endpoint):
+    """
+    Opens the upstream lines shared by the identical conversations in flight. Only the call that opens them
+    goes through admission, before the response starts, so a rejection is still answered with a 429.
+    """
+    # Added this block of code to resolve 400 - validation error.
+    if 'stop' in body and not body.get('stop'):
+        del body['stop']
+
+    return single_flight.stream(get_coalescing_key('with_data', body['messages']),
+                                lambda: admitted(iter_upstream_lines, body, headers, endpoint))
+
 
-                    yield json.dumps(response).replace("\n", "\\n") + "\n"
+def get_stream_moderator():
+    """A StreamModerator for a streamed answer, None when streaming moderation is off."""
+    return content_safety_checker.moderate_stream() if content_safety_checker else None
+
+
+def stream_with_data(lines, emp_data=None, delta=False, on_reply=None, moderator=None):
+    response = new_data_stream_response()
+    try:
+        # every request frames the shared upstream lines into its own response
+        for line in lines:
+            for framed in moderate_data_stream_line(line, moderator) if moderator else (line,):
+                yield from iter_data_stream_chunks(framed, response, emp_data, delta)
+        if moderator:
+            for framed in get_moderated_data_lines(response, moderator.close(), moderator):
+                yield from iter_data_stream_chunks(framed, response, emp_data, delta)
+        if delta:
+            # the consolidated response closes a delta stream
+            yield to_chunk(response)
+        if on_reply:
+            on_reply(response["choices"][0]["messages"])
     except Exception as e:
-        yield json.dumps({"error": str(e)}).replace("\n", "\\n") + "\n"
+        yield to_chunk({"error": str(e)})
 
 
-def stream_static_content_data(result):
+def get_static_content_message(result):
     print_msg = "No data found for requested information or you do not have access to the data."
     if result:
         print_msg = f"As per the available data, {result} \n\n"
+    return print_msg
+
+
+def stream_static_content_data(result):
+    print_msg = get_static_content_message(result)
     response = {
         "id": "e7d687d1-50ac-4d63-a782-5b3d755380d6",
         "model": "gpt-35-turbo-16k",
@@ -211,13 +270,11 @@ def stream_static_content_data(result):
             }
         ]
     }
-    return json.dumps(response).replace("\n", "\\n")
+    return JsonHelper.dumps(response)
 
 
-def conversation_with_data(request, employee_number=None):
-    # Search json
-    emp_data = ''
-    request_messages = request.json["messages"]
+def get_employee_data_result(request_messages, employee_number=None):
+    """Returns the answer to the last message when it is answered from employee data alone, otherwise None."""
     _query = request_messages[-1].get('content')
     _search_words = [w.strip().lower() for w in _query.split()]
 
@@ -246,7 +303,7 @@ def conversation_with_data(request, employee_number=None):
                 else:
                     _result = f"{first_val.strip()}, {', '.join(search_results[1:-1])} and {search_results[-1].strip()}"
                 # Added by Datta
-                return Response(stream_static_content_data(_result.strip()), mimetype='text/event-stream')
+                return _result.strip()
 
             # if find_in_value(USER_DETAILS_KEYS, _search_words):
             #     emp_data = _result
@@ -261,68 +318,70 @@ def conversation_with_data(request, employee_number=None):
             #     request_messages[-1].update({'content': open_ai_message.format(text=text)})
             # else:
             #     return Response(stream_static_content_data(_result.strip()), mimetype='text/event-stream')
+    return None
+
+
+def conversation_with_data(request, employee_number=None):
+    # Search json
+    emp_data = ''
+    request_messages = get_conversation_messages(request.json, employee_number)
+    save_reply = saving_reply(request.json, request_messages, employee_number)
+    employee_data_result = get_employee_data_result(request_messages, employee_number)
+    if employee_data_result is not None:
+        save_reply([{"role": "assistant", "content": get_static_content_message(employee_data_result)}])
+        return Response(stream_static_content_data(employee_data_result), mimetype='text/event-stream')
 
-    body, headers = prepare_body_headers_with_data(request)
-    endpoint = f"https://{AZURE_OPENAI_RESOURCE}.openai.azure.com/openai/deployments/{AZURE_OPENAI_MODEL}/extensions/chat/completions?api-version={AZURE_OPENAI_API_VERSION}"
+    body, headers = prepare_body_headers_with_data(request_messages)
+    endpoint = CHAT_WITH_DATA_ENDPOINT
 
     if not SHOULD_STREAM:
-        r = requests.post(endpoint, headers=headers, json=body)
-        status_code = r.status_code
-        r = r.json()
+        def post():
+            r = http_session.post(endpoint, headers=headers, json=body)
+            return r.status_code, JsonHelper.loads(r.content)
 
-        return Response(json.dumps(r).replace("\n", "\\n"), status=status_code)
+        status_code, r = single_flight.do(get_coalescing_key('with_data', request_messages),
+                                          lambda: admitted(post))
+        if status_code == 200:
+            save_reply(r["choices"][0].get("messages", []))
+
+        return Response(JsonHelper.dumps(r), status=status_code)
     else:
         if request.method == "POST":
-            return Response(stream_with_data(body, headers, endpoint, emp_data), mimetype='text/event-stream')
+            lines = open_with_data_stream(body, headers, endpoint)
+            if is_delta_stream(request.headers):
+                return Response(stream_with_data(lines, emp_data, delta=True, on_reply=save_reply,
+                                                 moderator=get_stream_moderator()),
+                                mimetype='text/event-stream', headers={STREAM_MODE_HEADER: DELTA_STREAM_MODE})
+            return Response(stream_with_data(lines, emp_data, on_reply=save_reply, moderator=get_stream_moderator()),
+                            mimetype='text/event-stream')
         else:
             return Response(None, mimetype='text/event-stream')
 
 
-def is_manager_personal_info(_search_words):
-    return len(find_in_value(EXCLUSION_KEYS_1, _search_words)) > 1 and len(
-        find_in_value(EXCLUSION_KEYS_2, _search_words)) > 0
-
-
-def is_user(query, _search_words):
-    if len(find_in_value(USER_KEYS_1, _search_words)) > 0:
-        return True
-    else:
-        for key in USER_KEYS_2:
-            if key.lower() in query.lower():
-                return True
-
-    return False
-
-
-def stream_without_data(response):
+def stream_without_data(response, delta=False, on_reply=None, moderator=None):
     response_text = ""
+    line = None
     for line in response:
-        delta_text = line["choices"][0]["delta"].get('content')
-        if delta_text and delta_text != "[DONE]":
-            response_text += delta_text
-
-        response_obj = {
-            "id": line["id"],
-            "model": line["model"],
-            "created": line["created"],
-            "object": line["object"],
-            "choices": [{
-                "messages": [{
-                    "role": "assistant",
-                    "content": response_text
-                }]
-            }]
-        }
-        yield json.dumps(response_obj).replace("\n", "\\n") + "\n"
-
-
-def conversation_without_data(request):
-    openai.api_type = "azure"
-    openai.api_base = f"https://{AZURE_OPENAI_RESOURCE}.openai.azure.com/"
-    openai.api_version = "2023-03-15-preview"
-    openai.api_key = AZURE_OPENAI_KEY
-
-    request_messages = request.json["messages"]
+        for framed in moderate_without_data_line(line, moderator) if moderator else (line,):
+            response_text, chunk = format_without_data_chunk(framed, response_text, delta)
+            if chunk:
+                yield chunk
+    if moderator and line is not None:
+        for framed in get_moderated_without_data_lines(line, moderator.close(), moderator):
+            response_text, chunk = format_without_data_chunk(framed, response_text, delta)
+            yield chunk
+    if delta and line is not None:
+        yield to_chunk(get_without_data_response(line, response_text))
+    if on_reply:
+        on_reply([{"role": "assistant", "content": response_text}])
+
+
+def prepare_chat_completion_without_data(request_messages):
+    """
+    Returns the ChatCompletion arguments for the conversation, with its history fitted to the prompt budget,
+    and the PromptBudget. The Azure OpenAI endpoint and key are part of the arguments, the openai globals are
+    shared by the threads of a worker and are not written per request. Blocks while older turns are summarized.
+    """
     messages = [
         {
             "role": "system",
@@ -330,13 +389,14 @@ def conversation_without_data(request):
         }
     ]
 
-    for message in request_messages:
-        messages.append({
-            "role": message["role"],
-            "content": message["content"]
-        })
+    fitted_messages, budget = prompt_budget_helper.fit_messages(request_messages)
+    messages += fitted_messages
 
-    response = openai.ChatCompletion.create(
+    return dict(
+        api_type="azure",
+        api_base=f"https://{AZURE_OPENAI_RESOURCE}.openai.azure.com/",
+        api_version="2023-03-15-preview",
+        api_key=AZURE_OPENAI_KEY,
         engine=AZURE_OPENAI_MODEL,
         messages=messages,
         temperature=float(AZURE_OPENAI_TEMPERATURE),
@@ -344,26 +404,46 @@ def conversation_without_data(request):
         top_p=float(AZURE_OPENAI_TOP_P),
         stop=AZURE_OPENAI_STOP_SEQUENCE.split("|") if AZURE_OPENAI_STOP_SEQUENCE else None,
         stream=SHOULD_STREAM
-    )
+    ), budget
 
-    if not SHOULD_STREAM:
-        response_obj = {
-            "id": response,
-            "model": response.model,
-            "created": response.created,
-            "object": response.object,
-            "choices": [{
-                "messages": [{
-                    "role": "assistant",
-                    "content": response.choices[0].message.content
-                }]
+
+def format_without_data_response(response):
+    return {
+        "id": response,
+        "model": response.model,
+        "created": response.created,
+        "object": response.object,
+        "choices": [{
+            "messages": [{
+                "role": "assistant",
+                "content": response.choices[0].message.content
             }]
-        }
+        }]
+    }
+
 
-        return jsonify(response_obj), 200
+def conversation_without_data(request):
+    request_messages = get_conversation_messages(request.json)
+    save_reply = saving_reply(request.json, request_messages)
+    message_kwargs, budget = prepare_chat_completion_without_data(request_messages)
+    create_chat_completion = HttpSessionHelper.get_openai().ChatCompletion.create
+    key = get_coalescing_key('without_data', request_messages)
+
+    if not SHOULD_STREAM:
+        response = format_without_data_response(
+            single_flight.do(key, lambda: admitted(create_chat_completion, **message_kwargs)))
+        save_reply(response["choices"][0]["messages"])
+        return jsonify(response), 200, get_prompt_headers(budget)
     else:
         if request.method == "POST":
-            return Response(stream_without_data(response), mimetype='text/event-stream')
+            response = single_flight.stream(key, lambda: admitted(create_chat_completion, **message_kwargs))
+            if is_delta_stream(request.headers):
+                return Response(stream_without_data(response, delta=True, on_reply=save_reply,
+                                                    moderator=get_stream_moderator()),
+                                mimetype='text/event-stream',
+                                headers=get_prompt_headers(budget, {STREAM_MODE_HEADER: DELTA_STREAM_MODE}))
+            return Response(stream_without_data(response, on_reply=save_reply, moderator=get_stream_moderator()),
+                            mimetype='text/event-stream', headers=get_prompt_headers(budget))
         else:
             return Response(None, mimetype='text/event-stream')
 
@@ -376,11 +456,99 @@ def conversation_azure_byod():
             return conversation_with_data(request)
         else:
             return conversation_without_data(request)
+    except AdmissionRejected as e:
+        return admission_rejected_response(e)
     except Exception as e:
         logging.exception("Exception in /api/conversation/azure_byod")
         return jsonify({"error": str(e)}), 500
 
 
+def prepare_custom_conversation(messages, conversation_id, employee_number):
+    """
+    Searches employee data for the last message of a custom conversation. Returns the answer and None when it
+    comes from employee data alone, otherwise None and the arguments of Orchestrator.handle_message.
+    """
+    user_message = messages[-1]['content']
+    _search_words = [w.strip().lower() for w in user_message.split()]
+    employee_data = {'original_user_message': user_message}
+    if not is_manager_personal_info(_search_words) and is_user(user_message, _search_words):
+        search_dicts = search_json(user_message, employee_number)
+        if search_dicts:
+            search_results = []
+            search_values = []
+            questions_to_search_engine = []
+            open_ai_message = 'find more information for '
+            for d in search_dicts:
+                for key, value in d.items():
+                    if 'description' == key:
+                        search_results.append(value)
+                        if 'messageToOpenAI' not in d:
+                            open_ai_message = f"{open_ai_message}, {value} and"
+                    elif 'messageToOpenAI' == key:
+                        open_ai_message = value
+                    elif 'keywords' != key and 'score' != key and 'isResponseMultiple' != key:
+                        search_values.append(value)
+                        questions_to_search_engine.append(f"What are the details of {value}?")
+
+            if len(questions_to_search_engine) > 1:
+                employee_data['questions_to_search_engine'] = questions_to_search_engine
+
+            _result = ''
+            if len(search_results) >= 1:
+                first_val = str(search_results[0])
+                if len(search_results) == 1:
+                    _result = first_val
+                else:
+                    _result = f"{first_val.strip()}, {', '.join(search_results[1:-1])} and {search_results[-1].strip()}"
+
+            if is_user_details(_search_words):
+                employee_data['employee_data'] = _result.strip()
+                # emp_data = _result
+                text = ''
+                if len(search_values) >= 1:
+                    f_val = str(search_values[0])
+                    if len(search_values) == 1:
+                        text = f_val
+                    else:
+                        search_values = [s for s in search_values if type(s) is not dict]
+                        text = f"{f_val.strip()}, {', '.join(search_values[1:-1])} and {search_values[-1].strip()}"
+                # request_messages[-1].update({'content': open_ai_message.format(text=text)})
+                if text:
+                    user_message = open_ai_message.format(text=text)
+            else:
+                return _result.strip(), None
+
+    chat_history = ConversationStore.get_chat_history(messages[0:-1])
+    return None, dict(user_message=user_message, chat_history=chat_history, conversation_id=conversation_id,
+                      **employee_data)
+
+
+def handle_custom_message(message_kwargs):
+    """Returns the answer messages and the PromptBudget the orchestrator fitted the chat history to."""
+    messages = services.handle_message(**message_kwargs)
+    return messages, services.get_orchestrator().prompt_budget
+
+
+def get_custom_conversation_response(message_kwargs):
+    """Returns the response to a custom conversation and the PromptBudget of its prompt."""
+    context = {k: v for k, v in message_kwargs.items() if k not in ('user_message', 'chat_history', 'conversation_id')}
+    request_messages = [{'role': role, 'content': content} for pair in message_kwargs['chat_history']
+                        for role, content in zip(('user', 'assistant'), pair)]
+    request_messages.append({'role': 'user', 'content': message_kwargs['user_message']})
+    messages, budget = single_flight.do(get_coalescing_key('custom', request_messages, **context),
+                                        lambda: admitted(handle_custom_message, message_kwargs))
+
+    return {
+        "id": "response.id",
+        "model": os.getenv("AZURE_OPENAI_MODEL"),
+        "created": "response.created",
+        "object": "response.object",
+        "choices": [{
+            "messages": messages
+        }]
+    }, budget
+
+
 @app.route("/api/conversation/custom/<employee_number>", methods=["GET", "POST"])
 def conversation_custom(employee_number):
     # try:
@@ -391,90 +559,111 @@ def conversation_custom(employee_number):
     #     logging.exception("Exception in /api/conversation/azure_byod")
     #     return jsonify({"error": str(e)}), 500
 
-    from backend.utilities.helpers.OrchestratorHelper import Orchestrator
-    message_orchestrator = Orchestrator()
-
     try:
-        user_message = request.json["messages"][-1]['content']
-        _search_words = [w.strip().lower() for w in user_message.split()]
-        employee_data = {'original_user_message': user_message}
-        if not is_manager_personal_info(_search_words) and is_user(user_message, _search_words):
-            search_dicts = search_json(user_message, employee_number)
-            if search_dicts:
-                search_results = []
-                search_values = []
-                questions_to_search_engine = []
-                open_ai_message = 'find more information for '
-                for d in search_dicts:
-                    for key, value in d.items():
-                        if 'description' == key:
-                            search_results.append(value)
-                            if 'messageToOpenAI' not in d:
-                                open_ai_message = f"{open_ai_message}, {value} and"
-                        elif 'messageToOpenAI' == key:
-                            open_ai_message = value
-                        elif 'keywords' != key and 'score' != key and 'isResponseMultiple' != key:
-                            search_values.append(value)
-                            questions_to_search_engine.append(f"What are the details of {value}?")
-
-                if len(questions_to_search_engine) > 1:
-                    employee_data['questions_to_search_engine'] = questions_to_search_engine
-
-                _result = ''
-                if len(search_results) >= 1:
-                    first_val = str(search_results[0])
-                    if len(search_results) == 1:
-                        _result = first_val
-                    else:
-                        _result = f"{first_val.strip()}, {', '.join(search_results[1:-1])} and {search_results[-1].strip()}"
-
-                if find_in_value(USER_DETAILS_KEYS, _search_words):
-                    employee_data['employee_data'] = _result.strip()
-                    # emp_data = _result
-                    text = ''
-                    if len(search_values) >= 1:
-                        f_val = str(search_values[0])
-                        if len(search_values) == 1:
-                            text = f_val
-                        else:
-                            search_values = [s for s in search_values if type(s) is not dict]
-                            text = f"{f_val.strip()}, {', '.join(search_values[1:-1])} and {search_values[-1].strip()}"
-                    # request_messages[-1].update({'content': open_ai_message.format(text=text)})
-                    if text:
-                        user_message = open_ai_message.format(text=text)
-                else:
-                    return Response(stream_static_content_data(_result.strip()), mimetype='text/event-stream')
-
-        conversation_id = request.json["conversation_id"]
-        user_assistant_messages = list(
-            filter(lambda x: x['role'] in ('user', 'assistant'), request.json["messages"][0:-1]))
-        chat_history = []
-        for i, k in enumerate(user_assistant_messages):
-            if i % 2 == 0:
-                chat_history.append((user_assistant_messages[i]['content'], user_assistant_messages[i + 1]['content']))
-        from backend.utilities.helpers.ConfigHelper import ConfigHelper
-
-        messages = message_orchestrator.handle_message(user_message=user_message, chat_history=chat_history,
-                                                       conversation_id=conversation_id,
-                                                       orchestrator=ConfigHelper.get_active_config_or_default().orchestrator,
-                                                       **employee_data)
-
-        response_obj = {
-            "id": "response.id",
-            "model": os.getenv("AZURE_OPENAI_MODEL"),
-            "created": "response.created",
-            "object": "response.object",
-            "choices": [{
-                "messages": messages
-            }]
-        }
+        messages = get_conversation_messages(request.json, employee_number)
+        save_reply = saving_reply(request.json, messages, employee_number)
+        static_result, message_kwargs = prepare_custom_conversation(messages, request.json["conversation_id"],
+                                                                    employee_number)
+        if static_result is not None:
+            save_reply([{"role": "assistant", "content": get_static_content_message(static_result)}])
+            return Response(stream_static_content_data(static_result), mimetype='text/event-stream')
+
+        response, budget = get_custom_conversation_response(message_kwargs)
+        save_reply(response["choices"][0]["messages"])
+        return jsonify(response), 200, get_prompt_headers(budget)
+
+    except AdmissionRejected as e:
+        return admission_rejected_response(e)
+    except Exception as e:
+        logging.exception("Exception in /api/conversation/custom")
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/api/metrics", methods=["GET"])
+def metrics():
+    return jsonify({'answer_cache': answer_cache.stats(), 'http_pool': HttpSessionHelper.get_stats(),
+                    'services': services.get_stats(), 'coalescing': single_flight.get_stats(),
+                    'admission': admission_controller.get_stats(),
+                    'conversations': conversation_store.get_stats(),
+                    'prompt_budget': PromptBudgetHelper.get_stats(),
+                    'intent_router': IntentRouter.get_stats(),
+                    'stream_moderation': StreamModerator.get_stats()}), 200
+
+
+def is_reload_authorized(headers):
+    """
+    /api/config/reload rebuilds the services of the worker process that serves it, the other workers pick up a
+    new config at their next CONFIG_CHECK_INTERVAL check. It takes CONFIG_RELOAD_TOKEN in the X-Reload-Token
+    header and is disabled while no token is set.
+    """
+    token = EnvHelper().CONFIG_RELOAD_TOKEN
+    return bool(token) and hmac.compare_digest(headers.get(RELOAD_TOKEN_HEADER, ''), token)
 
-        return jsonify(response_obj), 200
 
+@app.route("/api/config/reload", methods=["POST"])
+def reload_config():
+    if not is_reload_authorized(request.headers):
+        return jsonify({"error": "Forbidden"}), 403
+    try:
+        return jsonify(services.reload()), 200
     except Exception as e:
-        logging.exception("Exception in /api/conversation/custom")
+        logging.exception("Exception in /api/config/reload")
         return jsonify({"error": str(e)}), 500
 
 
+def warm_up_employee_data():
+    try:
+        get_employee_data()
+    except Exception:
+        # the first search loads it again and reports the error
+        logging.exception("Exception while loading the employee data")
+
+
+def warm_up_in_background():
+    """Loads the employee data and builds the services while the server already answers."""
+    threading.Thread(target=warm_up_employee_data, name='employee-data-warm-up', daemon=True).start()
+    return services.warm_up_in_background()
+
+
+def warm_up_uwsgi_worker():
+    """Warms up every uwsgi worker in the background as soon as it starts."""
+    try:
+        import uwsgi
+        from uwsgidecorators import postfork
+    except ImportError:
+        return
+    if uwsgi.worker_id() > 0:
+        # lazy-apps, the app is loaded by the worker itself
+        warm_up_in_background()
+    else:
+        postfork(warm_up_in_background)
+
+
+warm_up_uwsgi_worker()
+
+
 if __name__ == "__main__":
-    app.run()
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description='Runs the chat web app.')
+    parser.add_argument('--mode', choices=['wsgi', 'asgi'], default=os.getenv('SERVER_MODE', 'wsgi'),
+                        help='wsgi runs this Flask app, asgi the asyncio app of asgi_app.py')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--profile-startup', action='store_true',
+                        help='prints the import and construction time breakdown of the app instead of running it')
+    args = parser.parse_args()
+    if args.profile_startup:
+        from backend.utilities.common.StartupProfiler import StartupProfiler
+        print(StartupProfiler('app', warm_up='services.warm_up', cwd=os.path.dirname(os.path.abspath(__file__)))
+              .get_report())
+    elif args.mode == 'asgi':
+        import uvicorn
+        # asgi_app imports this module as app, reuse it instead of initializing it a second time
+        sys.modules['app'] = sys.modules['__main__']
+        from asgi_app import app as asgi_app
+        uvicorn.run(asgi_app, host=args.host, port=args.port)
+    else:
+        warm_up_in_background()
+        app.run(host=args.host, port=args.port)
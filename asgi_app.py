@@ -0,0 +1,254 @@
+"""
+Asyncio serving mode of app.py. The chat endpoints keep the request and response format of the Flask app,
+but the upstream Azure OpenAI stream is proxied with aiohttp on the event loop, so a stream does not hold a
+worker thread and one process can serve thousands of concurrent streams.
+The blocking work of a request runs on the threadpool: the conversation store, the employee data search, the
+prompt fitting and the custom conversation orchestrators.
+
+    python app.py --mode asgi [--host 0.0.0.0 --port 80]
+    uvicorn asgi_app:app
+"""
+import contextlib
+import inspect
+import logging
+
+import openai
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route
+from starlette.staticfiles import StaticFiles
+
+import app as wsgi_app
+from backend.utilities.common.AdmissionController import AdmissionRejected
+from backend.utilities.helpers.AsyncHttpSessionHelper import AsyncHttpSessionHelper
+from backend.utilities.helpers.HttpSessionHelper import HttpSessionHelper
+from backend.utilities.helpers.JsonHelper import JsonHelper
+from backend.utilities.helpers.StreamingHelper import STREAM_MODE_HEADER, DELTA_STREAM_MODE, is_delta_stream, \
+    to_chunk, new_data_stream_response, iter_data_stream_chunks, format_without_data_chunk, get_without_data_response, \
+    moderate_data_stream_line, get_moderated_data_lines, moderate_without_data_line, get_moderated_without_data_lines
+from eds_util import PROJECT_ROOT_DIR
+
+EVENT_STREAM = 'text/event-stream'
+http_session = AsyncHttpSessionHelper()
+
+
+class JsonHelperResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return JsonHelper.dumpb(content)
+
+
+async def iter_upstream_lines(body, headers, endpoint):
+    async with http_session.post(endpoint, json=body, headers=headers) as r:
+        async for line in http_session.iter_lines(r):
+            if line:
+                yield line
+
+
+def saving_reply(request_json, messages, employee_number=None):
+    """app.saving_reply for the event loop, the conversation is stored on the threadpool."""
+    save_reply = wsgi_app.saving_reply(request_json, messages, employee_number)
+    return lambda reply_messages: run_in_threadpool(save_reply, reply_messages)
+
+
+async def admitted(fn, *args, **kwargs):
+    """Awaits fn once the admission controller lets a call to the chat deployment through."""
+    await wsgi_app.admission_controller.aadmit(wsgi_app.AZURE_OPENAI_MODEL)
+    result = fn(*args, **kwargs)
+    return await result if inspect.isawaitable(result) else result
+
+
+def admission_rejected_response(e):
+    return JsonHelperResponse({"error": str(e)}, status_code=429, headers={"Retry-After": e.get_retry_after_header()})
+
+
+async def open_with_data_stream(body, headers, endpoint):
+    # Added this block of code to resolve 400 - validation error.
+    if 'stop' in body and not body.get('stop'):
+        del body['stop']
+
+    return await wsgi_app.single_flight.astream(wsgi_app.get_coalescing_key('with_data', body['messages']),
+                                                lambda: admitted(iter_upstream_lines, body, headers, endpoint))
+
+
+async def stream_with_data(lines, emp_data=None, delta=False, on_reply=None, moderator=None):
+    response = new_data_stream_response()
+    try:
+        async for line in lines:
+            for framed in moderate_data_stream_line(line, moderator) if moderator else (line,):
+                for chunk in iter_data_stream_chunks(framed, response, emp_data, delta):
+                    yield chunk
+        if moderator:
+            for framed in get_moderated_data_lines(response, await moderator.aclose(), moderator):
+                for chunk in iter_data_stream_chunks(framed, response, emp_data, delta):
+                    yield chunk
+        if delta:
+            # the consolidated response closes a delta stream
+            yield to_chunk(response)
+        if on_reply:
+            await on_reply(response["choices"][0]["messages"])
+    except Exception as e:
+        yield to_chunk({"error": str(e)})
+
+
+async def stream_without_data(response, delta=False, on_reply=None, moderator=None):
+    response_text = ""
+    line = None
+    async for line in response:
+        for framed in moderate_without_data_line(line, moderator) if moderator else (line,):
+            response_text, chunk = format_without_data_chunk(framed, response_text, delta)
+            if chunk:
+                yield chunk
+    if moderator and line is not None:
+        for framed in get_moderated_without_data_lines(line, await moderator.aclose(), moderator):
+            response_text, chunk = format_without_data_chunk(framed, response_text, delta)
+            yield chunk
+    if delta and line is not None:
+        yield to_chunk(get_without_data_response(line, response_text))
+    if on_reply:
+        await on_reply([{"role": "assistant", "content": response_text}])
+
+
+def stream_response(body_iterator, delta, headers=None):
+    headers = {**(headers or {}), STREAM_MODE_HEADER: DELTA_STREAM_MODE} if delta else headers
+    return StreamingResponse(body_iterator, media_type=EVENT_STREAM, headers=headers)
+
+
+async def conversation_with_data(request_json, method, delta=False, employee_number=None):
+    emp_data = ''
+    request_messages = await run_in_threadpool(wsgi_app.get_conversation_messages, request_json, employee_number)
+    save_reply = saving_reply(request_json, request_messages, employee_number)
+    employee_data_result = await run_in_threadpool(wsgi_app.get_employee_data_result, request_messages,
+                                                   employee_number)
+    if employee_data_result is not None:
+        await save_reply([{"role": "assistant", "content": wsgi_app.get_static_content_message(employee_data_result)}])
+        return Response(wsgi_app.stream_static_content_data(employee_data_result), media_type=EVENT_STREAM)
+
+    body, headers = wsgi_app.prepare_body_headers_with_data(request_messages)
+    endpoint = wsgi_app.CHAT_WITH_DATA_ENDPOINT
+
+    if not wsgi_app.SHOULD_STREAM:
+        async def post():
+            async with http_session.post(endpoint, headers=headers, json=body) as r:
+                return r.status, JsonHelper.loads(await r.read())
+
+        status_code, r = await wsgi_app.single_flight.ado(wsgi_app.get_coalescing_key('with_data', request_messages),
+                                                          lambda: admitted(post))
+        if status_code == 200:
+            await save_reply(r["choices"][0].get("messages", []))
+
+        return Response(JsonHelper.dumps(r), status_code=status_code, media_type='text/html')
+    else:
+        if method == "POST":
+            lines = await open_with_data_stream(body, headers, endpoint)
+            return stream_response(stream_with_data(lines, emp_data, delta, on_reply=save_reply,
+                                                    moderator=wsgi_app.get_stream_moderator()), delta)
+        else:
+            return Response(None, media_type=EVENT_STREAM)
+
+
+async def conversation_without_data(request_json, method, delta=False):
+    openai.aiosession.set(http_session.session)
+    request_messages = await run_in_threadpool(wsgi_app.get_conversation_messages, request_json)
+    save_reply = saving_reply(request_json, request_messages)
+    # fitting the history to the prompt budget may summarize it with a blocking LLM call
+    message_kwargs, budget = await run_in_threadpool(wsgi_app.prepare_chat_completion_without_data, request_messages)
+    key = wsgi_app.get_coalescing_key('without_data', request_messages)
+
+    if not wsgi_app.SHOULD_STREAM:
+        response = wsgi_app.format_without_data_response(
+            await wsgi_app.single_flight.ado(key, lambda: admitted(http_session.retry, openai.ChatCompletion.acreate,
+                                                                   **message_kwargs)))
+        await save_reply(response["choices"][0]["messages"])
+        return JsonHelperResponse(response, headers=wsgi_app.get_prompt_headers(budget))
+    else:
+        if method == "POST":
+            response = await wsgi_app.single_flight.astream(key, lambda: admitted(http_session.retry,
+                                                                                  openai.ChatCompletion.acreate,
+                                                                                  **message_kwargs))
+            return stream_response(stream_without_data(response, delta, on_reply=save_reply,
+                                                       moderator=wsgi_app.get_stream_moderator()), delta,
+                                   wsgi_app.get_prompt_headers(budget))
+        else:
+            return Response(None, media_type=EVENT_STREAM)
+
+
+async def conversation_azure_byod(request):
+    try:
+        request_json = JsonHelper.loads(await request.body())
+        delta = is_delta_stream(request.headers)
+        if wsgi_app.should_use_data():
+            return await conversation_with_data(request_json, request.method, delta)
+        else:
+            return await conversation_without_data(request_json, request.method, delta)
+    except AdmissionRejected as e:
+        return admission_rejected_response(e)
+    except Exception as e:
+        logging.exception("Exception in /api/conversation/azure_byod")
+        return JsonHelperResponse({"error": str(e)}, status_code=500)
+
+
+async def conversation_custom(request):
+    try:
+        request_json = JsonHelper.loads(await request.body())
+        employee_number = request.path_params['employee_number']
+        messages = await run_in_threadpool(wsgi_app.get_conversation_messages, request_json, employee_number)
+        save_reply = saving_reply(request_json, messages, employee_number)
+        static_result, message_kwargs = await run_in_threadpool(
+            wsgi_app.prepare_custom_conversation, messages, request_json["conversation_id"], employee_number)
+        if static_result is not None:
+            await save_reply([{"role": "assistant", "content": wsgi_app.get_static_content_message(static_result)}])
+            return Response(wsgi_app.stream_static_content_data(static_result), media_type=EVENT_STREAM)
+
+        response, budget = await run_in_threadpool(wsgi_app.get_custom_conversation_response, message_kwargs)
+        await save_reply(response["choices"][0]["messages"])
+        return JsonHelperResponse(response, headers=wsgi_app.get_prompt_headers(budget))
+
+    except AdmissionRejected as e:
+        return admission_rejected_response(e)
+    except Exception as e:
+        logging.exception("Exception in /api/conversation/custom")
+        return JsonHelperResponse({"error": str(e)}, status_code=500)
+
+
+async def metrics(request):
+    return JsonHelperResponse({'answer_cache': wsgi_app.answer_cache.stats(),
+                               'http_pool': HttpSessionHelper.get_stats(),
+                               'async_http_pool': http_session.get_stats(),
+                               'services': wsgi_app.services.get_stats(),
+                               'coalescing': wsgi_app.single_flight.get_stats(),
+                               'admission': wsgi_app.admission_controller.get_stats(),
+                               'conversations': wsgi_app.conversation_store.get_stats(),
+                               'prompt_budget': wsgi_app.PromptBudgetHelper.get_stats(),
+                               'intent_router': wsgi_app.IntentRouter.get_stats(),
+                               'stream_moderation': wsgi_app.StreamModerator.get_stats()})
+
+
+async def reload_config(request):
+    if not wsgi_app.is_reload_authorized(request.headers):
+        return JsonHelperResponse({"error": "Forbidden"}, status_code=403)
+    try:
+        return JsonHelperResponse(await run_in_threadpool(wsgi_app.services.reload))
+    except Exception as e:
+        logging.exception("Exception in /api/config/reload")
+        return JsonHelperResponse({"error": str(e)}, status_code=500)
+
+
+@contextlib.asynccontextmanager
+async def lifespan(_app):
+    await http_session.start()
+    wsgi_app.warm_up_in_background()
+    yield
+    await http_session.close()
+
+
+app = Starlette(
+    routes=[
+        Route("/api/conversation/azure_byod", conversation_azure_byod, methods=["GET", "POST"]),
+        Route("/api/conversation/custom/{employee_number}", conversation_custom, methods=["GET", "POST"]),
+        Route("/api/metrics", metrics, methods=["GET"]),
+        Route("/api/config/reload", reload_config, methods=["POST"]),
+        Mount("/", StaticFiles(directory=f'{PROJECT_ROOT_DIR}/static', html=True, check_dir=False)),
+    ],
+    lifespan=lifespan,
+)
@@ -0,0 +1,156 @@
+import asyncio
+import math
+import threading
+import time
+
+
+class AdmissionRejected(Exception):
+    """Raised instead of queueing a call that cannot start in time, retry_after is in seconds."""
+
+    def __init__(self, deployment: str, reason: str, retry_after: float) -> None:
+        super().__init__(f"Too many requests for {deployment}: {reason}, retry in {retry_after:.1f}s")
+        self.deployment = deployment
+        self.reason = reason
+        self.retry_after = retry_after
+
+    def get_retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class TokenBucket:
+    """
+    rate calls per second with bursts of up to burst calls. A call takes its token even when the bucket is
+    empty, the deficit is the time it has to wait, so waiting calls are admitted in arrival order.
+    """
+
+    def __init__(self, rate: float, burst: float, now: float) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def reserve(self, now: float) -> float:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def refund(self):
+        self.tokens += 1
+
+
+class AdmissionController:
+    """
+    Admits upstream calls per deployment through a token bucket. A call that finds the bucket empty waits
+    in a bounded queue; it is rejected right away when the queue is full, or when it could not start before
+    its deadline (max_wait seconds from now unless given), so it fails fast instead of timing out later.
+    A rate of 0 admits every call, burst defaults to one second of calls, rates overrides the rate of
+    single deployments.
+    """
+
+    def __init__(self, rate: float = 0, burst: float = 0, max_queue: int = 32, max_wait: float = 10,
+                 rates: dict = None, clock=time.monotonic, sleep=time.sleep) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.rates = rates or {}
+        self.clock = clock
+        self.sleep = sleep
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._stats = {}
+
+    @classmethod
+    def from_env(cls, env_helper):
+        rates = {}
+        for item in filter(None, env_helper.ADMISSION_DEPLOYMENT_RATES.split(',')):
+            deployment, rate = item.split('=')
+            rates[deployment.strip()] = float(rate)
+        return cls(rate=env_helper.ADMISSION_RATE, burst=env_helper.ADMISSION_BURST,
+                   max_queue=env_helper.ADMISSION_MAX_QUEUE, max_wait=env_helper.ADMISSION_MAX_WAIT, rates=rates)
+
+    def _get_stats(self, deployment: str) -> dict:
+        stats = self._stats.get(deployment)
+        if stats is None:
+            stats = self._stats[deployment] = {'admitted': 0, 'queued': 0, 'rejected_queue_full': 0,
+                                               'rejected_deadline': 0, 'cancelled': 0, 'queue_depth': 0,
+                                               'peak_queue_depth': 0, 'wait_seconds_total': 0.0,
+                                               'max_wait_seconds': 0.0}
+        return stats
+
+    def reserve(self, deployment: str, deadline: float = None) -> float:
+        """Returns how long the call has to wait before it starts, or raises AdmissionRejected."""
+        rate = self.rates.get(deployment, self.rate)
+        if rate <= 0:
+            return 0.0
+        with self._lock:
+            now = self.clock()
+            bucket = self._buckets.get(deployment)
+            if bucket is None:
+                bucket = self._buckets[deployment] = TokenBucket(rate, max(self.burst or rate, 1), now)
+            stats = self._get_stats(deployment)
+            wait = bucket.reserve(now)
+            if wait > 0:
+                if stats['queue_depth'] >= self.max_queue:
+                    bucket.refund()
+                    stats['rejected_queue_full'] += 1
+                    raise AdmissionRejected(deployment, 'queue full', wait)
+                if now + wait > (deadline if deadline is not None else now + self.max_wait):
+                    bucket.refund()
+                    stats['rejected_deadline'] += 1
+                    raise AdmissionRejected(deployment, 'deadline exceeded', wait)
+                stats['queued'] += 1
+                stats['queue_depth'] += 1
+                stats['peak_queue_depth'] = max(stats['peak_queue_depth'], stats['queue_depth'])
+            else:
+                stats['admitted'] += 1
+            return wait
+
+    def _dequeue(self, deployment: str, wait: float):
+        with self._lock:
+            stats = self._get_stats(deployment)
+            stats['queue_depth'] -= 1
+            stats['admitted'] += 1
+            stats['wait_seconds_total'] += wait
+            stats['max_wait_seconds'] = max(stats['max_wait_seconds'], wait)
+
+    def _cancel(self, deployment: str):
+        # the call left the queue without starting, its token goes back to the bucket
+        with self._lock:
+            stats = self._get_stats(deployment)
+            stats['queue_depth'] -= 1
+            stats['cancelled'] += 1
+            self._buckets[deployment].refund()
+
+    def admit(self, deployment: str, deadline: float = None):
+        wait = self.reserve(deployment, deadline)
+        if wait > 0:
+            try:
+                self.sleep(wait)
+            except BaseException:
+                self._cancel(deployment)
+                raise
+            self._dequeue(deployment, wait)
+
+    async def aadmit(self, deployment: str, deadline: float = None):
+        wait = self.reserve(deployment, deadline)
+        if wait > 0:
+            try:
+                await asyncio.sleep(wait)
+            except BaseException:
+                self._cancel(deployment)
+                raise
+            self._dequeue(deployment, wait)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            deployments = {}
+            for deployment, stats in self._stats.items():
+                deployments[deployment] = {
+                    **stats,
+                    'rate': self.rates.get(deployment, self.rate),
+                    'avg_wait_seconds': stats['wait_seconds_total'] / stats['queued'] if stats['queued'] else 0.0,
+                }
+        return {'rate': self.rate, 'max_queue': self.max_queue, 'max_wait': self.max_wait,
+                'deployments': deployments}
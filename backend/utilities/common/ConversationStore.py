@@ -0,0 +1,197 @@
+import hashlib
+import os
+import tempfile
+import threading
+import time
+
+from .LRUCache import LRUCache
+from ..helpers.JsonHelper import JsonHelper
+
+
+class MemoryConversationBackend:
+    """Conversations of this process, the least recently used are dropped past maxsize or ttl seconds."""
+    name = 'memory'
+
+    def __init__(self, maxsize: int = 1000, ttl: float = 3600) -> None:
+        self.cache = LRUCache(maxsize=maxsize, ttl=ttl)
+
+    def get(self, conversation_id: str):
+        return self.cache.get(conversation_id)
+
+    def put(self, conversation_id: str, messages: list):
+        self.cache.put(conversation_id, messages)
+
+    def stats(self) -> dict:
+        return self.cache.stats()
+
+
+class DiskConversationBackend:
+    """
+    One JSON file per conversation in directory, shared by the worker processes of a host and kept across
+    restarts. A file expires ttl seconds after its last write, past maxsize files the oldest are removed.
+    """
+    name = 'disk'
+
+    def __init__(self, directory: str, maxsize: int = 1000, ttl: float = 3600, clock=time.time) -> None:
+        self.directory = directory
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._count = len(self._list_files())
+
+    def _list_files(self) -> list:
+        return [os.path.join(self.directory, f) for f in os.listdir(self.directory) if f.endswith('.json')]
+
+    def _get_path(self, conversation_id: str) -> str:
+        # conversation ids come from the client, they are never used as file names as is
+        return os.path.join(self.directory, hashlib.sha256(conversation_id.encode('utf-8')).hexdigest() + '.json')
+
+    def get(self, conversation_id: str):
+        path = self._get_path(conversation_id)
+        try:
+            if os.path.getmtime(path) + self.ttl > self.clock():
+                with open(path, 'rb') as f:
+                    messages = JsonHelper.loads(f.read())
+                self.hits += 1
+                return messages
+            os.remove(path)
+            with self._lock:
+                self._count -= 1
+        except FileNotFoundError:
+            pass
+        self.misses += 1
+        return None
+
+    def put(self, conversation_id: str, messages: list):
+        if self.maxsize <= 0:
+            return
+        path = self._get_path(conversation_id)
+        is_new = not os.path.exists(path)
+        temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(JsonHelper.dumpb(messages))
+        # readers see either the previous file or the new one, never a partial write
+        os.replace(temp_path, path)
+        if is_new:
+            with self._lock:
+                self._count += 1
+                if self._count > self.maxsize:
+                    self._prune()
+
+    def _prune(self):
+        files = []
+        for path in self._list_files():
+            try:
+                files.append((os.path.getmtime(path), path))
+            except FileNotFoundError:
+                pass
+        files.sort()
+        expired_before = self.clock() - self.ttl
+        remaining = len(files)
+        for mtime, path in files:
+            if remaining <= self.maxsize and mtime > expired_before:
+                break
+            try:
+                os.remove(path)
+                self.evictions += 1
+            except FileNotFoundError:
+                pass
+            remaining -= 1
+        self._count = remaining
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'size': self._count,
+            'maxsize': self.maxsize,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+        }
+
+
+BACKENDS = {MemoryConversationBackend.name: MemoryConversationBackend, DiskConversationBackend.name: DiskConversationBackend}
+
+
+class ConversationStore:
+    """
+    Keeps the user and assistant messages of each conversation by conversation_id, so a client can send only
+    the new message of a turn instead of the whole conversation. A request that holds an assistant message
+    carries its own history and is used as is, which keeps the clients that resend everything working.
+    Only the last max_messages messages of a conversation are kept. Without a backend the store is disabled.
+    Conversation ids come from the client: a conversation saved for an owner, e.g. the employee number of a
+    custom conversation, is only found again with the same owner.
+    """
+
+    def __init__(self, backend=None, max_messages: int = 50) -> None:
+        self.backend = backend
+        self.max_messages = max_messages
+        self.resumed = 0
+        self.full_history = 0
+        self.saved = 0
+
+    @classmethod
+    def from_env(cls, env_helper):
+        # the memory backend is per process: under uwsgi with several workers a conversation resumes only when
+        # its next request reaches the same worker, the disk backend is shared by the workers of a host
+        name = env_helper.CONVERSATION_STORE
+        if not name:
+            return cls()
+        if name not in BACKENDS:
+            raise ValueError(f"Unknown conversation store {name}, expected one of {', '.join(BACKENDS)}")
+        kwargs = dict(maxsize=env_helper.CONVERSATION_STORE_MAXSIZE, ttl=env_helper.CONVERSATION_STORE_TTL)
+        if name == DiskConversationBackend.name:
+            kwargs['directory'] = env_helper.CONVERSATION_STORE_DIR or \
+                                  os.path.join(tempfile.gettempdir(), 'conversations')
+        return cls(BACKENDS[name](**kwargs), max_messages=env_helper.CONVERSATION_STORE_MAX_MESSAGES)
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    @staticmethod
+    def get_key(conversation_id: str, owner=None) -> str:
+        return f'{owner}\0{conversation_id}' if owner is not None else conversation_id
+
+    def get_messages(self, conversation_id, request_messages: list, owner=None) -> list:
+        """The stored conversation followed by the request messages, or the request messages when they hold it."""
+        if not self.enabled or not conversation_id:
+            return request_messages
+        if any(m.get('role') == 'assistant' for m in request_messages):
+            self.full_history += 1
+            return request_messages
+        stored = self.backend.get(self.get_key(conversation_id, owner))
+        if not stored:
+            return request_messages
+        self.resumed += 1
+        return stored + request_messages
+
+    def save(self, conversation_id, messages: list, reply_messages: list, owner=None):
+        """Stores the conversation messages followed by the answer to its last message."""
+        if not self.enabled or not conversation_id:
+            return
+        kept = [{'role': m['role'], 'content': m['content']} for m in messages + reply_messages
+                if m.get('role') in ('user', 'assistant')]
+        self.backend.put(self.get_key(conversation_id, owner), kept[-self.max_messages:])
+        self.saved += 1
+
+    @staticmethod
+    def get_chat_history(messages: list) -> list:
+        """Pairs the user and assistant messages into the (question, answer) tuples of the orchestrators."""
+        user_assistant_messages = [m for m in messages if m['role'] in ('user', 'assistant')]
+        return [(user_assistant_messages[i]['content'], user_assistant_messages[i + 1]['content'])
+                for i in range(0, len(user_assistant_messages) - 1, 2)]
+
+    def get_stats(self) -> dict:
+        if not self.enabled:
+            return {'enabled': False}
+        return {'enabled': True, 'backend': self.backend.name, 'max_messages': self.max_messages,
+                'resumed': self.resumed, 'full_history': self.full_history, 'saved': self.saved,
+                **self.backend.stats()}
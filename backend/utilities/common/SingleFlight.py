@@ -0,0 +1,256 @@
+import asyncio
+import inspect
+import threading
+
+
+class _Flight:
+    """One upstream call or stream and what it produced so far, shared by every request waiting on it."""
+
+    def __init__(self, condition) -> None:
+        self.condition = condition
+        self.iterator = None
+        self.items = []
+        self.pumping = False
+        self.done = False
+        self.result = None
+        self.error = None
+        self.consumers = 1
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent requests: the first request for a key makes the upstream call, the ones
+    arriving while it is in flight wait for it and get the same result, or the same exception.
+    Streams are fanned out, every item is kept until the stream ends so a request joining late first replays
+    what it missed. Any consumer that runs out of items pulls the next one from upstream, so a leader that
+    disconnects does not cut the stream of the others, and upstream is closed once nobody consumes it.
+    A key is forgotten as soon as its call completes, nothing is cached.
+    do and stream are for threads, ado and astream for the event loop, each with their own keys.
+    """
+
+    def __init__(self, enabled: bool = True) -> None:
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._streams = {}
+        self._async_calls = {}
+        self._async_streams = {}
+        self.calls = 0
+        self.coalesced_calls = 0
+        self.streams = 0
+        self.coalesced_streams = 0
+
+    def do(self, key, fn):
+        if not self.enabled:
+            return fn()
+        with self._lock:
+            flight = self._calls.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._calls[key] = _Flight(threading.Event())
+                self.calls += 1
+            else:
+                self.coalesced_calls += 1
+        if leader:
+            try:
+                flight.result = fn()
+            except Exception as e:
+                flight.error = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                flight.condition.set()
+        else:
+            flight.condition.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    def stream(self, key, make_iterator):
+        """
+        Returns an iterator over the items of the stream make_iterator() opens. The leader opens it right away,
+        so an error opening it is raised here.
+        """
+        if not self.enabled:
+            return iter(make_iterator())
+        with self._lock:
+            flight = self._streams.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._streams[key] = _Flight(threading.Condition())
+                # followers wait until the stream is open
+                flight.pumping = True
+                self.streams += 1
+            else:
+                flight.consumers += 1
+                self.coalesced_streams += 1
+        if leader:
+            error = None
+            try:
+                flight.iterator = iter(make_iterator())
+            except Exception as e:
+                error = e
+                self._finish(self._streams, key, flight, e)
+            with flight.condition:
+                flight.pumping = False
+                flight.condition.notify_all()
+            if error is not None:
+                raise error
+        return self._iter_stream(key, flight)
+
+    def _finish(self, streams, key, flight, error=None):
+        with self._lock:
+            if streams.get(key) is flight:
+                del streams[key]
+        flight.error = error
+        flight.done = True
+
+    def _release(self, streams, key, flight) -> bool:
+        """Counts a consumer out, returns True when it was the last one of an unfinished stream."""
+        with self._lock:
+            flight.consumers -= 1
+            if flight.consumers or flight.done:
+                return False
+            if streams.get(key) is flight:
+                del streams[key]
+            return True
+
+    def _iter_stream(self, key, flight):
+        index = 0
+        try:
+            while True:
+                with flight.condition:
+                    while index >= len(flight.items) and not flight.done and flight.pumping:
+                        flight.condition.wait()
+                    pump = False
+                    if index < len(flight.items):
+                        item = flight.items[index]
+                    elif flight.done:
+                        if flight.error is not None:
+                            raise flight.error
+                        return
+                    else:
+                        flight.pumping = pump = True
+                if pump:
+                    self._pump(key, flight)
+                else:
+                    index += 1
+                    yield item
+        finally:
+            if self._release(self._streams, key, flight) and hasattr(flight.iterator, 'close'):
+                flight.iterator.close()
+
+    def _pump(self, key, flight):
+        try:
+            item = next(flight.iterator)
+        except StopIteration:
+            self._finish(self._streams, key, flight)
+        except Exception as e:
+            self._finish(self._streams, key, flight, e)
+        else:
+            with flight.condition:
+                flight.items.append(item)
+        with flight.condition:
+            flight.pumping = False
+            flight.condition.notify_all()
+
+    async def ado(self, key, fn):
+        """Awaits fn() once for all the concurrent calls with key."""
+        if not self.enabled:
+            return await fn()
+        flight = self._async_calls.get(key)
+        if flight is None:
+            flight = self._async_calls[key] = _Flight(asyncio.Event())
+            self.calls += 1
+            try:
+                flight.result = await fn()
+            except Exception as e:
+                flight.error = e
+            finally:
+                del self._async_calls[key]
+                flight.condition.set()
+        else:
+            self.coalesced_calls += 1
+            await flight.condition.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    async def astream(self, key, make_iterator):
+        """Returns an async iterator over the items of the stream make_iterator() opens, which may be awaitable."""
+        if not self.enabled:
+            iterator = make_iterator()
+            return await iterator if inspect.isawaitable(iterator) else iterator
+        flight = self._async_streams.get(key)
+        if flight is None:
+            flight = self._async_streams[key] = _Flight(asyncio.Condition())
+            flight.pumping = True
+            self.streams += 1
+            error = None
+            try:
+                iterator = make_iterator()
+                flight.iterator = await iterator if inspect.isawaitable(iterator) else iterator
+            except Exception as e:
+                error = e
+                self._finish(self._async_streams, key, flight, e)
+            async with flight.condition:
+                flight.pumping = False
+                flight.condition.notify_all()
+            if error is not None:
+                raise error
+        else:
+            flight.consumers += 1
+            self.coalesced_streams += 1
+        return self._aiter_stream(key, flight)
+
+    async def _aiter_stream(self, key, flight):
+        index = 0
+        try:
+            while True:
+                async with flight.condition:
+                    await flight.condition.wait_for(
+                        lambda: index < len(flight.items) or flight.done or not flight.pumping)
+                    pump = False
+                    if index < len(flight.items):
+                        item = flight.items[index]
+                    elif flight.done:
+                        if flight.error is not None:
+                            raise flight.error
+                        return
+                    else:
+                        flight.pumping = pump = True
+                if pump:
+                    await self._apump(key, flight)
+                else:
+                    index += 1
+                    yield item
+        finally:
+            if self._release(self._async_streams, key, flight) and hasattr(flight.iterator, 'aclose'):
+                await flight.iterator.aclose()
+
+    async def _apump(self, key, flight):
+        try:
+            item = await flight.iterator.__anext__()
+        except StopAsyncIteration:
+            self._finish(self._async_streams, key, flight)
+        except Exception as e:
+            self._finish(self._async_streams, key, flight, e)
+        else:
+            flight.items.append(item)
+        async with flight.condition:
+            flight.pumping = False
+            flight.condition.notify_all()
+
+    def get_stats(self) -> dict:
+        calls = self.calls + self.coalesced_calls
+        streams = self.streams + self.coalesced_streams
+        return {
+            'enabled': self.enabled,
+            'calls': self.calls,
+            'coalesced_calls': self.coalesced_calls,
+            'streams': self.streams,
+            'coalesced_streams': self.coalesced_streams,
+            'coalesced_ratio': (self.coalesced_calls + self.coalesced_streams) / (calls + streams)
+            if calls + streams else 0.0,
+            'in_flight': len(self._calls) + len(self._streams) + len(self._async_calls) + len(self._async_streams),
+        }
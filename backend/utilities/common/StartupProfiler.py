@@ -0,0 +1,95 @@
+import json
+import os
+import re
+import subprocess
+import sys
+import sysconfig
+
+# -X importtime line: "import time: <self us> | <cumulative us> | <indent><module>"
+IMPORT_TIME_PATTERN = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+CONSTRUCTION_SCRIPT = """
+import cProfile, json, pstats, sys, time
+profiler = cProfile.Profile()
+profiler.enable()
+start = time.perf_counter()
+import {module} as profiled
+imported = time.perf_counter()
+{warm_up}
+ready = time.perf_counter()
+profiler.disable()
+constructors = []
+for (file_name, line, function), (_, _, _, cumulative, _) in pstats.Stats(profiler).stats.items():
+    if function == '__init__':
+        constructors.append((cumulative * 1e3, f'{{file_name}}:{{line}}'))
+json.dump({{'import_ms': (imported - start) * 1e3, 'warm_up_ms': (ready - imported) * 1e3,
+           'constructors': sorted(constructors, reverse=True)}}, sys.stdout)
+"""
+
+
+class StartupProfiler:
+    """
+    Breaks down the startup of a module, each measure in a fresh interpreter so nothing is already imported:
+    the import time of its direct imports and of every top-level package with -X importtime, and the
+    constructors (__init__) that take the most time while importing it and running the warm up, with cProfile.
+    cProfile slows the code it profiles, the constructor times are for comparison with each other.
+    """
+
+    def __init__(self, module: str = 'app', warm_up: str = '', cwd: str = None, top: int = 15) -> None:
+        self.module = module
+        self.warm_up = warm_up
+        self.cwd = cwd
+        self.top = top
+
+    def _run(self, *args) -> subprocess.CompletedProcess:
+        return subprocess.run([sys.executable, *args], cwd=self.cwd, capture_output=True, text=True, check=True)
+
+    def profile_imports(self) -> dict:
+        stderr = self._run('-X', 'importtime', '-c', f'import {self.module}').stderr
+        direct_imports, packages, total_us = [], {}, 0
+        for line in stderr.splitlines():
+            match = IMPORT_TIME_PATTERN.match(line)
+            if not match:
+                continue
+            self_us, cumulative_us, indent, name = int(match[1]), int(match[2]), len(match[3]), match[4]
+            package = name.split('.')[0]
+            packages[package] = packages.get(package, 0) + self_us
+            # the profiled module is printed last with one space of indent, what it imports with three
+            if indent == 3:
+                direct_imports.append((cumulative_us / 1e3, name))
+            elif indent == 1 and name == self.module:
+                total_us = cumulative_us
+        return {
+            'import_ms': total_us / 1e3,
+            'direct_imports': sorted(direct_imports, reverse=True)[:self.top],
+            'packages': sorted(((us / 1e3, p) for p, us in packages.items()), reverse=True)[:self.top],
+        }
+
+    def profile_construction(self) -> dict:
+        script = CONSTRUCTION_SCRIPT.format(module=self.module,
+                                            warm_up=f'profiled.{self.warm_up}()' if self.warm_up else '')
+        profile = json.loads(self._run('-c', script).stdout.splitlines()[-1])
+        profile['constructors'] = [(ms, self._short_location(location))
+                                   for ms, location in profile['constructors'][:self.top]]
+        return profile
+
+    def _short_location(self, location: str) -> str:
+        paths = sysconfig.get_paths()
+        for root in (os.path.abspath(self.cwd or os.getcwd()), paths['purelib'], paths['stdlib']):
+            if location.startswith(root + os.sep):
+                return location[len(root) + 1:]
+        return location
+
+    def get_report(self) -> str:
+        imports = self.profile_imports()
+        construction = self.profile_construction()
+        lines = [f"import {self.module}: {imports['import_ms']:.1f} ms"]
+        lines += ["", "Direct imports (cumulative ms):"]
+        lines += [f"  {ms:9.1f}  {name}" for ms, name in imports['direct_imports']]
+        lines += ["", "Packages (self ms):"]
+        lines += [f"  {ms:9.1f}  {name}" for ms, name in imports['packages']]
+        profiled = f"Under cProfile: import {construction['import_ms']:.1f} ms"
+        if self.warm_up:
+            profiled += f", {self.warm_up} {construction['warm_up_ms']:.1f} ms"
+        lines += ["", profiled, "Constructors (cumulative ms):"]
+        lines += [f"  {ms:9.1f}  {location}" for ms, location in construction['constructors']]
+        return "\n".join(lines)
@@ -0,0 +1,34 @@
+from datetime import datetime
+from types import MappingProxyType
+
+
+def get_absence_data(_dic):
+    """
+    Returns a read-only view of the absence dictionary without the balances the employee is not eligible for
+    and with ptoRefreshDate formatted as Month dd, YYYY. Any other dictionary is returned unchanged.
+    """
+    # this condition checks if this is absence dictionary, views are already processed
+    if 'eligibleToPurchasePto' not in _dic or type(_dic) is MappingProxyType:
+        return _dic
+
+    _view = dict(_dic)
+    if 'eligible' != _view.get('eligibleToPurchasePto', '').strip().lower():
+        _view.pop('purchasedPtoBalance', None)
+    if 'not eligible' == _view.get('sickPlanEligibility', '').strip().lower():
+        _view.pop('sickPlanBalance', None)
+    if 'vacation' in _view.get('timeOffPlanType', '').strip().lower():
+        _view.pop('ptoBalance', None)
+    else:
+        _view.pop('vacationBalance', None)
+    # Change date format to Month dd, YYYY
+    _r_date = _view.get('ptoRefreshDate')
+    if _r_date:
+        _r_date = datetime.strptime(_r_date[:_r_date.rfind('-')], '%Y-%m-%d')
+        _view['ptoRefreshDate'] = _r_date.strftime('%B %d, %Y')
+    return MappingProxyType(_view)
+
+
+def prepare_employee_record(employee_dict):
+    # Runs once per record load, the prepared record is shared by all requests and must not be modified
+    return MappingProxyType({key: get_absence_data(value) if type(value) is dict else value
+                             for key, value in employee_dict.items()})
@@ -0,0 +1,44 @@
+"""
+Converts the per-file employee data layout (one <employee number>.json per employee plus tlc_data.json)
+into the sharded layout read by ShardedEmployeeStore and MappedTlcTable:
+
+    <target>/employees-00000.jsonl ...   employee records, --shard-size records per shard
+    <target>/index.npy                   sorted offset index of the records
+    <target>/tlc/*.npy                   TLC balance columns
+
+Run from the repository root, then point EMPLOYEE_SHARD_DIR at the target directory:
+
+    python -m backend.utilities.employee_data.convert_employee_data --source data/employee --target data/employee_shards
+"""
+import argparse
+import os
+
+from eds_util import TLC_DATA_FILE, get_file_version, get_json
+from .employee_shards import DEFAULT_SHARD_SIZE, write_employee_shards
+from .tlc_table import write_tlc_columns
+
+
+def iter_employee_files(data_dir: str):
+    for file_name in sorted(os.listdir(data_dir)):
+        if not file_name.endswith('.json') or file_name == TLC_DATA_FILE:
+            continue
+        file_path = f'{data_dir}/{file_name}'
+        yield file_name[:-len('.json')], get_json(file_path), get_file_version(file_path)
+
+
+def convert(source: str, target: str, shard_size: int = DEFAULT_SHARD_SIZE):
+    count = write_employee_shards(iter_employee_files(source), target, shard_size)
+    print(f'Wrote {count} employee records to {target}')
+    if os.path.exists(f'{source}/{TLC_DATA_FILE}'):
+        tlc_data = get_json(f'{source}/{TLC_DATA_FILE}')
+        write_tlc_columns(tlc_data, f'{target}/tlc')
+        print(f'Wrote TLC balances of {len(tlc_data)} employees to {target}/tlc')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--source', required=True, help='directory with the employee json files')
+    parser.add_argument('--target', required=True, help='directory the shards are written to')
+    parser.add_argument('--shard-size', type=int, default=DEFAULT_SHARD_SIZE, help='records per shard file')
+    args = parser.parse_args()
+    convert(args.source, args.target, args.shard_size)
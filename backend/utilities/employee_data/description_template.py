@@ -0,0 +1,100 @@
+from collections.abc import Mapping
+
+
+def compile_description(description):
+    """Turns a description into a function of the value, equivalent to description.format(value=value)."""
+    if description is None:
+        return None
+    if '{' not in description and '}' not in description:
+        return lambda value: description
+    prefix, separator, suffix = description.partition('{value}')
+    if separator and '{' not in prefix + suffix and '}' not in prefix + suffix:
+        return lambda value: f'{prefix}{value}{suffix}'
+    return lambda value: description.format(value=value)
+
+
+class DescriptionTemplate:
+    """
+    Compiled form of one employee config entry: its score words and its description, or the description
+    variants of an isResponseMultiple entry. KeywordIndex builds one per config entry when it loads the config.
+    """
+    __slots__ = ('key', 'config', 'fields', 'field_set', 'score_words', 'is_response_multiple', 'render',
+                 'variants')
+
+    def __init__(self, key: str, config: dict) -> None:
+        self.key = key
+        self.config = config
+        # same key order as {**config, 'score': score, key: value}
+        self.fields = tuple(config) + tuple(f for f in ('score', key) if f not in config)
+        self.field_set = frozenset(self.fields)
+        self.score_words = tuple(config.get('score')) if 'score' in config else None
+        self.is_response_multiple = 'isResponseMultiple' in config
+        if self.is_response_multiple:
+            self.render = None
+            self.variants = {k: compile_description(v) for k, v in config.get('description').items()}
+        else:
+            self.render = compile_description(config.get('description'))
+            self.variants = None
+
+    def get_score(self, search_words, score):
+        for score_word in self.score_words:
+            if score_word in search_words or any(score_word in word for word in search_words):
+                score = score + 1
+            else:
+                score = score - 1
+        return score
+
+    def create_result(self, value, search_words, score=1):
+        if self.score_words is not None:
+            score = self.get_score(search_words, score)
+
+        if self.is_response_multiple:
+            _val = '_'.join([v for v in str(value).strip().lower().split()])
+            if 'sickPlanEligibility' == self.key:
+                is_eligibility_check = not search_words.isdisjoint({'eligible', 'eligibility'})
+                if 'not_eligible' == _val:
+                    _val = 'no' if is_eligibility_check else 'not_eligible'
+                else:
+                    _val = 'yes' if is_eligibility_check else 'eligible'
+            description = self.variants.get(_val)(value)
+        elif type(value) == dict:
+            description = self.render(' '.join([str(v) for v in value.values()]))
+        else:
+            description = self.render(value)
+
+        return MatchResult(self, value, score, description)
+
+
+class MatchResult(Mapping):
+    """
+    Read-only result of a matched config entry. It reads like the config entry merged with
+    {'score': score, key: value} and the rendered description, without copying the config entry.
+    """
+    __slots__ = ('template', 'value', 'score', 'description')
+
+    def __init__(self, template: DescriptionTemplate, value, score: int, description: str) -> None:
+        self.template = template
+        self.value = value
+        self.score = score
+        self.description = description
+
+    def __getitem__(self, field):
+        if field == 'description':
+            return self.description
+        if field == 'score':
+            return self.score
+        if field == self.template.key:
+            return self.value
+        return self.template.config[field]
+
+    def __contains__(self, field):
+        return field in self.template.field_set
+
+    def __iter__(self):
+        return iter(self.template.fields)
+
+    def __len__(self):
+        return len(self.template.fields)
+
+    def __repr__(self):
+        return repr(dict(self))
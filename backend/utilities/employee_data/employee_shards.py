@@ -0,0 +1,172 @@
+import json
+import mmap
+import os
+import re
+import threading
+
+import numpy as np
+
+from eds_util import get_file_version, get_json
+from ..common.LRUCache import LRUCache
+
+SHARD_INDEX_FILE = 'index.npy'
+DEFAULT_SHARD_SIZE = 10000
+SHARD_FILE_PATTERN = re.compile(r'employees-(\d+)\.jsonl')
+
+
+def get_shard_file_name(shard: int) -> str:
+    return f'employees-{shard:05d}.jsonl'
+
+
+def get_shard_files(shard_dir: str) -> dict:
+    """Returns the shard files in shard_dir by shard number."""
+    shard_files = {}
+    for file_name in os.listdir(shard_dir):
+        match = SHARD_FILE_PATTERN.fullmatch(file_name)
+        if match:
+            shard_files[int(match.group(1))] = file_name
+    return shard_files
+
+
+def write_employee_shards(employees, shard_dir: str, shard_size: int = DEFAULT_SHARD_SIZE) -> int:
+    """
+    Writes (employee_number, record, version) tuples as compact json lines into shard files of shard_size
+    records, followed by the offset index. Records are streamed, only the index rows are kept in memory.
+    Shard files are never rewritten, a conversion numbers its shards after the ones already in shard_dir, so
+    stores reading the current index keep reading its shards. Once the new index is in place the shards of
+    the conversions before the previous one are removed. Returns the number of records written.
+    """
+    os.makedirs(shard_dir, exist_ok=True)
+    existing_shards = get_shard_files(shard_dir)
+    first_shard = max(existing_shards, default=-1) + 1
+    previous_shards = set()
+    if os.path.exists(f'{shard_dir}/{SHARD_INDEX_FILE}'):
+        previous_shards = set(np.unique(np.load(f'{shard_dir}/{SHARD_INDEX_FILE}', mmap_mode='r')['shard']).tolist())
+    rows = []
+    f_out = None
+    offset = 0
+    try:
+        for position, (employee_number, record, version) in enumerate(employees):
+            shard = first_shard + position // shard_size
+            if position % shard_size == 0:
+                if f_out:
+                    f_out.close()
+                f_out = open(f'{shard_dir}/{get_shard_file_name(shard)}', 'xb')
+                offset = 0
+            data = json.dumps(record, separators=(',', ':')).encode('utf-8')
+            f_out.write(data + b'\n')
+            rows.append((str(employee_number).encode('utf-8'), shard, offset, len(data), *version))
+            offset += len(data) + 1
+    finally:
+        if f_out:
+            f_out.close()
+
+    width = max([len(row[0]) for row in rows], default=1)
+    index = np.array(rows, dtype=[('employee_number', f'S{width}'), ('shard', np.int32), ('offset', np.int64),
+                                  ('length', np.int64), ('mtime_ns', np.int64), ('size', np.int64)])
+    index.sort(order='employee_number')
+    # the index is replaced last, readers pick up the new shards when its version changes
+    with open(f'{shard_dir}/{SHARD_INDEX_FILE}.tmp', 'wb') as f_out:
+        np.save(f_out, index)
+    os.replace(f'{shard_dir}/{SHARD_INDEX_FILE}.tmp', f'{shard_dir}/{SHARD_INDEX_FILE}')
+    # requests still on the previous index may read its shards, the ones before it are no longer used
+    for shard, file_name in existing_shards.items():
+        if shard not in previous_shards:
+            os.remove(f'{shard_dir}/{file_name}')
+    return len(rows)
+
+
+class ShardedEmployeeStore:
+    """
+    Employee records read lazily from the shard files written by write_employee_shards.
+    The offset index is a sorted numpy array mapped from disk, and shards are read through mmap, so nothing
+    is loaded before it is asked for. Prepared records are kept in an LRU cache of cache_size records,
+    which bounds memory whatever the number of employees.
+    A json file in data_dir that differs from the version it was converted from takes precedence over its
+    shard record, so single employees can be updated without converting all of them again.
+    Same interface as EmployeeStore, returned records are shared and must be treated as read-only.
+    """
+
+    def __init__(self, data_dir: str, shard_dir: str, prepare_record=None, cache_size: int = 10000) -> None:
+        self.data_dir = data_dir
+        self.shard_dir = shard_dir
+        self.prepare_record = prepare_record if prepare_record else (lambda record: record)
+        self.cache = LRUCache(cache_size, float('inf'))
+        self.version = None
+        self.index = None
+        self._shards = {}
+        self._lock = threading.Lock()
+        self.refresh()
+
+    def get_file_path(self, employee_number) -> str:
+        return f'{self.data_dir}/{employee_number}.json'
+
+    def refresh(self):
+        version = get_file_version(f'{self.shard_dir}/{SHARD_INDEX_FILE}')
+        if version != self.version:
+            with self._lock:
+                if version != self.version:
+                    self.index = np.load(f'{self.shard_dir}/{SHARD_INDEX_FILE}', mmap_mode='r')
+                    # mmaps of replaced shards are closed when the last reader drops them
+                    self._shards = {}
+                    self.version = version
+        return self
+
+    def get(self, employee_number):
+        return self.get_with_version(employee_number)[0]
+
+    def get_version(self, employee_number):
+        return self.get_with_version(employee_number)[1]
+
+    def get_with_version(self, employee_number):
+        employee_number = str(employee_number)
+        self.refresh()
+        entry = self._find(employee_number)
+        try:
+            file_version = get_file_version(self.get_file_path(employee_number))
+        except FileNotFoundError:
+            if entry is None:
+                raise
+            file_version = None
+
+        version = file_version if file_version else (int(entry['mtime_ns']), int(entry['size']))
+        cached = self.cache.get(employee_number)
+        if cached is not None and cached[1] == version:
+            return cached
+
+        if entry is not None and (int(entry['mtime_ns']), int(entry['size'])) == version:
+            record = self._read(entry)
+        else:
+            record = get_json(self.get_file_path(employee_number))
+        cached = (self.prepare_record(record), version)
+        self.cache.put(employee_number, cached)
+        return cached
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, employee_number):
+        return self._find(str(employee_number)) is not None
+
+    def _find(self, employee_number: str):
+        key = employee_number.encode('utf-8')
+        employee_numbers = self.index['employee_number']
+        if len(key) > employee_numbers.dtype.itemsize:
+            return None
+        position = int(np.searchsorted(employee_numbers, key))
+        if position < len(employee_numbers) and employee_numbers[position] == key:
+            return self.index[position]
+        return None
+
+    def _read(self, entry):
+        shard = int(entry['shard'])
+        mm = self._shards.get(shard)
+        if mm is None:
+            with self._lock:
+                mm = self._shards.get(shard)
+                if mm is None:
+                    with open(f'{self.shard_dir}/{get_shard_file_name(shard)}', 'rb') as f_in:
+                        mm = mmap.mmap(f_in.fileno(), 0, access=mmap.ACCESS_READ)
+                    self._shards[shard] = mm
+        offset = int(entry['offset'])
+        return json.loads(mm[offset:offset + int(entry['length'])])
@@ -0,0 +1,111 @@
+import json
+import mmap
+import os
+import threading
+
+from eds_util import TLC_DATA_FILE, get_file_version, get_json
+
+
+class EmployeeStore:
+    """
+    Keeps every employee record of data_dir in memory, keyed by employee number.
+    Records are loaded once, either from the json files or from a snapshot written by save_snapshot,
+    and a record is re-read only when its json file changes on disk.
+    prepare_record turns a loaded json record into the object returned by get, it runs once per load.
+    Returned records are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self, data_dir: str, snapshot_path: str = '', prepare_record=None) -> None:
+        self.data_dir = data_dir
+        self.snapshot_path = snapshot_path
+        self.prepare_record = prepare_record if prepare_record else (lambda record: record)
+        self._records = {}
+        self._prepared = {}
+        self._versions = {}
+        self._lock = threading.Lock()
+        self.load()
+
+    def get_file_path(self, employee_number) -> str:
+        return f'{self.data_dir}/{employee_number}.json'
+
+    def load(self):
+        records, versions = {}, {}
+        if self.snapshot_path and os.path.exists(self.snapshot_path):
+            records, versions = self._read_snapshot(self.snapshot_path)
+
+        for file_name in os.listdir(self.data_dir):
+            employee_number = file_name[:-len('.json')]
+            if not file_name.endswith('.json') or file_name == TLC_DATA_FILE or employee_number in records:
+                continue
+            file_path = self.get_file_path(employee_number)
+            versions[employee_number] = get_file_version(file_path)
+            records[employee_number] = get_json(file_path)
+
+        prepared = {employee_number: self.prepare_record(record) for employee_number, record in records.items()}
+        with self._lock:
+            self._records = records
+            self._prepared = prepared
+            self._versions = versions
+
+        if self.snapshot_path and not os.path.exists(self.snapshot_path):
+            self.save_snapshot(self.snapshot_path)
+
+    def get(self, employee_number):
+        return self._get_record(str(employee_number))[0]
+
+    def get_version(self, employee_number):
+        return self.get_with_version(employee_number)[1]
+
+    def get_with_version(self, employee_number):
+        """Returns the record together with the version of the file it was loaded from."""
+        return self._get_record(str(employee_number))
+
+    def __len__(self):
+        return len(self._records)
+
+    def __contains__(self, employee_number):
+        return str(employee_number) in self._records
+
+    def _get_record(self, employee_number: str):
+        # os.stat raises FileNotFoundError for unknown employees, same as reading the file did
+        version = get_file_version(self.get_file_path(employee_number))
+        if self._versions.get(employee_number) != version:
+            record = get_json(self.get_file_path(employee_number))
+            prepared = self.prepare_record(record)
+            with self._lock:
+                self._records[employee_number] = record
+                self._prepared[employee_number] = prepared
+                self._versions[employee_number] = version
+            return prepared, version
+        return self._prepared[employee_number], version
+
+    def save_snapshot(self, snapshot_path: str):
+        """
+        Writes all records as compact json into one data file, plus an index file holding the offset,
+        length and source file version of every record, so the store can be loaded with a single mmap.
+        """
+        index = {}
+        offset = 0
+        with self._lock:
+            items = list(self._records.items())
+            versions = dict(self._versions)
+        with open(snapshot_path, 'wb') as f_out:
+            for employee_number, record in items:
+                data = json.dumps(record, separators=(',', ':')).encode('utf-8')
+                f_out.write(data)
+                index[employee_number] = [offset, len(data), *versions[employee_number]]
+                offset += len(data)
+        with open(f'{snapshot_path}.idx', 'w') as f_out:
+            json.dump(index, f_out)
+
+    @staticmethod
+    def _read_snapshot(snapshot_path: str):
+        index = get_json(f'{snapshot_path}.idx')
+        records, versions = {}, {}
+        if not index:
+            return records, versions
+        with open(snapshot_path, 'rb') as f_in, mmap.mmap(f_in.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for employee_number, (offset, length, mtime_ns, size) in index.items():
+                records[employee_number] = json.loads(mm[offset:offset + length])
+                versions[employee_number] = (mtime_ns, size)
+        return records, versions
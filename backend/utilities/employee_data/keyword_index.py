@@ -0,0 +1,88 @@
+import threading
+from typing import NamedTuple
+
+from eds_util import get_file_version, get_json
+from .description_template import DescriptionTemplate
+
+
+class KeywordIndexSnapshot(NamedTuple):
+    """One build of the KeywordIndex, KeywordIndex swaps the whole of it when the config changes."""
+    version: tuple
+    config: dict
+    postings: dict
+    templates: dict
+
+    def lookup(self, search_words) -> dict:
+        """Returns the number of keywords matched by search_words for every matching config path."""
+        postings = self.postings
+        hits = {}
+        for word in search_words:
+            for path in postings.get(word, ()):
+                hits[path] = hits.get(path, 0) + 1
+        return hits
+
+
+class KeywordIndex:
+    """
+    Inverted index over the keywords of the employee config (employee.json).
+    Every config entry is addressed by its path, e.g. ('absence', 'ptoBalance'), and a query is resolved
+    with one dictionary lookup per search word. The index is rebuilt when the config file changes.
+    templates holds the compiled DescriptionTemplate of every config entry, by the same paths.
+    Readers take one KeywordIndexSnapshot per lookup with get_snapshot, so the config, postings, templates and
+    version they use are always of the same build.
+    """
+
+    def __init__(self, config_path: str) -> None:
+        self.config_path = config_path
+        self.snapshot = KeywordIndexSnapshot(None, {}, {}, {})
+        self._lock = threading.Lock()
+        self.refresh()
+
+    @property
+    def version(self):
+        return self.snapshot.version
+
+    @property
+    def config(self):
+        return self.snapshot.config
+
+    @property
+    def postings(self):
+        return self.snapshot.postings
+
+    @property
+    def templates(self):
+        return self.snapshot.templates
+
+    def refresh(self):
+        version = get_file_version(self.config_path)
+        if version != self.snapshot.version:
+            with self._lock:
+                if version != self.snapshot.version:
+                    self.build(get_json(self.config_path), version)
+        return self
+
+    def get_snapshot(self) -> KeywordIndexSnapshot:
+        return self.refresh().snapshot
+
+    def build(self, config: dict, version=None):
+        postings = {}
+        templates = {}
+
+        def add_entries(_config, path):
+            for key, key_config in _config.items():
+                if type(key_config) is not dict:
+                    continue
+                key_path = path + (key,)
+                if 'keywords' not in key_config:
+                    add_entries(key_config, key_path)
+                    continue
+                templates[key_path] = DescriptionTemplate(key, key_config)
+                for keyword in {k.lower() for k in key_config.get('keywords')}:
+                    postings.setdefault(keyword, []).append(key_path)
+
+        add_entries(config, ())
+        self.snapshot = KeywordIndexSnapshot(version, config, postings, templates)
+
+    def lookup(self, search_words) -> dict:
+        return self.snapshot.lookup(search_words)
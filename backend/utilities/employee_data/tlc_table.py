@@ -0,0 +1,309 @@
+import os
+import threading
+from typing import NamedTuple
+
+import numpy as np
+
+from eds_util import get_file_version, get_json
+
+TLC_FIELDS = ('caregiver', 'floating_holiday', 'pto', 'reward_time', 'sick', 'sick_leave', 'sickb',
+              'unpaid_protected_time', 'pay_continuation', 'mandated_time', 'vacation')
+TLC_SOURCE_TEXT = 'as per information available in TLC system'
+TLC_MISSING_TEXT = '\n\n'
+# Balances added to the TLC details when they are at least one, in sentence order
+TLC_DETAIL_FIELDS = (
+    ('floating_holiday', ', Floating Holidays '),
+    ('reward_time', ', Reward time is '),
+    ('caregiver', ', Caregiver is '),
+    ('unpaid_protected_time', ', Unpaid Protected Time is '),
+    ('pay_continuation', ', pay continuation is '),
+    ('mandated_time', ', mandated time is '),
+)
+TLC_BALANCES = ('sick', 'pto', 'vacation')
+# written last by write_tlc_columns, its version is the version of the whole column directory
+TLC_EMPLOYEE_NUMBERS_FILE = 'employee_numbers.npy'
+
+
+class TlcColumns(NamedTuple):
+    """One version of the TlcTable columns, TlcTable swaps the whole of it on reload."""
+    employee_numbers: list
+    row_index: dict
+    values: dict
+    text: dict
+    details: np.ndarray
+    balances: dict
+
+    @classmethod
+    def empty(cls):
+        return cls([], {}, {field: np.empty(0, dtype=np.float64) for field in TLC_FIELDS},
+                   {field: np.empty(0, dtype=object) for field in TLC_FIELDS}, np.empty(0, dtype=object),
+                   {balance: np.empty(0, dtype=object) for balance in TLC_BALANCES})
+
+
+class TlcTable:
+    """
+    Columnar copy of tlc_data.json. Every balance is a float64 column plus the text it is rendered with,
+    rows are addressed through an employee number index. The balance sentences are rendered for all rows
+    when they are loaded, so rendering them for any number of employees only selects and joins columns.
+    """
+
+    def __init__(self, file_path: str) -> None:
+        self.file_path = file_path
+        self.version = None
+        self._columns = TlcColumns.empty()
+        self._lock = threading.Lock()
+        self.refresh()
+
+    @property
+    def employee_numbers(self):
+        return self._columns.employee_numbers
+
+    @property
+    def values(self):
+        return self._columns.values
+
+    @property
+    def text(self):
+        return self._columns.text
+
+    @property
+    def details(self):
+        return self._columns.details
+
+    @property
+    def balances(self):
+        return self._columns.balances
+
+    def refresh(self):
+        version = get_file_version(self.file_path)
+        if version != self.version:
+            with self._lock:
+                if version != self.version:
+                    self.load(get_json(self.file_path), version)
+        return self
+
+    def load(self, tlc_data: dict, version=None):
+        """
+        Applies tlc_data to the table, only the rows that were added or changed are rendered again. The columns
+        in use are never written to: the changed rows go to copies, and the new columns replace the old ones in
+        a single assignment, so readers that do not take the lock see either the old or the new table.
+        """
+        columns = self._columns
+        new_numbers = [n for n in tlc_data if n not in columns.row_index]
+        if len(columns.row_index) + len(new_numbers) != len(tlc_data):
+            # employees were removed, start over with an empty table
+            columns = TlcColumns.empty()
+            new_numbers = list(tlc_data)
+        values, text, details, balances = columns.values, columns.text, columns.details, columns.balances
+
+        existing_numbers = [n for n in tlc_data if n in columns.row_index]
+        if existing_numbers:
+            rows = np.array([columns.row_index[n] for n in existing_numbers], dtype=np.intp)
+            changed_values, changed_text = self._get_columns([tlc_data[n] for n in existing_numbers])
+            changed = np.zeros(len(rows), dtype=bool)
+            for field in TLC_FIELDS:
+                changed |= changed_text[field] != text[field][rows]
+            if changed.any():
+                rows = rows[changed]
+                changed_values = {field: column[changed] for field, column in changed_values.items()}
+                changed_text = {field: column[changed] for field, column in changed_text.items()}
+                changed_details, changed_balances = self._render(changed_values, changed_text)
+                values = {field: column.copy() for field, column in values.items()}
+                text = {field: column.copy() for field, column in text.items()}
+                details = details.copy()
+                balances = {balance: column.copy() for balance, column in balances.items()}
+                for field in TLC_FIELDS:
+                    values[field][rows] = changed_values[field]
+                    text[field][rows] = changed_text[field]
+                details[rows] = changed_details
+                for balance in TLC_BALANCES:
+                    balances[balance][rows] = changed_balances[balance]
+
+        employee_numbers, row_index = columns.employee_numbers, columns.row_index
+        if new_numbers:
+            new_values, new_text = self._get_columns([tlc_data[n] for n in new_numbers])
+            new_details, new_balances = self._render(new_values, new_text)
+            values = {field: np.concatenate((values[field], new_values[field])) for field in TLC_FIELDS}
+            text = {field: np.concatenate((text[field], new_text[field])) for field in TLC_FIELDS}
+            details = np.concatenate((details, new_details))
+            balances = {balance: np.concatenate((balances[balance], new_balances[balance]))
+                        for balance in TLC_BALANCES}
+            first_row = len(employee_numbers)
+            employee_numbers = employee_numbers + new_numbers
+            row_index = {**row_index, **{n: first_row + i for i, n in enumerate(new_numbers)}}
+
+        self._columns = TlcColumns(employee_numbers, row_index, values, text, details, balances)
+        self.version = version
+
+    def __len__(self):
+        return len(self._columns.row_index)
+
+    def __contains__(self, employee_number):
+        return str(employee_number) in self._columns.row_index
+
+    def get(self, employee_number):
+        """Returns the balances of an employee as they are written in the TLC details, None if unknown."""
+        columns = self._columns
+        row = columns.row_index.get(str(employee_number))
+        if row is None:
+            return None
+        return {field: columns.text[field][row] for field in TLC_FIELDS}
+
+    def render_balances(self, employee_numbers, balances=TLC_BALANCES):
+        """
+        Renders the TLC details followed by the given balances ('sick', 'pto' and/or 'vacation') for every
+        employee, e.g. "as per information available in TLC system, Floating Holidays 8, PTO balance is 40".
+        """
+        columns = self._columns
+        rows = np.array([columns.row_index.get(str(n), -1) for n in employee_numbers], dtype=np.intp)
+        found = rows >= 0
+        rows = rows[found]
+        return self._join(found, columns.details[rows], {b: columns.balances[b][rows] for b in balances}, balances)
+
+    @staticmethod
+    def _join(found, details, rendered_balances, balances):
+        rendered = np.full(len(found), TLC_MISSING_TEXT, dtype=object)
+        text = details
+        for balance in balances:
+            text = text + rendered_balances[balance]
+        rendered[found] = text
+        return rendered.tolist()
+
+    @staticmethod
+    def _get_columns(rows):
+        values, text = {}, {}
+        for field in TLC_FIELDS:
+            raw = [row.get(field) for row in rows]
+            values[field] = np.array([np.nan if v is None else float(v) for v in raw], dtype=np.float64)
+            text[field] = np.array([str(v) for v in raw], dtype=object)
+        return values, text
+
+    @staticmethod
+    def _render(values, text):
+        # a balance counts when its whole part is positive, 0.5 hours of caregiver time are not mentioned
+        positive = {field: np.trunc(column) > 0 for field, column in values.items()}
+        details = np.full(len(values['pto']), TLC_SOURCE_TEXT, dtype=object)
+        for field, prefix in TLC_DETAIL_FIELDS:
+            details = np.where(positive[field], details + prefix + text[field], details)
+
+        sick_balance = np.where(positive['sick'], text['sick'],
+                                np.where(positive['sick_leave'], text['sick_leave'], '0'))
+        balances = {
+            'sick': ', sick leave balance is ' + sick_balance
+                    + ' and sick bank (carry forward sick leave) balance is ' + text['sickb'],
+            'pto': ', PTO balance is ' + text['pto'],
+            'vacation': ', Vacation balance is ' + text['vacation'],
+        }
+        return details, balances
+
+
+def write_tlc_columns(tlc_data: dict, column_dir: str):
+    """
+    Writes tlc_data as .npy columns that MappedTlcTable maps from disk: the sorted employee numbers, and per
+    balance its float64 values and its text as fixed width unicode. Every column is written to a temporary file
+    that replaces it, columns mapped by a MappedTlcTable keep their data until it loads the new ones.
+    """
+    os.makedirs(column_dir, exist_ok=True)
+    employee_numbers = sorted(tlc_data)
+    values, text = TlcTable._get_columns([tlc_data[n] for n in employee_numbers])
+    for field in TLC_FIELDS:
+        _save_column(f'{column_dir}/{field}.values.npy', values[field])
+        _save_column(f'{column_dir}/{field}.text.npy', text[field].astype(str))
+    _save_column(f'{column_dir}/{TLC_EMPLOYEE_NUMBERS_FILE}',
+                 np.array([n.encode('utf-8') for n in employee_numbers], dtype=bytes))
+
+
+def _save_column(file_path: str, column):
+    with open(f'{file_path}.tmp', 'wb') as f_out:
+        np.save(f_out, column)
+    os.replace(f'{file_path}.tmp', file_path)
+
+
+class MappedTlcColumns(NamedTuple):
+    """The columns of one write_tlc_columns run, MappedTlcTable swaps the whole of it on refresh."""
+    version: tuple
+    employee_numbers: np.ndarray
+    values: dict
+    text: dict
+
+
+class MappedTlcTable:
+    """
+    TlcTable over the columns written by write_tlc_columns. The columns are memory-mapped and only the rows
+    of the requested employees are read and rendered, so memory does not grow with the number of employees.
+    Readers take the current columns once per call, a refresh replaces them in a single assignment.
+    """
+
+    def __init__(self, column_dir: str) -> None:
+        self.column_dir = column_dir
+        self._columns = MappedTlcColumns(None, np.empty(0, dtype=bytes), {}, {})
+        self._lock = threading.Lock()
+        self.refresh()
+
+    @property
+    def version(self):
+        return self._columns.version
+
+    @property
+    def employee_numbers(self):
+        return self._columns.employee_numbers
+
+    @property
+    def values(self):
+        return self._columns.values
+
+    @property
+    def text(self):
+        return self._columns.text
+
+    def refresh(self):
+        employee_numbers_path = f'{self.column_dir}/{TLC_EMPLOYEE_NUMBERS_FILE}'
+        version = get_file_version(employee_numbers_path)
+        if version != self._columns.version:
+            with self._lock:
+                while version != self._columns.version:
+                    columns = MappedTlcColumns(
+                        version, self._load(TLC_EMPLOYEE_NUMBERS_FILE),
+                        {field: self._load(f'{field}.values.npy') for field in TLC_FIELDS},
+                        {field: self._load(f'{field}.text.npy') for field in TLC_FIELDS})
+                    # the columns were replaced while they were loaded, load them again
+                    version = get_file_version(employee_numbers_path)
+                    if version == columns.version:
+                        self._columns = columns
+        return self
+
+    def _load(self, file_name: str):
+        return np.load(f'{self.column_dir}/{file_name}', mmap_mode='r')
+
+    def __len__(self):
+        return len(self._columns.employee_numbers)
+
+    def __contains__(self, employee_number):
+        return self._find_rows(self._columns, [employee_number])[0] >= 0
+
+    def get(self, employee_number):
+        columns = self._columns
+        row = self._find_rows(columns, [employee_number])[0]
+        if row < 0:
+            return None
+        return {field: str(columns.text[field][row]) for field in TLC_FIELDS}
+
+    def render_balances(self, employee_numbers, balances=TLC_BALANCES):
+        columns = self._columns
+        rows = self._find_rows(columns, employee_numbers)
+        found = rows >= 0
+        rows = rows[found]
+        values = {field: np.asarray(columns.values[field][rows]) for field in TLC_FIELDS}
+        text = {field: columns.text[field][rows].astype(object) for field in TLC_FIELDS}
+        details, rendered_balances = TlcTable._render(values, text)
+        return TlcTable._join(found, details, rendered_balances, balances)
+
+    @staticmethod
+    def _find_rows(columns, employee_numbers):
+        employee_numbers_column = columns.employee_numbers
+        keys = np.array([str(n).encode('utf-8') for n in employee_numbers], dtype=bytes)
+        if len(keys) == 0 or len(employee_numbers_column) == 0:
+            return np.full(len(keys), -1, dtype=np.intp)
+        rows = np.searchsorted(employee_numbers_column, keys).astype(np.intp)
+        rows[rows >= len(employee_numbers_column)] = 0
+        return np.where(employee_numbers_column[rows] == keys, rows, -1)
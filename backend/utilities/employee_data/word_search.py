@@ -1,16 +1,141 @@
+import logging
 import re
-from datetime import datetime
+import threading
+from functools import lru_cache
+from typing import NamedTuple
+
+from eds_util import (PROJECT_ROOT_DIR, EMPLOYEE_DATA_DIR, EMPLOYEE_CONFIG_DIR, EMPLOYEE_STORE_SNAPSHOT, TLC_DATA_FILE,
+                      EMPLOYEE_SHARD_DIR, EMPLOYEE_CACHE_SIZE,
+                      ANSWER_CACHE_SIZE, ANSWER_CACHE_TTL,
+                      REPLACE_KEYS, USER_KEYS_1, USER_KEYS_2, USER_DETAILS_KEYS, EXCLUSION_KEYS_1, EXCLUSION_KEYS_2)
+from ..common.LRUCache import LRUCache
+from .absence_view import get_absence_data, prepare_employee_record
+from .description_template import DescriptionTemplate
+from .employee_shards import ShardedEmployeeStore
+from .employee_store import EmployeeStore
+from .keyword_index import KeywordIndex
+from .tlc_table import MappedTlcTable, TlcTable
+
+
+
+class EmployeeData(NamedTuple):
+    """The employee config index, the employee records and the TLC table the searches read."""
+    keyword_index: KeywordIndex
+    employee_store: object
+    tlc_table: object
+
+
+_employee_data = None
+_employee_data_lock = threading.Lock()
+
+
+def get_employee_data() -> EmployeeData:
+    """
+    Loads the employee data on first use, or when the app warms up a worker, so importing this module reads no
+    files. The keyword_index, employee_store and tlc_table attributes of the module are the loaded ones.
+    """
+    global _employee_data
+    employee_data = _employee_data
+    if employee_data is None:
+        with _employee_data_lock:
+            if _employee_data is None:
+                _employee_data = _load_employee_data()
+            employee_data = _employee_data
+    return employee_data
+
+
+def _load_employee_data() -> EmployeeData:
+    keyword_index = KeywordIndex(f'{PROJECT_ROOT_DIR}/{EMPLOYEE_CONFIG_DIR}/employee.json')
+    if EMPLOYEE_SHARD_DIR:
+        employee_store = ShardedEmployeeStore(f'{PROJECT_ROOT_DIR}/{EMPLOYEE_DATA_DIR}', EMPLOYEE_SHARD_DIR,
+                                              prepare_record=prepare_employee_record, cache_size=EMPLOYEE_CACHE_SIZE)
+        tlc_table = MappedTlcTable(f'{EMPLOYEE_SHARD_DIR}/tlc')
+    else:
+        employee_store = EmployeeStore(f'{PROJECT_ROOT_DIR}/{EMPLOYEE_DATA_DIR}', EMPLOYEE_STORE_SNAPSHOT,
+                                       prepare_record=prepare_employee_record)
+        tlc_table = TlcTable(f'{PROJECT_ROOT_DIR}/{EMPLOYEE_DATA_DIR}/{TLC_DATA_FILE}')
+    return EmployeeData(keyword_index, employee_store, tlc_table)
+
+
+def __getattr__(name):
+    if name in EmployeeData._fields:
+        return getattr(get_employee_data(), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-from eds_util import PROJECT_ROOT_DIR, EMPLOYEE_DATA_DIR, employee_config, get_json, tlc_data, REPLACE_KEYS
+
+# search_json results by normalized query, employee and the versions of every file they were computed from
+answer_cache = LRUCache(ANSWER_CACHE_SIZE, ANSWER_CACHE_TTL)
+# employee config keys of the balances that are also reported from TLC
+TLC_BALANCE_KEYS = {'sickPlanBalance': 'sick', 'ptoBalance': 'pto', 'vacationBalance': 'vacation'}
+WORDS_PATTERN_CACHE_SIZE = 1024
 
 
 def search_json(query: str, employee_number=None):
-    print(f'Query: {query}')
-    employee_dict = get_json(f'{PROJECT_ROOT_DIR}/{EMPLOYEE_DATA_DIR}/{employee_number}.json')
+    logging.debug(f'Query: {query}')
+    employee_data = get_employee_data()
+    employee_dict, employee_version = employee_data.employee_store.get_with_version(employee_number)
+    index = employee_data.keyword_index.get_snapshot()
+    return _get_answer(normalize_query(query), employee_dict, employee_version, employee_number, index,
+                       employee_data.tlc_table.refresh().version)
+
+
+def search_json_batch(queries):
+    """
+    Runs search_json for a list of (query, employee_number) tuples and returns the results in input order.
+    Queries are grouped by employee so every record is loaded once, and each distinct query is normalized
+    and resolved against the keyword index once for the whole batch. Answers go through answer_cache like
+    the ones of search_json.
+    """
+    employee_data = get_employee_data()
+    index = employee_data.keyword_index.get_snapshot()
+    tlc_version = employee_data.tlc_table.refresh().version
+    normalized_queries = {}
+    keyword_hits = {}
+    employee_queries = {}
+    for position, (query, employee_number) in enumerate(queries):
+        if query not in normalized_queries:
+            normalized_queries[query] = normalize_query(query)
+        _query = normalized_queries[query]
+        employee_queries.setdefault(str(employee_number), []).append((position, _query))
+
+    results = [None] * len(queries)
+    for employee_number, positions in employee_queries.items():
+        employee_dict, employee_version = employee_data.employee_store.get_with_version(employee_number)
+        for position, _query in positions:
+            results[position] = _get_answer(_query, employee_dict, employee_version, employee_number, index,
+                                            tlc_version, keyword_hits)
+    return results
+
+
+def _get_answer(query, employee_dict, employee_version, employee_number, index, tlc_version, keyword_hits=None):
+    # a changed employee file, tlc_data.json or employee config gives a new key, so stale answers are never read.
+    # index is one KeywordIndexSnapshot, the key and the answer are of the same config
+    cache_key = (query, str(employee_number), employee_version, tlc_version, index.version)
+    result = answer_cache.get(cache_key)
+    if result is None:
+        if keyword_hits is None:
+            hits = index.lookup(_get_search_words(query))
+        else:
+            # shared by the queries of a batch
+            if query not in keyword_hits:
+                keyword_hits[query] = index.lookup(_get_search_words(query))
+            hits = keyword_hits[query]
+        result = _search_employee(query, employee_dict, employee_number, index, hits)
+        answer_cache.put(cache_key, result)
+    # results are shared between requests, callers get their own list of the read-only result records
+    return list(result) if type(result) is list else {}
+
+
+def normalize_query(query):
     # remove special characters from query
     query = re.sub(r'[^a-z0-9 ]', '', query.strip().lower())
-    query = replace_words(query)
-    result_list = dict_lookup(query, employee_dict, employee_config)
+    return replace_words(query)
+
+
+def _search_employee(query, employee_dict, employee_number, index, keyword_hits):
+    employee_config = index.config
+    result_list = dict_lookup(query, employee_dict, employee_config, keyword_hits=keyword_hits,
+                              templates=index.templates)
     if len(result_list) > 0:
         result_list = sorted(result_list, key=lambda i: i['score'])
         last_dict = result_list[-1]
@@ -35,26 +160,7 @@ def replace_words(query):
 
 
 def get_final_result(employee_number, high_score_result_list, is_balance_exist):
-    _tlc = {}
-    if is_balance_exist:
-        _tlc = tlc_data.get(str(employee_number))
-        _tlc_details = "\n\n"
-        if _tlc:
-            _tlc_details = "as per information available in TLC system"
-        if _tlc and int(_tlc.get('floating_holiday')) > 0:
-            _tlc_details = f"{_tlc_details}, Floating Holidays {_tlc.get('floating_holiday')}"
-        if _tlc and int(_tlc.get('reward_time')) > 0:
-            _tlc_details = f"{_tlc_details}, Reward time is {_tlc.get('reward_time')}"
-        if _tlc and int(_tlc.get('caregiver')) > 0:
-            _tlc_details = f"{_tlc_details}, Caregiver is {_tlc.get('caregiver')}"
-        if _tlc and int(_tlc.get('unpaid_protected_time')) > 0:
-            _tlc_details = f"{_tlc_details}, Unpaid Protected Time is {_tlc.get('unpaid_protected_time')}"
-        if _tlc and int(_tlc.get('pay_continuation')) > 0:
-            _tlc_details = f"{_tlc_details}, pay continuation is {_tlc.get('pay_continuation')}"
-        if _tlc and int(_tlc.get('mandated_time')) > 0:
-            _tlc_details = f"{_tlc_details}, mandated time is {_tlc.get('mandated_time')}"
-
-    is_printable = False
+    _balances = []
     final_result_list = []
     for d in high_score_result_list:
         if 'miscellaneous' not in d and not (len(high_score_result_list) > 1
@@ -64,131 +170,129 @@ def get_final_result(employee_number, high_score_result_list, is_balance_exist):
 
             # Add TLC data
             if is_balance_exist:
-                if 'sickPlanBalance' in d:
-                    is_printable = True
-                    _sick_balance = 0
-                    if _tlc and int(_tlc.get('sick')) > 0:
-                        _sick_balance = _tlc.get('sick')
-                    elif _tlc and int(_tlc.get('sick_leave')) > 0:
-                        _sick_balance = _tlc.get('sick_leave')
-                    _tlc_details = f"{_tlc_details}, sick leave balance is {_sick_balance} " \
-                                   f"and sick bank (carry forward sick leave) balance is {_tlc.get('sickb')}"
-                if 'ptoBalance' in d:
-                    is_printable = True
-                    _tlc_details = f"{_tlc_details}, PTO balance is {_tlc.get('pto')}"
-                if 'vacationBalance' in d:
-                    is_printable = True
-                    _tlc_details = f"{_tlc_details}, Vacation balance is {_tlc.get('vacation')}"
-
-    if is_balance_exist and is_printable:
+                _balances.extend(balance for key, balance in TLC_BALANCE_KEYS.items() if key in d)
+
+    if _balances:
+        _tlc_details = get_employee_data().tlc_table.refresh().render_balances([employee_number], _balances)[0]
         final_result_list.append({'description': _tlc_details})
 
     return final_result_list
 
 
-def dict_lookup(query: str, employee_dict: dict, config: dict, result_list=None):
+def _get_search_words(query):
+    _search_words = {w.strip().lower() for w in query.split()}
+    _search_words.add(query)
+    return _search_words
+
+
+def dict_lookup(query: str, employee_dict: dict, config: dict, result_list=None, keyword_hits=None, path=(),
+                templates=None):
+    """
+    keyword_hits maps config paths to their number of matched keywords, see KeywordIndex.lookup, and templates
+    maps them to their DescriptionTemplate. Both are taken from keyword_index when not given, so config must
+    then be keyword_index.config.
+    """
     if result_list is None:
         result_list = []
 
-    _search_words = {w.strip().lower() for w in query.split()}
-    _search_words.add(query)
+    _search_words = _get_search_words(query)
+    if keyword_hits is None or templates is None:
+        index = get_employee_data().keyword_index.get_snapshot()
+        keyword_hits = index.lookup(_search_words) if keyword_hits is None else keyword_hits
+        templates = index.templates if templates is None else templates
 
     # check if miscellaneous have more matches
     if 'miscellaneous' in config:
-        miscellaneous_keywords = {c.lower() for c in config.get('miscellaneous').get('keywords')}
-        mis_count = len(_search_words & miscellaneous_keywords)
+        mis_count = keyword_hits.get(path + ('miscellaneous',), 0)
         if mis_count > 0:
-            result_list.append(create_dict(config, 'miscellaneous', 'miscellaneous', _search_words, mis_count))
+            result_list.append(templates[path + ('miscellaneous',)].create_result('miscellaneous', _search_words,
+                                                                                  mis_count))
 
     _unprocessed_value_dict = []
 
     for key, value in employee_dict.items():
         if key in config:
             if 'keywords' not in config.get(key):
-                _unprocessed_value_dict.append((query, value, config.get(key)))
+                _unprocessed_value_dict.append((query, value, config.get(key), path + (key,)))
             else:
-                _keywords = {c.lower() for c in config.get(key).get('keywords')}
-                if len(_search_words & _keywords) > 0:
-                    result_list.append(create_dict(config, key, value, _search_words, len(_search_words & _keywords)))
+                _count = keyword_hits.get(path + (key,), 0)
+                if _count > 0:
+                    result_list.append(templates[path + (key,)].create_result(value, _search_words, _count))
                 elif type(value) is not dict and len(find_in_value(_search_words, value)) > 0:
-                    result_list.append(create_dict(config, key, value, _search_words))
+                    result_list.append(templates[path + (key,)].create_result(value, _search_words))
 
     for tup in _unprocessed_value_dict:
-        _que, _dic, _con = tup
-        get_absence_data(_dic)
-        dict_lookup(_que, _dic, _con, result_list)
+        _que, _dic, _con, _path = tup
+        dict_lookup(_que, get_absence_data(_dic), _con, result_list, keyword_hits, _path, templates)
 
     return result_list
 
 
-def get_absence_data(_dic):
-    # this condition checks if this is absence dictionary
-    if 'eligibleToPurchasePto' in _dic:
-        if 'eligible' != _dic.get('eligibleToPurchasePto', '').strip().lower():
-            del _dic['purchasedPtoBalance']
-        if 'not eligible' == _dic.get('sickPlanEligibility', '').strip().lower():
-            del _dic['sickPlanBalance']
-        if 'vacation' in _dic.get('timeOffPlanType', '').strip().lower():
-            del _dic['ptoBalance']
-        else:
-            del _dic['vacationBalance']
-        # Change date format to Month dd, YYYY
-        _r_date = _dic.get('ptoRefreshDate')
-        _r_date = datetime.strptime(_r_date[:_r_date.rfind('-')], '%Y-%m-%d')
-        _dic['ptoRefreshDate'] = _r_date.strftime('%B %d, %Y')
-
-
 def score_calculation(key_config, search_words, score):
-    for score_word in key_config.get('score'):
-        is_match_found = False
-        if score_word in search_words:
-            is_match_found = True
-        else:
-            for word in search_words:
-                if score_word in word:
-                    is_match_found = True
-
-        if is_match_found:
-            score = score + 1
-        else:
-            score = score - 1
-
-    return score
+    return DescriptionTemplate('', key_config).get_score(search_words, score)
 
 
 def create_dict(config, key, value, search_words, score=1):
-    score = score_calculation(config.get(key), search_words, score) if 'score' in config.get(key) else score
-    # TODO - if score = 0 then check if we can not add that dictionary
-    _new_dict = {'score': score, key: value}
-    _config_dict = config.get(key)
-    aggr_dict = {**_config_dict, **_new_dict}
-
-    _desc = aggr_dict.get('description')
-    if 'isResponseMultiple' in config.get(key):
-        _val = '_'.join([v for v in str(value).strip().lower().split()])
-        if 'sickPlanEligibility' == key:
-            is_eligibility_check = len(search_words & {'eligible', 'eligibility'}) > 0
-            if 'not_eligible' == _val:
-                _desc = f"{_desc.get('no')}" if is_eligibility_check else _desc.get('not_eligible')
-            else:
-                _desc = f"{_desc.get('yes')}" if is_eligibility_check else f"{_desc.get('eligible')}"
-        else:
-            _desc = _desc.get(_val)
-    else:
-        if type(value) == dict:
-            value = ' '.join([str(v) for v in value.values()])
-    aggr_dict['description'] = _desc.format(value=value)
+    """Builds the merged result dict of one config entry, dict_lookup uses the templates of keyword_index instead."""
+    return dict(DescriptionTemplate(key, config.get(key)).create_result(value, search_words, score))
+
 
-    return aggr_dict
+@lru_cache(maxsize=WORDS_PATTERN_CACHE_SIZE)
+def compile_words_pattern(words):
+    return re.compile('|'.join(_get_words_expressions(words)), flags=re.I | re.X)
 
 
 def find_in_value(_search_words, value):
-    _search_words_boundary = [fr'\b{w}\b' for w in _search_words]
-    r_str = fr"{'|'.join(_search_words_boundary)}"
-    r = re.compile(r_str, flags=re.I | re.X)
-    res = r.findall(str(value))
+    # _search_words can also be a pattern from compile_words_pattern, e.g. one of the prebuilt *_PATTERN constants
+    if not isinstance(_search_words, re.Pattern):
+        # alternation order matters for words like 'time' and 'time-off', so only sets are keyed by content
+        words = frozenset(_search_words) if isinstance(_search_words, (set, frozenset)) else tuple(_search_words)
+        _search_words = compile_words_pattern(words)
+    res = _search_words.findall(str(value))
     return res
 
+
+def compile_gate_pattern(**keyword_lists):
+    """
+    One pattern over several keyword lists, each in a named group, so a gate scans its text once and tells
+    the lists apart by the lastgroup of every match. Values are lists of regular expressions.
+    """
+    return re.compile('|'.join(f"(?P<{name}>{'|'.join(expressions)})" for name, expressions in keyword_lists.items()),
+                      flags=re.I)
+
+
+def _get_words_expressions(words):
+    return [fr'\b{w}\b' for w in words]
+
+
+# Patterns of the constant keyword lists are compiled once and kept out of the LRU cache.
+# The gates match them on the search words joined by spaces
+MANAGER_PERSONAL_INFO_PATTERN = compile_gate_pattern(exclusion_1=_get_words_expressions(EXCLUSION_KEYS_1),
+                                                     exclusion_2=_get_words_expressions(EXCLUSION_KEYS_2))
+# USER_KEYS_2 are matched anywhere in the words, like `key.lower() in query.lower()`
+USER_PATTERN = compile_gate_pattern(user_1=_get_words_expressions(USER_KEYS_1),
+                                    user_2=[re.escape(key.lower()) for key in USER_KEYS_2])
+USER_DETAILS_KEYS_PATTERN = compile_words_pattern.__wrapped__(tuple(USER_DETAILS_KEYS))
+
+
+def is_manager_personal_info(_search_words):
+    """True for more than one EXCLUSION_KEYS_1 and at least one EXCLUSION_KEYS_2 match in _search_words."""
+    counts = {'exclusion_1': 0, 'exclusion_2': 0}
+    for match in MANAGER_PERSONAL_INFO_PATTERN.finditer(' '.join(_search_words)):
+        counts[match.lastgroup] += 1
+        if counts['exclusion_1'] > 1 and counts['exclusion_2'] > 0:
+            return True
+    return False
+
+
+def is_user(query, _search_words):
+    """True when _search_words, the split words of query, have a USER_KEYS_1 word or a USER_KEYS_2 key."""
+    return USER_PATTERN.search(' '.join(_search_words)) is not None
+
+
+def is_user_details(_search_words):
+    return USER_DETAILS_KEYS_PATTERN.search(' '.join(_search_words)) is not None
+
 # if __name__ == '__main__':
 #     questions = [
 #         'What is plan 1?',
@@ -0,0 +1,99 @@
+import asyncio
+import contextlib
+
+import aiohttp
+
+from .EnvHelper import EnvHelper
+from .HttpSessionHelper import RETRY_STATUS_CODES
+
+
+class AsyncHttpSessionHelper:
+    """
+    aiohttp counterpart of HttpSessionHelper for the ASGI mode, configured by the same HTTP_* settings.
+    One ClientSession is opened per event loop with start(), and calls are retried with exponential backoff
+    on 429 and 5xx responses, honouring Retry-After, both the posts and the SDK calls made through retry().
+    """
+
+    def __init__(self, env_helper: EnvHelper = None) -> None:
+        env_helper = env_helper if env_helper else EnvHelper()
+        self.pool_maxsize = env_helper.HTTP_POOL_MAXSIZE
+        self.keepalive_idle = env_helper.HTTP_KEEPALIVE_IDLE
+        self.timeout = aiohttp.ClientTimeout(sock_connect=env_helper.HTTP_CONNECT_TIMEOUT,
+                                             sock_read=env_helper.HTTP_READ_TIMEOUT)
+        self.max_retries = env_helper.HTTP_MAX_RETRIES
+        self.backoff_factor = env_helper.HTTP_BACKOFF_FACTOR
+        self.session = None
+        self.requests_total = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    async def start(self):
+        connector = aiohttp.TCPConnector(limit=self.pool_maxsize, keepalive_timeout=self.keepalive_idle)
+        self.session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self.session
+
+    async def close(self):
+        if self.session:
+            await self.session.close()
+            self.session = None
+
+    @contextlib.asynccontextmanager
+    async def post(self, url: str, **kwargs):
+        """Posts to url and yields the response, a streamed response counts as in flight until it is closed."""
+        self.requests_total += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            for attempt in range(self.max_retries + 1):
+                response = await self.session.post(url, **kwargs)
+                if response.status not in RETRY_STATUS_CODES or attempt == self.max_retries:
+                    break
+                delay = self.get_retry_delay(response, attempt)
+                response.release()
+                await asyncio.sleep(delay)
+            async with response:
+                yield response
+        finally:
+            self.in_flight -= 1
+
+    async def retry(self, fn, *args, **kwargs):
+        """
+        Awaits fn with the retry policy of post(), for clients that send their own requests over the session
+        such as openai.ChatCompletion.acreate: errors with an http_status to retry on are retried.
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await fn(*args, **kwargs)
+            except Exception as e:
+                if getattr(e, 'http_status', None) not in RETRY_STATUS_CODES or attempt == self.max_retries:
+                    raise
+                await asyncio.sleep(self.get_retry_delay(e, attempt))
+
+    def get_retry_delay(self, response, attempt: int) -> float:
+        # the response of post(), or the error of retry(), both carry the response headers
+
+        retry_after = (response.headers or {}).get('Retry-After', '')
+        if retry_after.isdigit():
+            return float(retry_after)
+        return self.backoff_factor * (2 ** attempt)
+
+    @staticmethod
+    async def iter_lines(response):
+        """Yields the lines of a streamed response without their line breaks, whatever their length."""
+        pending = b''
+        async for data in response.content.iter_any():
+            lines = (pending + data).splitlines(keepends=True)
+            pending = lines.pop() if lines and not lines[-1].endswith((b'\n', b'\r')) else b''
+            for line in lines:
+                yield line.rstrip(b'\r\n')
+        if pending:
+            yield pending
+
+    def get_stats(self) -> dict:
+        return {
+            'requests_total': self.requests_total,
+            'in_flight': self.in_flight,
+            'peak_in_flight': self.peak_in_flight,
+            'pool_maxsize': self.pool_maxsize,
+            'saturation': self.in_flight / self.pool_maxsize if self.pool_maxsize else 0.0,
+        }
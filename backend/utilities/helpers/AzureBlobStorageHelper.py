@@ -27,6 +27,10 @@ class AzureBlobStorageClient:
         blob_client = self.blob_service_client.get_blob_client(container=self.container_name, blob=file_name)
         return blob_client.download_blob().readall()
     
+    def get_etag(self, file_name, **kwargs):
+        blob_client = self.blob_service_client.get_blob_client(container=self.container_name, blob=file_name)
+        return blob_client.get_blob_properties(**kwargs).etag
+
     def delete_file(self, file_name):
         """
         Deletes a file from the Azure Blob Storage container.
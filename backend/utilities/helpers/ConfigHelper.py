@@ -1,4 +1,5 @@
 import json
+from azure.core.exceptions import ResourceNotFoundError
 from .AzureBlobStorageHelper import AzureBlobStorageClient
 from ..document_chunking import ChunkingSettings, ChunkingStrategy
 from ..document_loading import LoadingSettings, LoadingStrategy
@@ -70,6 +71,18 @@ class ConfigHelper:
         #     config = ConfigHelper.get_default_config()
         return config 
     
+    @staticmethod
+    def get_active_config_version():
+        """ETag of the active config blob, it changes with every save. None without a blob storage account."""
+        if not EnvHelper().AZURE_BLOB_ACCOUNT_NAME:
+            return None
+        try:
+            # polled, a failed check is simply repeated at the next one instead of retried
+            return AzureBlobStorageClient(container_name=CONFIG_CONTAINER_NAME).get_etag(
+                "active.json", retry_total=0, connection_timeout=5, read_timeout=5)
+        except ResourceNotFoundError:
+            return None
+
     @staticmethod
     def save_config_as_active(config):
         blob_client = AzureBlobStorageClient(container_name=CONFIG_CONTAINER_NAME)
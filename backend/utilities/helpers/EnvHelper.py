@@ -5,8 +5,13 @@ from dotenv import load_dotenv
 logger = logging.getLogger(__name__)
 
 class EnvHelper:
+    # .env is read once per process, load_dotenv never overrides variables that are already set anyway
+    _dotenv_loaded = False
+
     def __init__(self, **kwargs) -> None:
-        load_dotenv()
+        if not EnvHelper._dotenv_loaded:
+            load_dotenv()
+            EnvHelper._dotenv_loaded = True
         # Azure Search
         self.AZURE_SEARCH_SERVICE = os.getenv('AZURE_SEARCH_SERVICE', '')
         self.AZURE_SEARCH_INDEX = os.getenv('AZURE_SEARCH_INDEX', '')
@@ -66,9 +71,54 @@ class EnvHelper:
         if 'https' not in self.AZURE_CONTENT_SAFETY_ENDPOINT and 'api.cognitive.microsoft.com' not in self.AZURE_CONTENT_SAFETY_ENDPOINT:
             self.AZURE_CONTENT_SAFETY_ENDPOINT = self.AZURE_FORM_RECOGNIZER_ENDPOINT
         self.AZURE_CONTENT_SAFETY_KEY = os.getenv('AZURE_CONTENT_SAFETY_KEY', '')
+        # Check the input while the message is already being answered, the answer waits for the check to pass
+        self.CONTENT_SAFETY_PARALLEL_INPUT = os.getenv('CONTENT_SAFETY_PARALLEL_INPUT', 'false').lower() == 'true'
+        self.CONTENT_SAFETY_MAX_WORKERS = int(os.getenv('CONTENT_SAFETY_MAX_WORKERS', 8))
+        # Check the streamed answers in sentence windows, a window is released once its check passed
+        self.CONTENT_SAFETY_STREAMING = os.getenv('CONTENT_SAFETY_STREAMING', 'false').lower() == 'true'
+        self.CONTENT_SAFETY_WINDOW_MIN_CHARS = int(os.getenv('CONTENT_SAFETY_WINDOW_MIN_CHARS', 100))
+        self.CONTENT_SAFETY_WINDOW_MAX_CHARS = int(os.getenv('CONTENT_SAFETY_WINDOW_MAX_CHARS', 1000))
         # Orchestration Settings
         self.ORCHESTRATION_STRATEGY = os.getenv('ORCHESTRATION_STRATEGY', 'openai_function')
-    
+        # Outbound HTTP connection pool
+        self.HTTP_POOL_CONNECTIONS = int(os.getenv('HTTP_POOL_CONNECTIONS', 10))
+        self.HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', 32))
+        self.HTTP_POOL_BLOCK = os.getenv('HTTP_POOL_BLOCK', 'false').lower() == 'true'
+        self.HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', 5))
+        self.HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', 120))
+        self.HTTP_MAX_RETRIES = int(os.getenv('HTTP_MAX_RETRIES', 3))
+        self.HTTP_BACKOFF_FACTOR = float(os.getenv('HTTP_BACKOFF_FACTOR', 0.5))
+        self.HTTP_KEEPALIVE_IDLE = int(os.getenv('HTTP_KEEPALIVE_IDLE', 60))
+        # JSON serializer of the chat endpoints: auto, orjson or json
+        self.JSON_SERIALIZER = os.getenv('JSON_SERIALIZER', 'auto').lower()
+        # Admission control of the upstream chat calls, requests per second per deployment, 0 admits all
+        self.ADMISSION_RATE = float(os.getenv('ADMISSION_RATE', 0))
+        self.ADMISSION_BURST = float(os.getenv('ADMISSION_BURST', 0))
+        self.ADMISSION_MAX_QUEUE = int(os.getenv('ADMISSION_MAX_QUEUE', 32))
+        self.ADMISSION_MAX_WAIT = float(os.getenv('ADMISSION_MAX_WAIT', 10))
+        # per deployment rates, e.g. gpt-35-turbo=5,gpt-4=1
+        self.ADMISSION_DEPLOYMENT_RATES = os.getenv('ADMISSION_DEPLOYMENT_RATES', '')
+        # Server-side conversation history: memory or disk, not set keeps it off
+        self.CONVERSATION_STORE = os.getenv('CONVERSATION_STORE', '').lower()
+        self.CONVERSATION_STORE_MAXSIZE = int(os.getenv('CONVERSATION_STORE_MAXSIZE', 1000))
+        self.CONVERSATION_STORE_TTL = float(os.getenv('CONVERSATION_STORE_TTL', 3600))
+        self.CONVERSATION_STORE_MAX_MESSAGES = int(os.getenv('CONVERSATION_STORE_MAX_MESSAGES', 50))
+        self.CONVERSATION_STORE_DIR = os.getenv('CONVERSATION_STORE_DIR', '')
+        # Chat history kept in a prompt, older turns are folded into an LLM summary, 0 keeps all of it, e.g. 2000
+        self.PROMPT_HISTORY_MAX_TOKENS = int(os.getenv('PROMPT_HISTORY_MAX_TOKENS', 0))
+        self.PROMPT_SUMMARY_FOLD_TURNS = int(os.getenv('PROMPT_SUMMARY_FOLD_TURNS', 4))
+        self.PROMPT_SUMMARY_MAX_TOKENS = int(os.getenv('PROMPT_SUMMARY_MAX_TOKENS', 300))
+        self.PROMPT_TOKEN_ENCODING = os.getenv('PROMPT_TOKEN_ENCODING', 'cl100k_base')
+        # Local intent routing, plain questions skip the orchestrator LLM hop and go straight to the answering tool.
+        # Off by default, set INTENT_ROUTER=true to turn it on, INTENT_ROUTER_MIN_CONFIDENCE is the confidence a
+        # message needs for the fast path
+        self.INTENT_ROUTER = os.getenv('INTENT_ROUTER', 'false').lower() == 'true'
+        self.INTENT_ROUTER_MIN_CONFIDENCE = float(os.getenv('INTENT_ROUTER_MIN_CONFIDENCE', 0.8))
+        # Seconds between checks of the active config blob, the services are rebuilt when it changed, 0 turns it off
+        self.CONFIG_CHECK_INTERVAL = float(os.getenv('CONFIG_CHECK_INTERVAL', 60))
+        # Token expected in the X-Reload-Token header of /api/config/reload, not set disables the endpoint
+        self.CONFIG_RELOAD_TOKEN = os.getenv('CONFIG_RELOAD_TOKEN', '')
+
     @staticmethod
     def check_env():
         for attr, value in EnvHelper().__dict__.items():
@@ -0,0 +1,135 @@
+import socket
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.util.retry import Retry
+
+from .EnvHelper import EnvHelper
+
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """
+    HTTPAdapter with a default timeout, TCP keep-alive on pooled connections and counters to size the pool:
+    requests sent, requests in flight and the most connections that were checked out of a pool at once.
+    """
+
+    def __init__(self, timeout=None, keepalive_idle=0, **kwargs) -> None:
+        self.timeout = timeout
+        self.keepalive_idle = keepalive_idle
+        self.requests_total = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.peak_in_use = 0
+        self._counter_lock = threading.Lock()
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        if self.keepalive_idle > 0:
+            socket_options = HTTPConnection.default_socket_options + [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+            if hasattr(socket, 'TCP_KEEPIDLE'):
+                socket_options.append((socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, self.keepalive_idle))
+            pool_kwargs['socket_options'] = socket_options
+        super().init_poolmanager(connections, maxsize, block, **pool_kwargs)
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        with self._counter_lock:
+            self.requests_total += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            return super().send(request, stream=stream, timeout=timeout if timeout else self.timeout,
+                                verify=verify, cert=cert, proxies=proxies)
+        finally:
+            # sampled once the response is in, a streamed response still holds its connection here
+            in_use = sum(p['in_use'] for p in self.get_pool_stats())
+            with self._counter_lock:
+                self.in_flight -= 1
+                self.peak_in_use = max(self.peak_in_use, in_use)
+
+    def get_pool_stats(self):
+        stats = []
+        pools = self.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None or pool.pool is None:
+                continue
+            # the queue holds the idle connections, a checked out connection is missing from it
+            stats.append({'host': pool.host, 'maxsize': pool.pool.maxsize,
+                          'in_use': pool.pool.maxsize - pool.pool.qsize(),
+                          'connections_created': pool.num_connections, 'requests': pool.num_requests})
+        return stats
+
+    def get_stats(self) -> dict:
+        pools = self.get_pool_stats()
+        in_use = sum(p['in_use'] for p in pools)
+        maxsize = self._pool_maxsize * max(len(pools), 1)
+        return {
+            'requests_total': self.requests_total,
+            'in_flight': self.in_flight,
+            'peak_in_flight': self.peak_in_flight,
+            'in_use': in_use,
+            'peak_in_use': self.peak_in_use,
+            'pool_maxsize': self._pool_maxsize,
+            'pool_block': self._pool_block,
+            'saturation': in_use / maxsize,
+            'pools': pools,
+        }
+
+
+class SharedSession(requests.Session):
+    """Session that lives as long as the process, the openai SDK closes its sessions every few minutes."""
+
+    def close(self):
+        pass
+
+
+class HttpSessionHelper:
+    """
+    Process-wide requests.Session shared by every outbound call, so connections to the Azure OpenAI endpoint
+    are kept alive and reused instead of paying a TCP and TLS handshake per chat turn.
+    Calls are retried with exponential backoff on 429 and 5xx responses, honouring Retry-After.
+    get_openai() imports the openai SDK and points it at the same session.
+    """
+    _session = None
+    _adapter = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_session(cls) -> requests.Session:
+        if cls._session is None:
+            with cls._lock:
+                if cls._session is None:
+                    cls._session, cls._adapter = cls.create_session(EnvHelper())
+        return cls._session
+
+    @classmethod
+    def get_openai(cls):
+        # imported on first use, the SDK and its dependencies take a noticeable share of the app startup
+        import openai
+        openai.requestssession = cls.get_session()
+        return openai
+
+    @staticmethod
+    def create_session(env_helper: EnvHelper):
+        retry = Retry(total=env_helper.HTTP_MAX_RETRIES, backoff_factor=env_helper.HTTP_BACKOFF_FACTOR,
+                      status_forcelist=RETRY_STATUS_CODES, allowed_methods=None, respect_retry_after_header=True,
+                      raise_on_status=False)
+        adapter = PooledHTTPAdapter(timeout=(env_helper.HTTP_CONNECT_TIMEOUT, env_helper.HTTP_READ_TIMEOUT),
+                                    keepalive_idle=env_helper.HTTP_KEEPALIVE_IDLE,
+                                    pool_connections=env_helper.HTTP_POOL_CONNECTIONS,
+                                    pool_maxsize=env_helper.HTTP_POOL_MAXSIZE, pool_block=env_helper.HTTP_POOL_BLOCK,
+                                    max_retries=retry)
+        session = SharedSession()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session, adapter
+
+    @classmethod
+    def get_stats(cls) -> dict:
+        if cls._adapter is None:
+            return {}
+        return cls._adapter.get_stats()
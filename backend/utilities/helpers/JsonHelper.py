@@ -0,0 +1,93 @@
+import json
+
+from .EnvHelper import EnvHelper
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class StdlibJsonSerializer:
+    """Standard library json, used when orjson is not installed or JSON_SERIALIZER=json."""
+    name = 'json'
+
+    def dumps(self, obj) -> str:
+        return json.dumps(obj)
+
+    def dumpb(self, obj) -> bytes:
+        return json.dumps(obj).encode('utf-8')
+
+    def to_line(self, obj) -> str:
+        # json.dumps escapes every control character, so the output never holds a raw line break
+        return json.dumps(obj) + "\n"
+
+    def loads(self, data):
+        if isinstance(data, bytes):
+            data = data.decode('utf-8')
+        return json.loads(data)
+
+
+class OrjsonSerializer(StdlibJsonSerializer):
+    """
+    orjson, several times faster than json.dumps on the chat responses. The output is compact UTF-8,
+    non-string dict keys are converted like json does, and numpy scalars and arrays are serialized natively.
+    """
+    name = 'orjson'
+    OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY if orjson else 0
+
+    def dumps(self, obj) -> str:
+        return orjson.dumps(obj, option=self.OPTIONS).decode('utf-8')
+
+    def dumpb(self, obj) -> bytes:
+        return orjson.dumps(obj, option=self.OPTIONS)
+
+    def to_line(self, obj) -> str:
+        return orjson.dumps(obj, option=self.OPTIONS | orjson.OPT_APPEND_NEWLINE).decode('utf-8')
+
+    def loads(self, data):
+        return orjson.loads(data)
+
+
+SERIALIZERS = {StdlibJsonSerializer.name: StdlibJsonSerializer}
+if orjson:
+    SERIALIZERS[OrjsonSerializer.name] = OrjsonSerializer
+
+
+class JsonHelper:
+    """
+    Serializer for the request and response bodies of the chat endpoints, chosen with JSON_SERIALIZER:
+    auto (default, orjson when installed), orjson or json.
+    to_line writes one newline-delimited event of a streamed response in a single pass.
+    """
+    _serializer = None
+
+    @classmethod
+    def get_serializer(cls):
+        if cls._serializer is None:
+            cls._serializer = cls.create_serializer(EnvHelper().JSON_SERIALIZER)
+        return cls._serializer
+
+    @staticmethod
+    def create_serializer(name: str = 'auto'):
+        if name == 'auto':
+            name = OrjsonSerializer.name if orjson else StdlibJsonSerializer.name
+        if name not in SERIALIZERS:
+            raise ValueError(f"Unknown JSON serializer {name}, expected one of {', '.join(SERIALIZERS)}")
+        return SERIALIZERS[name]()
+
+    @classmethod
+    def dumps(cls, obj) -> str:
+        return cls.get_serializer().dumps(obj)
+
+    @classmethod
+    def dumpb(cls, obj) -> bytes:
+        return cls.get_serializer().dumpb(obj)
+
+    @classmethod
+    def to_line(cls, obj) -> str:
+        return cls.get_serializer().to_line(obj)
+
+    @classmethod
+    def loads(cls, data):
+        return cls.get_serializer().loads(data)
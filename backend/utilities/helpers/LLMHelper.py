@@ -4,28 +4,29 @@ from langchain.chat_models import AzureChatOpenAI
 from langchain.embeddings import OpenAIEmbeddings
 from langchain.callbacks.streaming_stdout import StreamingStdOutCallbackHandler
 from .EnvHelper import EnvHelper
+from .HttpSessionHelper import HttpSessionHelper
 
 class LLMHelper:
     def __init__(self):
         env_helper: EnvHelper = EnvHelper()
 
-        # Configure OpenAI API
-        openai.api_type = "azure"
-        openai.api_version = env_helper.AZURE_OPENAI_API_VERSION
-        openai.api_base = env_helper.OPENAI_API_BASE
-        openai.api_key = env_helper.OPENAI_API_KEY
+        # Configure OpenAI API, passed with every call: the openai globals are shared by the threads of a worker
+        openai.requestssession = HttpSessionHelper.get_session()
+        self.api_version = env_helper.AZURE_OPENAI_API_VERSION
+        self.openai_kwargs = dict(api_type="azure", api_version=self.api_version,
+                                  api_base=env_helper.OPENAI_API_BASE, api_key=env_helper.OPENAI_API_KEY)
         
         self.llm_model = env_helper.AZURE_OPENAI_MODEL
         self.llm_max_tokens = env_helper.AZURE_OPENAI_MAX_TOKENS if env_helper.AZURE_OPENAI_MAX_TOKENS != '' else None
         self.embedding_model = env_helper.AZURE_OPENAI_EMBEDDING_MODEL
                     
     def get_llm(self):
-        return AzureChatOpenAI(deployment_name=self.llm_model, temperature=0, max_tokens=self.llm_max_tokens, openai_api_version=openai.api_version)
+        return AzureChatOpenAI(deployment_name=self.llm_model, temperature=0, max_tokens=self.llm_max_tokens, openai_api_version=self.api_version)
     
     # TODO: This needs to have a custom callback to stream back to the UI
     def get_streaming_llm(self):
         return AzureChatOpenAI(streaming=True, callbacks=[StreamingStdOutCallbackHandler], deployment_name=self.llm_model, temperature=0, 
-                               max_tokens=self.llm_max_tokens, openai_api_version=openai.api_version)
+                               max_tokens=self.llm_max_tokens, openai_api_version=self.api_version)
     
     def get_embedding_model(self):
         return OpenAIEmbeddings(deployment=self.embedding_model, chunk_size=1)
@@ -36,10 +37,12 @@ class LLMHelper:
             messages=messages,
             functions=functions,
             function_call=function_call,
+            **self.openai_kwargs,
             )
         
     def get_chat_completion(self, messages: List[dict]):
         return openai.ChatCompletion.create(
             deployment_id=self.llm_model,
             messages=messages,
+            **self.openai_kwargs,
             )
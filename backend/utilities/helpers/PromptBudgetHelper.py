@@ -0,0 +1,205 @@
+import hashlib
+import logging
+import threading
+
+from .EnvHelper import EnvHelper
+from ..common.LRUCache import LRUCache
+
+SUMMARY_PROMPT = """Summarize the conversation below between a user and an assistant in at most {max_words} words.
+Keep names, numbers, dates and the facts the assistant gave, the summary replaces the conversation in later prompts.
+
+{conversation}"""
+
+
+class PromptBudget:
+    """The chat history that fits the budget of one prompt, and the summary of the turns folded out of it."""
+
+    def __init__(self, chat_history: list, summary: str = '', history_tokens: int = 0, summary_tokens: int = 0,
+                 folded_turns: int = 0) -> None:
+        self.chat_history = chat_history
+        self.summary = summary
+        self.history_tokens = history_tokens
+        self.summary_tokens = summary_tokens
+        self.folded_turns = folded_turns
+
+    @property
+    def prompt_tokens(self) -> int:
+        return self.history_tokens + self.summary_tokens
+
+    def get_summary_message(self) -> str:
+        return f"Summary of the earlier conversation: {self.summary}" if self.summary else ''
+
+    def to_dict(self) -> dict:
+        return {
+            'history_turns': len(self.chat_history),
+            'history_tokens': self.history_tokens,
+            'summary_tokens': self.summary_tokens,
+            'folded_turns': self.folded_turns,
+        }
+
+
+class PromptBudgetHelper:
+    """
+    Keeps the chat history of a prompt within PROMPT_HISTORY_MAX_TOKENS, counted with tiktoken like the document
+    chunkers do. The most recent (question, answer) turns are kept as they are, the older ones are folded into a
+    rolling summary, PROMPT_SUMMARY_FOLD_TURNS turns at a time so the summary only changes every few turns.
+    Summaries are cached by the turns they cover and a new one extends the longest cached one, so each turn is
+    summarized once per conversation. A budget of 0, the default, keeps the whole history and never calls the LLM.
+    With an admission_controller the summary calls are admitted like the chat calls they are made for.
+    """
+    _encoding = None
+    _encoding_lock = threading.Lock()
+    # shared by the app and the orchestrators
+    _summaries = LRUCache(maxsize=1024, ttl=3600)
+    _stats = {'prompts': 0, 'folded_prompts': 0, 'summaries': 0, 'summary_errors': 0, 'prompt_tokens_total': 0,
+              'max_prompt_tokens': 0}
+
+    def __init__(self, max_history_tokens: int = None, fold_turns: int = None, summary_max_tokens: int = None,
+                 summarizer=None, admission_controller=None) -> None:
+        env_helper: EnvHelper = EnvHelper()
+        self.max_history_tokens = env_helper.PROMPT_HISTORY_MAX_TOKENS if max_history_tokens is None \
+            else max_history_tokens
+        self.fold_turns = max(1, env_helper.PROMPT_SUMMARY_FOLD_TURNS if fold_turns is None else fold_turns)
+        self.summary_max_tokens = env_helper.PROMPT_SUMMARY_MAX_TOKENS if summary_max_tokens is None \
+            else summary_max_tokens
+        self.summarizer = summarizer or self.summarize_with_llm
+        self.admission_controller = admission_controller
+
+    @classmethod
+    def get_encoding(cls):
+        if cls._encoding is None:
+            with cls._encoding_lock:
+                if cls._encoding is None:
+                    import tiktoken
+                    try:
+                        cls._encoding = tiktoken.get_encoding(EnvHelper().PROMPT_TOKEN_ENCODING)
+                    except Exception:
+                        # tiktoken downloads its encodings on first use, count about 4 characters a token without it
+                        logging.exception("Could not load the tiktoken encoding, token counts are estimated")
+                        cls._encoding = False
+        return cls._encoding
+
+    @classmethod
+    def count_tokens(cls, text: str) -> int:
+        encoding = cls.get_encoding()
+        if encoding:
+            return len(encoding.encode(text, disallowed_special=()))
+        return (len(text) + 3) // 4
+
+    def count_turn_tokens(self, turn) -> int:
+        return self.count_tokens(turn[0]) + self.count_tokens(turn[1])
+
+    def fit(self, chat_history: list, question: str = '', before_summary=None) -> PromptBudget:
+        """
+        Returns the most recent turns of chat_history within the budget, always at least the last one.
+        The tokens of the question asked after them are counted in the prompt size, not in the budget.
+        before_summary is called before the summarizer when the summary is not cached, e.g. to wait for a check.
+        """
+        turn_tokens = [self.count_turn_tokens(turn) for turn in chat_history]
+        total, keep_from = 0, len(chat_history)
+        if self.max_history_tokens <= 0:
+            keep_from, total = 0, sum(turn_tokens)
+        else:
+            while keep_from > 0 and (total + turn_tokens[keep_from - 1] <= self.max_history_tokens
+                                     or keep_from == len(chat_history)):
+                keep_from -= 1
+                total += turn_tokens[keep_from]
+        budget = PromptBudget(chat_history, history_tokens=total)
+        if keep_from:
+            # fold whole blocks of turns, the folded prefix and so the summary stay the same for a few turns
+            folded = min(len(chat_history) - 1, -(-keep_from // self.fold_turns) * self.fold_turns)
+            budget = PromptBudget(chat_history[folded:], history_tokens=sum(turn_tokens[folded:]), folded_turns=folded)
+            budget.summary = self.get_summary(chat_history[:folded], before_summary)
+            budget.summary_tokens = self.count_tokens(budget.get_summary_message()) if budget.summary else 0
+        budget.history_tokens += self.count_tokens(question)
+        self._record(budget)
+        return budget
+
+    @staticmethod
+    def get_message_turns(messages: list) -> list:
+        """
+        Splits role and content messages into turns of a user message and the messages up to the next one, as
+        (question, answer, index of the first message) tuples. A question left unanswered, e.g. by a failed
+        request, is a turn of its own with an empty answer.
+        """
+        turns = []
+        for i, message in enumerate(messages):
+            role = message.get("role")
+            if role == "user" or not turns:
+                turns.append([message["content"] if role == "user" else '', '', i])
+            elif role == "assistant":
+                turns[-1][1] = f'{turns[-1][1]}\n{message["content"]}' if turns[-1][1] else message["content"]
+        return [tuple(turn) for turn in turns]
+
+    def fit_messages(self, messages: list):
+        """
+        fit for role and content messages ending with the new user message. Returns the messages to send and the
+        PromptBudget: all of them when nothing is folded, otherwise the messages of the kept turns as they are,
+        after the summary of the folded ones in an extra system message.
+        """
+        turns = self.get_message_turns(messages[:-1])
+        budget = self.fit([(question, answer) for question, answer, _ in turns], messages[-1]["content"])
+        fitted, kept = [], messages
+        if budget.folded_turns:
+            kept = messages[turns[budget.folded_turns][2]:]
+            if budget.summary:
+                fitted.append({"role": "system", "content": budget.get_summary_message()})
+        fitted += [{"role": message["role"], "content": message["content"]} for message in kept]
+        return fitted, budget
+
+    @staticmethod
+    def _get_summary_key(previous_key: str, turn) -> str:
+        return hashlib.sha256(f"{previous_key}\0{turn[0]}\0{turn[1]}".encode('utf-8')).hexdigest()
+
+    def get_summary(self, turns: list, before_summary=None) -> str:
+        keys, key = [], ''
+        for turn in turns:
+            key = self._get_summary_key(key, turn)
+            keys.append(key)
+        summary, summarized = '', 0
+        for i in range(len(keys), 0, -1):
+            cached = self._summaries.get(keys[i - 1])
+            if cached is not None:
+                summary, summarized = cached, i
+                break
+        if summarized == len(turns):
+            return summary
+        if before_summary:
+            before_summary()
+        try:
+            summary = self.summarizer(summary, turns[summarized:])
+            PromptBudgetHelper._stats['summaries'] += 1
+        except Exception:
+            # the prompt then goes without the turns that no longer fit
+            logging.exception("Exception while summarizing the chat history")
+            PromptBudgetHelper._stats['summary_errors'] += 1
+            return summary
+        self._summaries.put(keys[-1], summary)
+        return summary
+
+    def summarize_with_llm(self, previous_summary: str, turns: list) -> str:
+        from .LLMHelper import LLMHelper
+        conversation = [f"Summary so far: {previous_summary}"] if previous_summary else []
+        for question, answer in turns:
+            conversation += [f"User: {question}", f"Assistant: {answer}"]
+        prompt = SUMMARY_PROMPT.format(max_words=int(self.summary_max_tokens * 0.75),
+                                       conversation="\n".join(conversation))
+        llm_helper = LLMHelper()
+        if self.admission_controller:
+            self.admission_controller.admit(llm_helper.llm_model)
+        result = llm_helper.get_chat_completion([{"role": "user", "content": prompt}])
+        return result['choices'][0]['message']['content'].strip()
+
+    def _record(self, budget: PromptBudget):
+        stats = PromptBudgetHelper._stats
+        stats['prompts'] += 1
+        stats['folded_prompts'] += 1 if budget.folded_turns else 0
+        stats['prompt_tokens_total'] += budget.prompt_tokens
+        stats['max_prompt_tokens'] = max(stats['max_prompt_tokens'], budget.prompt_tokens)
+
+    @classmethod
+    def get_stats(cls) -> dict:
+        stats = dict(cls._stats)
+        stats['avg_prompt_tokens'] = stats['prompt_tokens_total'] / stats['prompts'] if stats['prompts'] else 0.0
+        stats['summary_cache'] = cls._summaries.stats()
+        return stats
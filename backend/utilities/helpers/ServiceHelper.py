@@ -0,0 +1,145 @@
+import logging
+import threading
+import time
+
+
+class ServiceContainer:
+    """
+    Owns the objects the custom conversation endpoint shares across requests: the active Config and the
+    orchestrator of its strategy, with its tools and clients. They are built once, on first use or by warm_up()
+    at startup, and rebuilt together by reload() when the configuration changes. Requests read the current pair
+    without locking, a reload swaps it in one assignment.
+    With a check_interval, the version of the active config (its blob ETag) is checked in the background at most
+    once per interval, started by the request that finds it due, and the services are rebuilt when it changed, so
+    a config saved from the admin pages reaches every worker without a reload call.
+    """
+
+    def __init__(self, config_loader=None, orchestrator_factory=None, version_loader=None, check_interval: float = 0,
+                 clock=time.monotonic):
+        self._config_loader = config_loader
+        self._orchestrator_factory = orchestrator_factory
+        self._version_loader = version_loader
+        self.check_interval = check_interval
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._check_lock = threading.Lock()
+        self._next_check = 0.0
+        self._services = None
+        self.config_version = None
+        self.version = 0
+        self.build_timings = {}
+        self.messages = 0
+        self.setup_seconds = 0.0
+
+    def _build(self):
+        start = time.perf_counter()
+        if self._config_loader is None or self._orchestrator_factory is None:
+            # ConfigHelper and the orchestrators pull in langchain and the Azure SDKs, imported on first use
+            from .ConfigHelper import ConfigHelper
+            from ..orchestrator import get_orchestrator
+            self._config_loader = self._config_loader or ConfigHelper.get_active_config_or_default
+            self._orchestrator_factory = self._orchestrator_factory or get_orchestrator
+            if self.check_interval > 0:
+                self._version_loader = self._version_loader or ConfigHelper.get_active_config_version
+        imported = time.perf_counter()
+        if self.check_interval > 0:
+            self._next_check = self.clock() + self.check_interval
+            try:
+                self.config_version = self._version_loader()
+            except Exception:
+                # unknown, the next check rebuilds the services
+                logging.exception("Exception while reading the active config version")
+                self.config_version = None
+        config = self._config_loader()
+        built_config = time.perf_counter()
+        strategy = config.orchestrator.strategy.value
+        orchestrator = self._orchestrator_factory(strategy, config)
+        self.build_timings = {
+            'strategy': strategy,
+            'import_ms': (imported - start) * 1e3,
+            'config_ms': (built_config - imported) * 1e3,
+            'orchestrator_ms': (time.perf_counter() - built_config) * 1e3,
+        }
+        self.version += 1
+        return config, orchestrator
+
+    def _get_services(self):
+        services = self._services
+        if services is None:
+            with self._lock:
+                if self._services is None:
+                    self._services = self._build()
+                services = self._services
+        elif self.check_interval > 0 and self.clock() >= self._next_check:
+            self.check_config_version_in_background()
+        return services
+
+    def check_config_version_in_background(self):
+        """Starts a check of the config version unless one is running, requests keep the current services."""
+        if not self._check_lock.acquire(blocking=False):
+            return None
+        self._next_check = self.clock() + self.check_interval
+        thread = threading.Thread(target=self._check_config_version, name='config-check', daemon=True)
+        thread.start()
+        return thread
+
+    def _check_config_version(self):
+        try:
+            if self._version_loader() != self.config_version:
+                logging.info("The active config changed, rebuilding the app services")
+                self.reload()
+        except Exception:
+            logging.exception("Exception while checking the active config version")
+        finally:
+            self._check_lock.release()
+
+    def get_config(self):
+        return self._get_services()[0]
+
+    def get_orchestrator(self):
+        return self._get_services()[1]
+
+    def reload(self) -> dict:
+        with self._lock:
+            self._services = self._build()
+        return self.get_stats()
+
+    def warm_up(self) -> str:
+        """Builds the services ahead of the first request and returns the startup timing report."""
+        try:
+            self._get_services()
+        except Exception:
+            # the first request builds them again and reports the error
+            logging.exception("Exception while building the app services")
+        return self.get_startup_report()
+
+    def warm_up_in_background(self) -> threading.Thread:
+        """Builds the services while the server already answers, a custom conversation waits for them."""
+        thread = threading.Thread(target=lambda: logging.info(self.warm_up()), name='services-warm-up', daemon=True)
+        thread.start()
+        return thread
+
+    def handle_message(self, **kwargs):
+        start = time.perf_counter()
+        orchestrator = self.get_orchestrator()
+        self.messages += 1
+        self.setup_seconds += time.perf_counter() - start
+        return orchestrator.handle_message(**kwargs)
+
+    def get_stats(self) -> dict:
+        return {
+            'version': self.version,
+            'config_version': self.config_version,
+            **self.build_timings,
+            'messages': self.messages,
+            'setup_us_avg': self.setup_seconds / self.messages * 1e6 if self.messages else 0.0,
+        }
+
+    def get_startup_report(self) -> str:
+        if not self.build_timings:
+            return "Services not built, they are built on the first request"
+        timings = self.build_timings
+        total_ms = timings['import_ms'] + timings['config_ms'] + timings['orchestrator_ms']
+        return (f"Services v{self.version} built in {total_ms:.1f} ms: imports {timings['import_ms']:.1f} ms, "
+                f"config {timings['config_ms']:.1f} ms, {timings['strategy']} orchestrator "
+                f"{timings['orchestrator_ms']:.1f} ms. Requests reuse them instead of building them per message.")
@@ -0,0 +1,147 @@
+from .JsonHelper import JsonHelper
+
+# Request header a client sends to receive delta events instead of the whole response on every event
+STREAM_MODE_HEADER = 'X-Stream-Mode'
+DELTA_STREAM_MODE = 'delta'
+
+
+def is_delta_stream(headers) -> bool:
+    return headers.get(STREAM_MODE_HEADER, '').strip().lower() == DELTA_STREAM_MODE
+
+
+def to_chunk(obj) -> str:
+    return JsonHelper.to_line(obj)
+
+
+def new_data_stream_response():
+    return {
+        "id": "",
+        "model": "",
+        "created": 0,
+        "object": "",
+        "choices": [{
+            "messages": []
+        }]
+    }
+
+
+def iter_data_stream_chunks(line, response, emp_data=None, delta=False):
+    """
+    Applies one line of the upstream stream to response and yields the chunks sent to the client: the whole
+    response so far, or in delta mode only what the line added, {"delta": {"index": <message>, ...}}.
+    A delta with a role starts a new message, one without appends its content to the message at index, and one
+    with "replace": true replaces the content of the message at index, it retracts a moderated answer.
+    """
+    lineJson = JsonHelper.loads(line.lstrip(b'data:'))
+    # print(f'Print response: {lineJson}')
+    if 'error' in lineJson:
+        yield to_chunk(lineJson)
+    response["id"] = lineJson["id"]
+    response["model"] = lineJson["model"]
+    response["created"] = lineJson["created"]
+    response["object"] = lineJson["object"]
+
+    messages = response["choices"][0]["messages"]
+    added = None
+    role = lineJson["choices"][0]["messages"][0]["delta"].get("role")
+    if role == "tool":
+        messages.append(lineJson["choices"][0]["messages"][0]["delta"])
+        added = {"index": len(messages) - 1, **messages[-1]}
+    elif role == "assistant":
+        print_msg = ""
+        if emp_data:
+            print_msg = f"As per the available data, {emp_data} \n\n"
+        messages.append({
+            "role": "assistant",
+            "content": f"{print_msg}"
+        })
+        added = {"index": len(messages) - 1, **messages[-1]}
+    elif lineJson["choices"][0]["messages"][0]["delta"].get("replace"):
+        messages[1]["content"] = lineJson["choices"][0]["messages"][0]["delta"]["content"]
+        added = {"index": 1, "content": messages[1]["content"], "replace": True}
+    else:
+        deltaText = lineJson["choices"][0]["messages"][0]["delta"]["content"]
+        if deltaText != "[DONE]":
+            messages[1]["content"] += deltaText
+            added = {"index": 1, "content": deltaText}
+
+    if not delta:
+        yield to_chunk(response)
+    elif added:
+        yield to_chunk({"delta": added})
+
+
+def get_without_data_response(line, response_text):
+    return {
+        "id": line["id"],
+        "model": line["model"],
+        "created": line["created"],
+        "object": line["object"],
+        "choices": [{
+            "messages": [{
+                "role": "assistant",
+                "content": response_text
+            }]
+        }]
+    }
+
+
+def format_without_data_chunk(line, response_text, delta=False):
+    """
+    Returns the response text including line and the chunk sent to the client for it,
+    in delta mode the chunk is None when the line adds no text.
+    """
+    delta_text = line["choices"][0]["delta"].get('content')
+    if line["choices"][0]["delta"].get('replace'):
+        return delta_text, to_chunk({"delta": {"index": 0, "role": "assistant", "content": delta_text, "replace": True}}) \
+            if delta else to_chunk(get_without_data_response(line, delta_text))
+    if not delta_text or delta_text == "[DONE]":
+        delta_text = ''
+    if delta:
+        added = {"index": 0, "role": "assistant", "content": delta_text} if not response_text else \
+            {"index": 0, "content": delta_text}
+        return response_text + delta_text, to_chunk({"delta": added}) if delta_text else None
+    response_text += delta_text
+    return response_text, to_chunk(get_without_data_response(line, response_text))
+
+
+def get_moderated_data_lines(line_json, cleared, moderator) -> list:
+    """Upstream lines of the with data stream for the text the moderator cleared and its retraction, if any."""
+    lines = []
+    for delta in ({"content": cleared}, {"content": moderator.get_retraction(), "replace": True}):
+        if delta["content"]:
+            lines.append(JsonHelper.dumpb({"id": line_json["id"], "model": line_json["model"],
+                                           "created": line_json["created"], "object": line_json["object"],
+                                           "choices": [{"messages": [{"delta": delta}]}]}))
+    return lines
+
+
+def moderate_data_stream_line(line, moderator) -> list:
+    """
+    The lines framed instead of an upstream line of the with data stream when its answer is moderated: the text
+    of the assistant is only the text the moderator cleared. Close the moderator at the end of the stream and
+    frame get_moderated_data_lines of what it returns.
+    """
+    lineJson = JsonHelper.loads(line.lstrip(b'data:'))
+    delta = lineJson["choices"][0]["messages"][0]["delta"] if 'choices' in lineJson else {}
+    if 'error' in lineJson or delta.get("role") or delta.get("content") == "[DONE]":
+        return [line]
+    return get_moderated_data_lines(lineJson, moderator.push(delta.get("content") or ''), moderator)
+
+
+def get_moderated_without_data_lines(line, cleared, moderator) -> list:
+    """Upstream lines of the without data stream for the text the moderator cleared and its retraction, if any."""
+    lines = []
+    for delta in ({"content": cleared}, {"content": moderator.get_retraction(), "replace": True}):
+        if delta["content"]:
+            lines.append({"id": line["id"], "model": line["model"], "created": line["created"],
+                          "object": line["object"], "choices": [{"delta": delta}]})
+    return lines
+
+
+def moderate_without_data_line(line, moderator) -> list:
+    """moderate_data_stream_line for the without data stream."""
+    delta_text = line["choices"][0]["delta"].get('content') if line["choices"] else None
+    if delta_text == "[DONE]":
+        delta_text = None
+    return get_moderated_without_data_lines(line, moderator.push(delta_text or ''), moderator)
@@ -0,0 +1,114 @@
+import re
+import threading
+from typing import List
+
+from ..helpers.EnvHelper import EnvHelper
+
+QUESTION_ANSWERING = 'question_answering'
+TEXT_PROCESSING = 'text_processing'
+
+QUESTION_START = re.compile(
+    r"^\s*(what|what's|whats|how|when|where|who|whom|whose|which|why|is|are|am|can|could|do|does|did|should|"
+    r"would|will|may|has|have|tell me|explain|describe|list|show me|give me|i want to know|i need to know)\b",
+    re.IGNORECASE)
+# requests for the Text Processing tool, the LLM splits them into an operation and a text
+TEXT_OPERATION = re.compile(
+    r"\b(translate|translation|translated|summari[sz]e|summary|summari[sz]ed|paraphrase|rephrase|reword|rewrite|"
+    r"proofread|make (it|this|that|the answer) (concise|shorter|longer|simpler)|concise|shorten|in (english|spanish|"
+    r"french|german|italian|portuguese|chinese|japanese|korean|hindi|arabic|dutch|russian))\b",
+    re.IGNORECASE)
+# a follow up needs the chat history to become a standalone question, which is what the LLM hop does
+FOLLOW_UP = re.compile(
+    r"(^\s*(and|also|what about|how about|same|then|so)\b)|\b(it|its|it's|this|that|these|those|they|them|their|"
+    r"he|him|his|she|her|above|previous|earlier|before|again|else|more|one)\b",
+    re.IGNORECASE)
+
+
+class IntentDecision:
+    """Where the router sends a message: straight to the answering tool when fast_path, else to the LLM hop."""
+
+    def __init__(self, intent: str = None, confidence: float = 0.0, reason: str = '', fast_path: bool = False) -> None:
+        self.intent = intent
+        self.confidence = confidence
+        self.reason = reason
+        self.fast_path = fast_path
+
+    def to_dict(self) -> dict:
+        return {
+            'intent': self.intent or 'llm',
+            'intent_confidence': self.confidence,
+            'intent_reason': self.reason,
+            'intent_fast_path': self.fast_path,
+        }
+
+
+class IntentRouter:
+    """
+    Picks the tool of a message without the orchestrator LLM hop when the keyword rules, or the optional local
+    classifier, are confident it is a plain question. Text operations and follow ups that need the chat history
+    go to the LLM as before. The latency saved is estimated from the LLM hops measured on the messages it routes.
+    A classifier is a callable of the message and the chat history returning an (intent, confidence) pair.
+    """
+    _lock = threading.Lock()
+    # shared by the orchestrators
+    _stats = {'messages': 0, 'fast_path': 0, 'llm_routed': 0, 'reasons': {}, 'llm_hops': 0,
+              'llm_hop_seconds_total': 0.0, 'saved_seconds_estimated': 0.0}
+
+    def __init__(self, enabled: bool = None, min_confidence: float = None, classifier=None) -> None:
+        env_helper: EnvHelper = EnvHelper()
+        self.enabled = env_helper.INTENT_ROUTER if enabled is None else enabled
+        self.min_confidence = env_helper.INTENT_ROUTER_MIN_CONFIDENCE if min_confidence is None else min_confidence
+        self.classifier = classifier
+
+    def route(self, user_message: str, chat_history: List[dict]) -> IntentDecision:
+        decision = self.decide(user_message, chat_history)
+        self._record(decision)
+        return decision
+
+    def decide(self, user_message: str, chat_history: List[dict]) -> IntentDecision:
+        if not self.enabled:
+            return IntentDecision(reason='disabled')
+        if TEXT_OPERATION.search(user_message):
+            return IntentDecision(TEXT_PROCESSING, 0.9, 'text_operation')
+        if chat_history and FOLLOW_UP.search(user_message):
+            return IntentDecision(reason='follow_up')
+        intent, confidence, reason = None, 0.0, 'no_rule'
+        if QUESTION_START.search(user_message):
+            intent, confidence, reason = QUESTION_ANSWERING, 0.9, 'question_rule'
+            confidence = 0.95 if user_message.rstrip().endswith('?') else confidence
+        elif user_message.rstrip().endswith('?'):
+            intent, confidence, reason = QUESTION_ANSWERING, 0.8, 'question_mark'
+        if self.classifier and confidence < self.min_confidence:
+            intent, confidence = self.classifier(user_message, chat_history)
+            reason = 'classifier'
+        fast_path = intent == QUESTION_ANSWERING and confidence >= self.min_confidence
+        return IntentDecision(intent, confidence, reason, fast_path)
+
+    def record_llm_hop(self, seconds: float):
+        """Duration of an orchestrator LLM hop, each fast path message is counted as saving the average one."""
+        with self._lock:
+            stats = IntentRouter._stats
+            stats['llm_hops'] += 1
+            stats['llm_hop_seconds_total'] += seconds
+
+    def _record(self, decision: IntentDecision):
+        with self._lock:
+            stats = IntentRouter._stats
+            stats['messages'] += 1
+            stats['reasons'][decision.reason] = stats['reasons'].get(decision.reason, 0) + 1
+            if decision.fast_path:
+                stats['fast_path'] += 1
+                if stats['llm_hops']:
+                    stats['saved_seconds_estimated'] += stats['llm_hop_seconds_total'] / stats['llm_hops']
+            else:
+                stats['llm_routed'] += 1
+
+    @classmethod
+    def get_stats(cls) -> dict:
+        with cls._lock:
+            stats = dict(cls._stats)
+            stats['reasons'] = dict(stats['reasons'])
+        stats['fast_path_ratio'] = stats['fast_path'] / stats['messages'] if stats['messages'] else 0.0
+        stats['avg_llm_hop_seconds'] = stats['llm_hop_seconds_total'] / stats['llm_hops'] if stats['llm_hops'] \
+            else 0.0
+        return stats
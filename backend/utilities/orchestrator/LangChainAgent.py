@@ -6,12 +6,13 @@ from langchain.agents import ZeroShotAgent, AgentExecutor
 from langchain.callbacks import get_openai_callback
 from langchain.chains import LLMChain
 from langchain.memory import ConversationBufferMemory
+from langchain.schema import SystemMessage
 
 from .OrchestratorBase import OrchestratorBase
 from ..common.Answer import Answer
 from ..helpers.LLMHelper import LLMHelper
 from ..parser.OutputParserTool import OutputParserTool
-from ..tools.ContentSafetyChecker import ContentSafetyChecker
+from ..tools.ContentSafetyChecker import ContentSafetyChecker, InputFlagged
 from ..tools.PostPromptTool import PostPromptTool
 from ..tools.QuestionAnswerTool import QuestionAnswerTool
 from ..tools.TextProcessingTool import TextProcessingTool
@@ -19,12 +20,11 @@ from ..tools.EdsQuestionAnswerTool import EdsQuestionAnswerTool
 
 
 class LangChainAgent(OrchestratorBase):
-    def __init__(self) -> None:
-        super().__init__()
-        self.chat_history = []
-        self.kwargs = {}
+    def __init__(self, config=None) -> None:
+        super().__init__(config)
         self.content_safety_checker = ContentSafetyChecker()
-        self.question_answer_tool = EdsQuestionAnswerTool()
+        self.question_answer_tool = EdsQuestionAnswerTool(self.config)
+        self.post_prompt_tool = PostPromptTool(self.config)
         # self.question_answer_tool = QuestionAnswerTool()
         self.text_processing_tool = TextProcessingTool()
         self.tools = [
@@ -43,8 +43,49 @@ class LangChainAgent(OrchestratorBase):
                 return_direct=True,
             )
         ]
+        self.llm_helper = LLMHelper()
+        self.output_formatter = OutputParserTool()
+        # the prompt, agent and executor only depend on the tools and the config, a message only brings its memory
+        self.agent_executor = self.create_agent_executor()
+
+    def create_agent_executor(self) -> AgentExecutor:
+        prefix = """Have a conversation with a human, answering the following questions as best you can. You have access to the following tools:"""
+        suffix = """Begin!"
+
+        {chat_history}
+        Question: {input}
+        {agent_scratchpad}"""
+        prompt = ZeroShotAgent.create_prompt(
+            self.tools,
+            prefix=prefix,
+            suffix=suffix,
+            input_variables=["input", "chat_history", "agent_scratchpad"],
+        )
+        # Define Agent and Agent Chain, without memory, the chat history is an input of each run
+        llm_chain = LLMChain(llm=self.llm_helper.get_llm(), prompt=prompt)
+        agent = ZeroShotAgent(llm_chain=llm_chain, tools=self.tools, verbose=True)
+        return AgentExecutor.from_agent_and_tools(agent=agent, tools=self.tools, verbose=True)
+
+    @property
+    def chat_history(self) -> list:
+        """Chat history of the message being handled, the tools run in the context of its request."""
+        return self._get_message_state()['chat_history']
+
+    @chat_history.setter
+    def chat_history(self, value: list):
+        self._get_message_state()['chat_history'] = value
+
+    @property
+    def kwargs(self) -> dict:
+        """Keyword arguments of the message being handled, employee data and questions to the search engine."""
+        return self._get_message_state()['kwargs']
+
+    @kwargs.setter
+    def kwargs(self, value: dict):
+        self._get_message_state()['kwargs'] = value
 
     def run_tool(self, user_message):
+        self.end_llm_hop()
         emp_data = {}
         if 'chat_history' in self.kwargs and user_message != self.kwargs.get('original_user_message'):
             emp_data['employee_data'] = self.chat_history[-1][1]
@@ -53,6 +94,7 @@ class LangChainAgent(OrchestratorBase):
 
         if 'questions_to_search_engine' in self.kwargs:
             emp_data['questions_to_search_engine'] = self.kwargs['questions_to_search_engine']
+        emp_data['before_answer'] = self.wait_for_input_check
 
         answer = self.question_answer_tool.answer_question(user_message, self.chat_history, **emp_data)
         answer_text = f"As per the available data, {self.kwargs['employee_data']}\n\n{answer.answer}" if 'employee_data' in self.kwargs else answer.answer
@@ -67,61 +109,70 @@ class LangChainAgent(OrchestratorBase):
         return new_answer.to_json()
 
     def run_text_processing_tool(self, user_message):
+        self.end_llm_hop()
+        self.wait_for_input_check()
         answer = self.text_processing_tool.answer_question(user_message, chat_history=[])
         return answer.to_json()
 
-    def orchestrate(self, user_message: str, chat_history: List[dict], **kwargs: dict) -> dict:
-        self.chat_history = chat_history
-        self.kwargs = kwargs
-        output_formatter = OutputParserTool()
-
-        # Call Content Safety tool
-        if self.config.prompts.enable_content_safety:
-            filtered_user_message = self.content_safety_checker.validate_input_and_replace_if_harmful(user_message)
-            if user_message != filtered_user_message:
-                messages = output_formatter.parse(question=user_message, answer=filtered_user_message,source_documents=[])
-                return messages
-
-        # Call function to determine route
-        llm_helper = LLMHelper()
-        prefix = """Have a conversation with a human, answering the following questions as best you can. You have access to the following tools:"""
-        suffix = """Begin!"
-
-        {chat_history}
-        Question: {input}
-        {agent_scratchpad}"""
-        prompt = ZeroShotAgent.create_prompt(
-            self.tools,
-            prefix=prefix,
-            suffix=suffix,
-            input_variables=["input", "chat_history", "agent_scratchpad"],
-        )
+    def run_agent(self, user_message: str, budget) -> str:
         # Create conversation memory
         memory = ConversationBufferMemory(memory_key="chat_history", return_messages=True)
-        for message in chat_history:
+        if budget.summary:
+            memory.chat_memory.add_message(SystemMessage(content=budget.get_summary_message()))
+        for message in budget.chat_history:
             memory.chat_memory.add_user_message(message[0])
             memory.chat_memory.add_ai_message(message[1])
-        # Define Agent and Agent Chain
-        llm_chain = LLMChain(llm=llm_helper.get_llm(), prompt=prompt)
-        agent = ZeroShotAgent(llm_chain=llm_chain, tools=self.tools, verbose=True)
-        agent_chain = AgentExecutor.from_agent_and_tools(
-            agent=agent, tools=self.tools, verbose=True, memory=memory
-        )
         # Run Agent Chain
+        self.start_llm_hop()
+        answer = self.agent_executor.run(input=user_message, **memory.load_memory_variables({}))
+        # answered without a tool, the whole run was the LLM hop
+        self.end_llm_hop()
+        return answer
+
+    def orchestrate(self, user_message: str, chat_history: List[dict], **kwargs: dict) -> dict:
+        output_formatter = self.output_formatter
+
+        # Call Content Safety tool, in parallel mode it runs alongside the work up to the answer generation
+        filtered_user_message = self.check_input(user_message)
+        if filtered_user_message:
+            return output_formatter.parse(question=user_message, answer=filtered_user_message, source_documents=[])
+        try:
+            return self.answer_message(user_message, chat_history, **kwargs)
+        except InputFlagged as e:
+            return output_formatter.parse(question=user_message, answer=e.filtered_message, source_documents=[])
+
+    def answer_message(self, user_message: str, chat_history: List[dict], **kwargs: dict) -> dict:
+        # the turns that do not fit the budget are replaced by their summary
+        budget = self.fit_chat_history(user_message, chat_history)
+        chat_history = budget.chat_history
+        self.chat_history = chat_history
+        self.kwargs = kwargs
+        output_formatter = self.output_formatter
+
+        # Plain questions go straight to the Question Answering tool, without the agent LLM call that picks it
+        decision = self.route_message(user_message, chat_history)
         with get_openai_callback() as cb:
             try:
-                answer = agent_chain.run(input=user_message)
+                if decision.fast_path:
+                    answer = self.run_tool(user_message)
+                else:
+                    # a flagged input never reaches the agent LLM
+                    self.wait_for_input_check()
+                    answer = self.run_agent(user_message, budget)
                 self.log_tokens(prompt_tokens=cb.prompt_tokens, completion_tokens=cb.completion_tokens)
+            except InputFlagged:
+                raise
             except Exception as e:
                 answer = str(e)
+        # nothing is answered before the input check passed, also when the agent answered without a tool
+        self.wait_for_input_check()
         try:
             answer = Answer.from_json(answer)
         except:
             answer = Answer(question=user_message, answer=answer)
 
         if self.config.prompts.enable_post_answering_prompt:
-            post_prompt_tool = PostPromptTool()
-            answer = post_prompt_tool.validate_answer(answer)
+            answer = self.post_prompt_tool.validate_answer(answer)
             self.log_tokens(prompt_tokens=answer.prompt_tokens, completion_tokens=answer.completion_tokens)
 
             # Call Content Safety tool
@@ -7,14 +7,19 @@ from ..helpers.ConfigHelper import ConfigHelper
 from ..tools.PostPromptTool import PostPromptTool
 from ..tools.QuestionAnswerTool import QuestionAnswerTool
 from ..tools.TextProcessingTool import TextProcessingTool
-from ..tools.ContentSafetyChecker import ContentSafetyChecker
+from ..tools.ContentSafetyChecker import ContentSafetyChecker, InputFlagged
 from ..parser.OutputParserTool import OutputParserTool
 from ..common.Answer import Answer
 
 class OpenAIFunctionsOrchestrator(OrchestratorBase):
-    def __init__(self) -> None:
-        super().__init__()   
+    def __init__(self, config=None) -> None:
+        super().__init__(config)
         self.content_safety_checker = ContentSafetyChecker()
+        self.llm_helper = LLMHelper()
+        self.answering_tool = QuestionAnswerTool(self.config)
+        self.post_prompt_tool = PostPromptTool(self.config)
+        self.text_processing_tool = TextProcessingTool()
+        self.output_formatter = OutputParserTool()
         self.functions = [
             {
                 "name": "search_documents",
@@ -50,59 +55,80 @@ class OpenAIFunctionsOrchestrator(OrchestratorBase):
             }
         ]
         
+    def answer_question(self, question: str, chat_history: List[dict]) -> Answer:
+        # run answering chain
+        answer = self.answering_tool.answer_question(question, chat_history, before_answer=self.wait_for_input_check)
+        self.log_tokens(prompt_tokens=answer.prompt_tokens, completion_tokens=answer.completion_tokens)
+
+        # Run post prompt if needed
+        if self.config.prompts.enable_post_answering_prompt:
+            answer = self.post_prompt_tool.validate_answer(answer)
+            self.log_tokens(prompt_tokens=answer.prompt_tokens, completion_tokens=answer.completion_tokens)
+        return answer
+
     def orchestrate(self, user_message: str, chat_history: List[dict], **kwargs: dict) -> dict:
-        output_formatter = OutputParserTool()
-        
-        # Call Content Safety tool
-        if self.config.prompts.enable_content_safety:
-            filtered_user_message = self.content_safety_checker.validate_input_and_replace_if_harmful(user_message)
-            if user_message != filtered_user_message:
-                messages = output_formatter.parse(question=user_message, answer=filtered_user_message, source_documents=[])
-                return messages
-        
+        output_formatter = self.output_formatter
+
+        # Call Content Safety tool, in parallel mode it runs alongside the work up to the answer generation
+        filtered_user_message = self.check_input(user_message)
+        if filtered_user_message:
+            return output_formatter.parse(question=user_message, answer=filtered_user_message, source_documents=[])
+        try:
+            return self.answer_message(user_message, chat_history, **kwargs)
+        except InputFlagged as e:
+            return output_formatter.parse(question=user_message, answer=e.filtered_message, source_documents=[])
+
+    def answer_message(self, user_message: str, chat_history: List[dict], **kwargs: dict) -> dict:
+        output_formatter = self.output_formatter
+
         # Call function to determine route
-        llm_helper = LLMHelper()
+        llm_helper = self.llm_helper
 
         system_message = """You help employees to navigate only private information sources.
         You must prioritize the function call over your general knowledge for any question by calling the search_documents function.
         Call the text_processing function when the user request an operation on the current context, such as translate, summarize, or paraphrase. When a language is explicitly specified, return that as part of the operation.
         When directly replying to the user, always reply in the language the user is speaking.
         """
-        # Create conversation history
-        messages = [{"role": "system", "content": system_message}]        
+        # Create conversation history, the turns that do not fit the budget are replaced by their summary
+        budget = self.fit_chat_history(user_message, chat_history)
+        chat_history = budget.chat_history
+        messages = [{"role": "system", "content": system_message}]
+        if budget.summary:
+            messages.append({"role": "system", "content": budget.get_summary_message()})
         for message in chat_history:
             messages.append({"role": "user", "content": message[0]})
             messages.append({"role": "assistant", "content": message[1]})
         messages.append({"role": "user", "content": user_message})
         
-        result = llm_helper.get_chat_completion_with_functions(messages, self.functions, function_call="auto")      
-        self.log_tokens(prompt_tokens=result['usage']['prompt_tokens'], completion_tokens=result['usage']['completion_tokens'])
-        
-        # TODO: call content safety if needed
-                        
-        if result['choices'][0]['finish_reason'] == "function_call":
-            if result['choices'][0]['message'].function_call.name == "search_documents":
-                question = json.loads(result['choices'][0]['message']['function_call']['arguments'])['question']
-                # run answering chain
-                answering_tool = QuestionAnswerTool()
-                answer = answering_tool.answer_question(question, chat_history)
+        # Plain questions go straight to the answering tool, without the function calling round trip that picks it
+        decision = self.route_message(user_message, chat_history)
+        if decision.fast_path:
+            answer = self.answer_question(user_message, chat_history)
+        else:
+            # a flagged input never reaches the function calling LLM
+            self.wait_for_input_check()
+            self.start_llm_hop()
+            result = llm_helper.get_chat_completion_with_functions(messages, self.functions, function_call="auto")
+            self.end_llm_hop()
+            self.log_tokens(prompt_tokens=result['usage']['prompt_tokens'], completion_tokens=result['usage']['completion_tokens'])
 
-                self.log_tokens(prompt_tokens=answer.prompt_tokens, completion_tokens=answer.completion_tokens)
+            # TODO: call content safety if needed
 
-                # Run post prompt if needed
-                if self.config.prompts.enable_post_answering_prompt:
-                    post_prompt_tool = PostPromptTool()
-                    answer = post_prompt_tool.validate_answer(answer)
-                    self.log_tokens(prompt_tokens=answer.prompt_tokens, completion_tokens=answer.completion_tokens)                
-            elif result['choices'][0]['message'].function_call.name == "text_processing":
-                text = json.loads(result['choices'][0]['message']['function_call']['arguments'])['text']
-                operation = json.loads(result['choices'][0]['message']['function_call']['arguments'])['operation']
-                text_processing_tool = TextProcessingTool()
-                answer = text_processing_tool.answer_question(user_message, chat_history, text=text, operation=operation)
-                self.log_tokens(prompt_tokens=answer.prompt_tokens, completion_tokens=answer.completion_tokens)
-        else:
-            text = result['choices'][0]['message']['content']
-            answer = Answer(question=user_message, answer=text)
+            if result['choices'][0]['finish_reason'] == "function_call":
+                if result['choices'][0]['message'].function_call.name == "search_documents":
+                    question = json.loads(result['choices'][0]['message']['function_call']['arguments'])['question']
+                    answer = self.answer_question(question, chat_history)
+                elif result['choices'][0]['message'].function_call.name == "text_processing":
+                    text = json.loads(result['choices'][0]['message']['function_call']['arguments'])['text']
+                    operation = json.loads(result['choices'][0]['message']['function_call']['arguments'])['operation']
+                    self.wait_for_input_check()
+                    answer = self.text_processing_tool.answer_question(user_message, chat_history, text=text, operation=operation)
+                    self.log_tokens(prompt_tokens=answer.prompt_tokens, completion_tokens=answer.completion_tokens)
+            else:
+                text = result['choices'][0]['message']['content']
+                answer = Answer(question=user_message, answer=text)
+        # nothing is answered before the input check passed, also when the model replied without a function
+        self.wait_for_input_check()
 
         # Call Content Safety tool
         if self.config.prompts.enable_content_safety:
@@ -1,23 +1,108 @@
 # Create an abstract class for orchestrator
+import contextvars
+import time
 from uuid import uuid4
 from typing import List, Optional
 from abc import ABC, abstractmethod
 from ..loggers.TokenLogger import TokenLogger
 from ..loggers.ConversationLogger import ConversationLogger
 from ..helpers.ConfigHelper import ConfigHelper
+from ..helpers.EnvHelper import EnvHelper
+from ..helpers.PromptBudgetHelper import PromptBudgetHelper
+from .IntentRouter import IntentRouter
+
+# message id, token counts and request data of the message being handled, an orchestrator instance is shared by
+# concurrent requests
+_message_state = contextvars.ContextVar('orchestrator_message_state')
+
 
 class OrchestratorBase(ABC):
-    def __init__(self) -> None:
+    def __init__(self, config=None) -> None:
         super().__init__()
-        self.config = ConfigHelper.get_active_config_or_default()
-        self.message_id = str(uuid4())
-        self.tokens = {
-            'prompt': 0,
-            'completion': 0,
-            'total': 0
-        }
+        self.config = config if config else ConfigHelper.get_active_config_or_default()
         self.token_logger : TokenLogger = TokenLogger()
+        self.prompt_budget_helper = PromptBudgetHelper()
+        self.intent_router = IntentRouter()
+        self.parallel_input_check = EnvHelper().CONTENT_SAFETY_PARALLEL_INPUT
         # self.conversation_logger : ConversationLogger = ConversationLogger()
+
+    def start_message(self) -> dict:
+        state = {
+            'message_id': str(uuid4()),
+            'tokens': {
+                'prompt': 0,
+                'completion': 0,
+                'total': 0
+            },
+            'prompt_budget': None,
+            'intent': None,
+            'input_check': None,
+            'chat_history': [],
+            'kwargs': {}
+        }
+        _message_state.set(state)
+        return state
+
+    def _get_message_state(self) -> dict:
+        state = _message_state.get(None)
+        return state if state is not None else self.start_message()
+
+    @property
+    def message_id(self) -> str:
+        return self._get_message_state()['message_id']
+
+    @property
+    def tokens(self) -> dict:
+        return self._get_message_state()['tokens']
+
+    @property
+    def prompt_budget(self):
+        """The PromptBudget of the chat history of the message being handled."""
+        return self._get_message_state()['prompt_budget']
+
+    def fit_chat_history(self, user_message: str, chat_history: List[dict]):
+        # the summary of the folded turns is an LLM call, it waits for the input check like the other ones
+        budget = self.prompt_budget_helper.fit(chat_history, user_message, before_summary=self.wait_for_input_check)
+        self._get_message_state()['prompt_budget'] = budget
+        return budget
+
+    def check_input(self, user_message: str) -> Optional[str]:
+        """
+        Content safety of the user message, returns the message to answer with when the input is flagged.
+        In parallel mode the check is only started, wait_for_input_check raises InputFlagged if it flags the input.
+        """
+        if not self.config.prompts.enable_content_safety:
+            return None
+        if self.parallel_input_check:
+            self._get_message_state()['input_check'] = self.content_safety_checker.start_input_check(user_message)
+            return None
+        filtered_user_message = self.content_safety_checker.validate_input_and_replace_if_harmful(user_message)
+        return filtered_user_message if filtered_user_message != user_message else None
+
+    def wait_for_input_check(self, block: bool = True):
+        # the gate in front of the work a flagged input must not get, without block it only stops a finished check
+        pending = self._get_message_state()['input_check']
+        if pending:
+            pending.wait(block)
+
+    @property
+    def intent(self):
+        """The IntentDecision of the message being handled."""
+        return self._get_message_state()['intent']
+
+    def route_message(self, user_message: str, chat_history: List[dict]):
+        decision = self.intent_router.route(user_message, chat_history)
+        self._get_message_state()['intent'] = decision
+        return decision
+
+    def start_llm_hop(self):
+        self._get_message_state()['llm_hop_started'] = time.perf_counter()
+
+    def end_llm_hop(self):
+        # the LLM call that picks the tool, what a fast path message saves
+        started = self._get_message_state().pop('llm_hop_started', None)
+        if started is not None:
+            self.intent_router.record_llm_hop(time.perf_counter() - started)
     
     def log_tokens(self, prompt_tokens, completion_tokens):
         self.tokens['prompt'] += prompt_tokens
@@ -29,6 +114,7 @@ class OrchestratorBase(ABC):
         pass
     
     def handle_message(self, user_message: str, chat_history: List[dict], conversation_id: Optional[str], **kwargs: Optional[dict]) -> dict:
+        self.start_message()
         result = self.orchestrate(user_message, chat_history, **kwargs)
         if self.config.logging.log_tokens:
             custom_dimensions = {
@@ -38,6 +124,10 @@ class OrchestratorBase(ABC):
                 "completion_tokens": self.tokens['completion'],
                 "total_tokens": self.tokens['total']
             }
+            if self.prompt_budget:
+                custom_dimensions.update(self.prompt_budget.to_dict())
+            if self.intent:
+                custom_dimensions.update(self.intent.to_dict())
             self.token_logger.log("Conversation", custom_dimensions=custom_dimensions)
         # if self.config.logging.log_user_interactions:
         #     self.conversation_logger.log(messages=[{"role": "user", "content": user_message, "conversation_id": conversation_id}] + result)
@@ -6,14 +6,13 @@ class OrchestrationStrategy(Enum):
     LANGCHAIN = 'langchain'
 
 
-def get_orchestrator(orchestration_strategy: str):
+def get_orchestrator(orchestration_strategy: str, config=None):
     if orchestration_strategy == OrchestrationStrategy.OPENAI_FUNCTION.value:
         from .OpenAIFunctions import OpenAIFunctionsOrchestrator
-        return OpenAIFunctionsOrchestrator()
+        return OpenAIFunctionsOrchestrator(config)
     elif orchestration_strategy == OrchestrationStrategy.LANGCHAIN.value:
-        # from .LangChainAgent import langchain_agent
-        # return LangChainAgent()
-        from app import langchain_agent
-        return langchain_agent
+        # built once and shared by the ServiceContainer of the app
+        from .LangChainAgent import LangChainAgent
+        return LangChainAgent(config)
     else:
         raise Exception(f"Unknown orchestration strategy: {orchestration_strategy}")
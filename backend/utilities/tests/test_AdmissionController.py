@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+
+from ..common.AdmissionController import AdmissionController, AdmissionRejected
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+
+
+def test_burst_is_admitted_then_calls_wait_in_order():
+    clock = FakeClock()
+    controller = AdmissionController(rate=2, burst=2, clock=clock, sleep=clock.sleep)
+    waits = [controller.reserve('gpt') for _ in range(4)]
+    assert waits == [0.0, 0.0, 0.5, 1.0]
+    assert controller.get_stats()['deployments']['gpt']['queue_depth'] == 2
+    clock.now += 1
+    assert controller.reserve('gpt') == 0.5
+
+
+def test_full_queue_and_missed_deadline_are_rejected_with_retry_after():
+    clock = FakeClock()
+    controller = AdmissionController(rate=1, max_queue=2, max_wait=5, clock=clock, sleep=clock.sleep)
+    controller.reserve('gpt')
+    controller.reserve('gpt')
+    with pytest.raises(AdmissionRejected) as e:
+        controller.reserve('gpt', deadline=clock.now + 1)
+    assert e.value.reason == 'deadline exceeded'
+    controller.reserve('gpt')
+    with pytest.raises(AdmissionRejected) as e:
+        controller.reserve('gpt')
+    assert e.value.reason == 'queue full' and e.value.get_retry_after_header() == '3'
+    stats = controller.get_stats()['deployments']['gpt']
+    assert stats['rejected_queue_full'] == 1 and stats['rejected_deadline'] == 1
+    # rejected calls give their token back
+    assert controller._buckets['gpt'].tokens == -2
+
+
+def test_admit_sleeps_and_records_the_wait_per_deployment():
+    clock = FakeClock()
+    controller = AdmissionController(rate=1, rates={'gpt-4': 4}, clock=clock, sleep=clock.sleep)
+    for _ in range(2):
+        controller.admit('gpt')
+        controller.admit('gpt-4')
+    assert clock.sleeps == [1.0]
+    deployments = controller.get_stats()['deployments']
+    assert deployments['gpt']['max_wait_seconds'] == 1.0 and deployments['gpt']['queue_depth'] == 0
+    assert deployments['gpt-4']['queued'] == 0 and deployments['gpt-4']['admitted'] == 2
+
+
+def test_rate_zero_admits_everything():
+    controller = AdmissionController()
+    asyncio.run(controller.aadmit('gpt'))
+    assert controller.reserve('gpt') == 0.0 and controller.get_stats()['deployments'] == {}
+
+
+def test_cancelled_wait_leaves_the_queue_and_refunds_its_token():
+    controller = AdmissionController(rate=10, burst=1)
+
+    async def cancel_waiting_call():
+        await controller.aadmit('gpt')
+        task = asyncio.create_task(controller.aadmit('gpt'))
+        await asyncio.sleep(0.01)
+        assert controller.get_stats()['deployments']['gpt']['queue_depth'] == 1
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel_waiting_call())
+    stats = controller.get_stats()['deployments']['gpt']
+    assert stats['queue_depth'] == 0 and stats['cancelled'] == 1 and stats['admitted'] == 1
+    assert controller._buckets['gpt'].tokens > -0.5
+
+
+def test_failed_sleep_leaves_the_queue():
+    def interrupted(seconds):
+        raise KeyboardInterrupt
+
+    controller = AdmissionController(rate=1, sleep=interrupted)
+    controller.admit('gpt')
+    with pytest.raises(KeyboardInterrupt):
+        controller.admit('gpt')
+    stats = controller.get_stats()['deployments']['gpt']
+    assert stats['queue_depth'] == 0 and stats['cancelled'] == 1
+    assert controller.reserve('gpt') < 1.5
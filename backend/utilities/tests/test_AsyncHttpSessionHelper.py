@@ -0,0 +1,76 @@
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from ..helpers.AsyncHttpSessionHelper import AsyncHttpSessionHelper
+from ..helpers.EnvHelper import EnvHelper
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    responses = []
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        status = self.responses.pop(0) if self.responses else 200
+        data = b'data: {"a": 1}\r\n\r\ndata: ' + b'x' * 100000 + b'\ndata: {"b": 2}'
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server_url():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_port}/chat'
+    server.shutdown()
+
+
+def test_post_retries_and_streams_lines(server_url, monkeypatch):
+    monkeypatch.setenv('HTTP_BACKOFF_FACTOR', '0')
+    http_session = AsyncHttpSessionHelper(EnvHelper())
+
+    async def post():
+        await http_session.start()
+        try:
+            async with http_session.post(server_url, json={}) as response:
+                assert http_session.in_flight == 1
+                return response.status, [line async for line in http_session.iter_lines(response)]
+        finally:
+            await http_session.close()
+
+    Handler.responses = [503, 429]
+    status, lines = asyncio.run(post())
+    assert status == 200
+    assert lines == [b'data: {"a": 1}', b'', b'data: ' + b'x' * 100000, b'data: {"b": 2}']
+    assert http_session.get_stats()['requests_total'] == 1 and http_session.in_flight == 0
+
+
+class UpstreamError(Exception):
+    def __init__(self, http_status, headers=None):
+        super().__init__(f'status {http_status}')
+        self.http_status = http_status
+        self.headers = headers
+
+
+def test_retry_retries_sdk_errors_with_a_retry_status(monkeypatch):
+    monkeypatch.setenv('HTTP_BACKOFF_FACTOR', '0')
+    http_session = AsyncHttpSessionHelper(EnvHelper())
+    errors = [UpstreamError(429, {'Retry-After': '0'}), UpstreamError(503)]
+
+    async def create(**kwargs):
+        if errors:
+            raise errors.pop(0)
+        return kwargs
+
+    assert asyncio.run(http_session.retry(create, messages=[])) == {'messages': []}
+
+    errors = [UpstreamError(400)]
+    with pytest.raises(UpstreamError):
+        asyncio.run(http_session.retry(create))
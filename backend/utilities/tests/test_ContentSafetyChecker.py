@@ -1,5 +1,8 @@
+import threading
+import time
+
 import pytest
-from ..tools.ContentSafetyChecker import ContentSafetyChecker
+from ..tools.ContentSafetyChecker import ContentSafetyChecker, StreamModerator
 
 def test_document_chunking_layout():
     
@@ -12,3 +15,49 @@ def test_document_chunking_layout():
     assert cut.validate_output_and_replace_if_harmful(safe_input) == safe_input
     assert cut.validate_input_and_replace_if_harmful(unsafe_input) != unsafe_input
     assert cut.validate_output_and_replace_if_harmful(unsafe_input) != unsafe_input
+
+
+class WindowChecker:
+    """Flags the texts with a blocked word, each check waits for its release when hold is set."""
+
+    def __init__(self, blocked=('hate',), hold=False):
+        self.blocked = blocked
+        self.checked = []
+        self.release = threading.Event()
+        if not hold:
+            self.release.set()
+
+    def validate_output_and_replace_if_harmful(self, text):
+        self.release.wait(5)
+        self.checked.append(text)
+        return "Retracted." if all(word in text for word in self.blocked) else text
+
+
+def test_stream_is_released_by_sentence_windows_once_checked():
+    checker = WindowChecker(hold=True)
+    moderator = StreamModerator(checker, min_window_chars=10, max_window_chars=40)
+    assert moderator.push("The leave is ") == ''
+    assert moderator.push("12 weeks. It is") == ''
+    checker.release.set()
+    time.sleep(0.1)
+    assert moderator.push(" paid") == "The leave is 12 weeks. "
+    assert moderator.close() == "It is paid"
+    # the whole answer is checked again at the end
+    assert checker.checked[-1] == "The leave is 12 weeks. It is paid"
+    assert moderator.get_retraction() is None
+
+
+def test_failed_window_stops_the_stream_and_retracts_it_once():
+    moderator = StreamModerator(WindowChecker(), min_window_chars=10, max_window_chars=40)
+    released = moderator.push("The leave is 12 weeks. ")
+    released += moderator.push("I hate this policy. And more text")
+    released += moderator.close()
+    assert released == "The leave is 12 weeks. " and moderator.get_retraction() == "Retracted."
+    assert moderator.get_retraction() is None and moderator.push("more") == ''
+
+
+def test_content_spread_over_windows_is_caught_by_the_final_check():
+    moderator = StreamModerator(WindowChecker(blocked=('short', 'dumb')), min_window_chars=10, max_window_chars=40)
+    released = moderator.push("Some people are short. ") + moderator.push("They are dumb.")
+    released += moderator.close()
+    assert "short" in released and moderator.get_retraction() == "Retracted."
@@ -0,0 +1,61 @@
+import os
+
+from ..common.ConversationStore import ConversationStore, MemoryConversationBackend, DiskConversationBackend
+
+
+def ask(store, conversation_id, question, answer):
+    messages = store.get_messages(conversation_id, [{'role': 'user', 'content': question}])
+    store.save(conversation_id, messages, [{'role': 'tool', 'content': '{}'}, {'role': 'assistant', 'content': answer}])
+    return messages
+
+
+def test_client_sends_only_the_new_message():
+    store = ConversationStore(MemoryConversationBackend())
+    ask(store, 'c1', 'q1', 'a1')
+    messages = ask(store, 'c1', 'q2', 'a2')
+    assert ConversationStore.get_chat_history(messages[:-1]) == [('q1', 'a1')]
+    assert messages[-1] == {'role': 'user', 'content': 'q2'}
+    # tool messages are not kept
+    assert len(store.backend.get('c1')) == 4
+
+
+def test_full_history_from_the_client_is_used_as_is_and_disabled_store_passes_through():
+    store = ConversationStore(MemoryConversationBackend())
+    ask(store, 'c1', 'q1', 'a1')
+    sent = [{'role': 'user', 'content': 'x'}, {'role': 'assistant', 'content': 'y'}, {'role': 'user', 'content': 'z'}]
+    assert store.get_messages('c1', sent) is sent
+    disabled = ConversationStore()
+    ask(disabled, 'c1', 'q1', 'a1')
+    assert disabled.get_messages('c1', sent[-1:]) == sent[-1:] and disabled.get_stats() == {'enabled': False}
+
+
+def test_history_is_trimmed_to_max_messages():
+    store = ConversationStore(MemoryConversationBackend(), max_messages=4)
+    for i in range(5):
+        ask(store, 'c1', f'q{i}', f'a{i}')
+    assert ConversationStore.get_chat_history(store.backend.get('c1')) == [('q3', 'a3'), ('q4', 'a4')]
+
+
+def test_disk_backend_expires_and_evicts_the_oldest(tmp_path):
+    clock = [1000.0]
+    backend = DiskConversationBackend(str(tmp_path), maxsize=2, ttl=60, clock=lambda: clock[0])
+    for i, conversation_id in enumerate(('c1', 'c2', 'c3')):
+        backend.put(conversation_id, [{'role': 'user', 'content': conversation_id}])
+        path = backend._get_path(conversation_id)
+        os.utime(path, (clock[0] + i, clock[0] + i))
+        assert len(os.path.basename(path)) == len('.json') + 64
+    # c1 was written first, c3 pushed it out
+    assert backend.get('c1') is None and backend.get('c3') == [{'role': 'user', 'content': 'c3'}]
+    assert backend.stats()['evictions'] == 1 and len(os.listdir(tmp_path)) == 2
+    clock[0] += 120
+    assert backend.get('c3') is None and len(os.listdir(tmp_path)) == 1
+
+
+def test_conversation_of_an_owner_is_not_found_by_another_owner():
+    store = ConversationStore(MemoryConversationBackend())
+    messages = store.get_messages('c1', [{'role': 'user', 'content': 'my pto balance?'}], owner='1007621')
+    store.save('c1', messages, [{'role': 'assistant', 'content': '40 hours'}], owner='1007621')
+    new_message = [{'role': 'user', 'content': 'and sick leave?'}]
+    assert store.get_messages('c1', new_message, owner='2000001') == new_message
+    assert store.get_messages('c1', new_message) == new_message
+    assert len(store.get_messages('c1', new_message, owner='1007621')) == 3
@@ -0,0 +1,104 @@
+import json
+import os
+
+import pytest
+from ..employee_data.convert_employee_data import convert
+from ..employee_data.employee_shards import ShardedEmployeeStore
+from ..employee_data.employee_store import EmployeeStore
+from ..employee_data.tlc_table import MappedTlcTable, TlcTable
+
+
+def write_json(file_path, data):
+    with open(file_path, 'w') as f_out:
+        json.dump(data, f_out)
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    data_dir = tmp_path / 'employee'
+    data_dir.mkdir()
+    for employee_number in range(1, 8):
+        write_json(f'{data_dir}/{employee_number}.json',
+                   {'employeeNumber': employee_number, 'absence': {'ptoBalance': str(employee_number * 10)}})
+    write_json(f'{data_dir}/tlc_data.json', {
+        '1': {'pto': 10, 'sick': 0, 'sick_leave': 4.5, 'sickb': 0, 'vacation': 0, 'floating_holiday': 8},
+        '2': {'pto': 20.25, 'sick': 2, 'sickb': 1, 'vacation': 1, 'caregiver': 0.5},
+    })
+    return str(data_dir)
+
+
+@pytest.fixture
+def shard_dir(data_dir, tmp_path):
+    convert(data_dir, f'{tmp_path}/shards', shard_size=3)
+    return f'{tmp_path}/shards'
+
+
+def test_sharded_store_matches_employee_store(data_dir, shard_dir):
+    store = EmployeeStore(data_dir)
+    sharded_store = ShardedEmployeeStore(data_dir, shard_dir, cache_size=2)
+    assert len(sharded_store) == 7 and 7 in sharded_store and '8' not in sharded_store
+    for employee_number in range(1, 8):
+        assert sharded_store.get_with_version(employee_number) == store.get_with_version(employee_number)
+    assert len(sharded_store.cache) == 2
+    with pytest.raises(FileNotFoundError):
+        sharded_store.get(8)
+
+
+def test_sharded_store_reads_shards_without_json_files(data_dir, shard_dir):
+    for employee_number in range(1, 8):
+        os.remove(f'{data_dir}/{employee_number}.json')
+    sharded_store = ShardedEmployeeStore(data_dir, shard_dir)
+    assert sharded_store.get('5') == {'employeeNumber': 5, 'absence': {'ptoBalance': '50'}}
+
+
+def test_sharded_store_prefers_changed_json_files(data_dir, shard_dir):
+    sharded_store = ShardedEmployeeStore(data_dir, shard_dir)
+    version = sharded_store.get_version(3)
+    write_json(f'{data_dir}/3.json', {'employeeNumber': 3, 'absence': {'ptoBalance': '0'}})
+    os.utime(f'{data_dir}/3.json', ns=(version[0] + 10**9, version[0] + 10**9))
+    assert sharded_store.get(3)['absence']['ptoBalance'] == '0'
+
+    write_json(f'{data_dir}/9.json', {'employeeNumber': 9})
+    assert sharded_store.get(9) == {'employeeNumber': 9}
+
+
+def test_mapped_tlc_table_matches_tlc_table(data_dir, shard_dir):
+    tlc_table = TlcTable(f'{data_dir}/tlc_data.json')
+    mapped_table = MappedTlcTable(f'{shard_dir}/tlc')
+    employee_numbers = [2, '1', 3, 10]
+    assert mapped_table.render_balances(employee_numbers) == tlc_table.render_balances(employee_numbers)
+    assert mapped_table.render_balances([1], ['pto']) == tlc_table.render_balances([1], ['pto'])
+    assert mapped_table.get(2) == tlc_table.get(2) and mapped_table.get(3) is None
+    assert len(mapped_table) == 2 and '1' in mapped_table
+
+
+def test_conversion_keeps_the_shards_of_the_index_in_use(data_dir, shard_dir):
+    sharded_store = ShardedEmployeeStore(data_dir, shard_dir)
+    mapped_table = MappedTlcTable(f'{shard_dir}/tlc')
+    first_shards = sorted(f for f in os.listdir(shard_dir) if f.endswith('.jsonl'))
+    assert sharded_store.get('1') == {'employeeNumber': 1, 'absence': {'ptoBalance': '10'}}
+    write_json(f'{data_dir}/1.json', {'employeeNumber': 1, 'absence': {'ptoBalance': '0'}})
+    write_json(f'{data_dir}/tlc_data.json', {'1': {'pto': 5}})
+    convert(data_dir, shard_dir, shard_size=3)
+    second_shards = sorted(f for f in os.listdir(shard_dir) if f.endswith('.jsonl'))
+    assert second_shards[:len(first_shards)] == first_shards and len(second_shards) == 2 * len(first_shards)
+    # a reader still on the first index reads the first shards, unchanged
+    assert sharded_store._read(sharded_store._find('2')) == {'employeeNumber': 2, 'absence': {'ptoBalance': '20'}}
+    assert mapped_table.get(2)['pto'] == '20.25'
+    assert sharded_store.get('1')['absence']['ptoBalance'] == '0'
+    assert mapped_table.refresh().get(1)['pto'] == '5' and 2 not in mapped_table
+
+    convert(data_dir, shard_dir, shard_size=3)
+    assert sorted(f for f in os.listdir(shard_dir) if f.endswith('.jsonl')) == second_shards[len(first_shards):] + [
+        f'employees-{shard:05d}.jsonl' for shard in range(2 * len(first_shards), 3 * len(first_shards))]
+
+
+def test_mapped_tlc_table_readers_keep_the_columns_they_started_with(data_dir, shard_dir):
+    mapped_table = MappedTlcTable(f'{shard_dir}/tlc')
+    columns = mapped_table._columns
+    write_json(f'{data_dir}/tlc_data.json', {'1': {'pto': 5}})
+    convert(data_dir, shard_dir, shard_size=3)
+    assert mapped_table.refresh()._columns is not columns and mapped_table.version == mapped_table._columns.version
+    # the refresh replaced the columns as a whole, the ones taken before are unchanged
+    assert len(columns.employee_numbers) == 2 and columns.version != mapped_table.version
+    assert MappedTlcTable._find_rows(columns, [2])[0] >= 0 and 2 not in mapped_table
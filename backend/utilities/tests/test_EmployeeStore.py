@@ -0,0 +1,61 @@
+import json
+import os
+from types import MappingProxyType
+
+import pytest
+from ..employee_data.employee_store import EmployeeStore
+
+
+def write_employee(data_dir, employee_number, record):
+    with open(f'{data_dir}/{employee_number}.json', 'w') as f_out:
+        json.dump(record, f_out)
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    write_employee(tmp_path, 1, {'employeeNumber': 1, 'absence': {'ptoBalance': '10'}})
+    write_employee(tmp_path, 2, {'employeeNumber': 2, 'absence': {'ptoBalance': '20'}})
+    with open(f'{tmp_path}/tlc_data.json', 'w') as f_out:
+        json.dump({'1': {'pto': 10}}, f_out)
+    return str(tmp_path)
+
+
+def test_employee_store_loads_all_records(data_dir):
+    store = EmployeeStore(data_dir)
+    assert len(store) == 2
+    assert 1 in store and '2' in store
+    assert 'tlc_data' not in store
+    assert store.get(2)['absence']['ptoBalance'] == '20'
+
+
+def test_employee_store_shares_prepared_records(data_dir):
+    store = EmployeeStore(data_dir, prepare_record=lambda record: MappingProxyType(record))
+    record = store.get(1)
+    assert type(record) is MappingProxyType
+    assert store.get('1') is record
+    with pytest.raises(TypeError):
+        record['employeeNumber'] = 2
+
+
+def test_employee_store_picks_up_file_changes(data_dir):
+    store = EmployeeStore(data_dir)
+    version = store.get_version(1)
+    write_employee(data_dir, 1, {'employeeNumber': 1, 'absence': {'ptoBalance': '100'}})
+    os.utime(f'{data_dir}/1.json', ns=(version[0] + 10**9, version[0] + 10**9))
+    assert store.get(1)['absence']['ptoBalance'] == '100'
+    assert store.get_version(1) != version
+
+    write_employee(data_dir, 3, {'employeeNumber': 3})
+    assert store.get(3) == {'employeeNumber': 3}
+    with pytest.raises(FileNotFoundError):
+        store.get(4)
+
+
+def test_employee_store_snapshot(data_dir, tmp_path_factory):
+    snapshot_path = f'{tmp_path_factory.mktemp("snapshot")}/employees.bin'
+    store = EmployeeStore(data_dir, snapshot_path)
+    assert os.path.exists(snapshot_path) and os.path.exists(f'{snapshot_path}.idx')
+
+    snapshot_store = EmployeeStore(data_dir, snapshot_path)
+    assert snapshot_store.get(1) == store.get(1)
+    assert snapshot_store.get_version(2) == store.get_version(2)
@@ -0,0 +1,57 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from ..helpers.EnvHelper import EnvHelper
+from ..helpers.HttpSessionHelper import HttpSessionHelper
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    responses = []
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        status = self.responses.pop(0) if self.responses else 200
+        self.send_response(status)
+        if status == 429:
+            self.send_header('Retry-After', '0')
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'{}')
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server_url():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f'http://127.0.0.1:{server.server_port}/chat'
+    server.shutdown()
+
+
+@pytest.fixture
+def env_helper(monkeypatch):
+    monkeypatch.setenv('HTTP_BACKOFF_FACTOR', '0')
+    monkeypatch.setenv('HTTP_POOL_MAXSIZE', '4')
+    return EnvHelper()
+
+
+def test_session_reuses_connections(server_url, env_helper):
+    session, adapter = HttpSessionHelper.create_session(env_helper)
+    for _ in range(3):
+        assert session.post(server_url, json={}).status_code == 200
+    stats = adapter.get_stats()
+    assert stats['requests_total'] == 3 and stats['in_flight'] == 0 and stats['pool_maxsize'] == 4
+    assert stats['pools'][0]['connections_created'] == 1 and stats['pools'][0]['requests'] == 3
+
+
+def test_session_retries_throttled_and_failed_calls(server_url, env_helper):
+    session, adapter = HttpSessionHelper.create_session(env_helper)
+    Handler.responses = [429, 503]
+    assert session.post(server_url, json={}).status_code == 200
+    Handler.responses = [500] * (env_helper.HTTP_MAX_RETRIES + 1)
+    assert session.post(server_url, json={}).status_code == 500
+    assert adapter.get_stats()['pools'][0]['requests'] == 3 + env_helper.HTTP_MAX_RETRIES + 1
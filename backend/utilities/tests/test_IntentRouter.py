@@ -0,0 +1,64 @@
+import pytest
+
+from ..orchestrator.IntentRouter import IntentRouter, QUESTION_ANSWERING, TEXT_PROCESSING
+
+HISTORY = [("How many vacation days do I get?", "You get 20 days a year.")]
+
+
+@pytest.fixture(autouse=True)
+def clean_stats(monkeypatch):
+    monkeypatch.setattr(IntentRouter, '_stats', {'messages': 0, 'fast_path': 0, 'llm_routed': 0, 'reasons': {},
+                                                 'llm_hops': 0, 'llm_hop_seconds_total': 0.0,
+                                                 'saved_seconds_estimated': 0.0})
+
+
+@pytest.mark.parametrize('message', ["What is the parental leave policy?", "how do I enroll in the 401k",
+                                     "Where can I find my pay stubs?", "My manager's phone number?"])
+def test_plain_questions_take_the_fast_path(message):
+    decision = IntentRouter(enabled=True, min_confidence=0.8).route(message, [])
+    assert decision.fast_path and decision.intent == QUESTION_ANSWERING
+
+
+@pytest.mark.parametrize('message, history, reason', [
+    ("Translate the answer to Spanish", [], 'text_operation'),
+    ("What does this say in French?", [], 'text_operation'),
+    ("How many can I carry over to next year?", [], None),
+    ("And how many of them can I carry over?", HISTORY, 'follow_up'),
+    ("What about sick days?", HISTORY, 'follow_up'),
+    ("Hello", [], 'no_rule'),
+])
+def test_text_operations_follow_ups_and_unknown_messages_go_to_the_llm(message, history, reason):
+    decision = IntentRouter(enabled=True, min_confidence=0.8).route(message, history)
+    assert decision.fast_path == (reason is None)
+    if reason:
+        assert decision.reason == reason
+    if reason == 'text_operation':
+        assert decision.intent == TEXT_PROCESSING
+
+
+def test_classifier_decides_when_the_rules_do_not():
+    calls = []
+
+    def classifier(message, chat_history):
+        calls.append(message)
+        return (QUESTION_ANSWERING, 0.9) if 'benefits' in message.lower() else (None, 0.3)
+
+    router = IntentRouter(enabled=True, min_confidence=0.8, classifier=classifier)
+    assert router.route("Benefits for part time employees", []).fast_path
+    assert not router.route("Thanks a lot", []).fast_path
+    # a confident rule does not call the classifier
+    assert router.route("What are my benefits?", []).fast_path
+    assert calls == ["Benefits for part time employees", "Thanks a lot"]
+
+
+def test_stats_estimate_the_latency_saved_from_the_measured_llm_hops():
+    router = IntentRouter(enabled=True, min_confidence=0.8)
+    router.route("Hello", [])
+    router.record_llm_hop(0.5)
+    router.record_llm_hop(1.5)
+    router.route("What is the dress code?", [])
+    assert not IntentRouter(enabled=False).route("What is the dress code?", []).fast_path
+    stats = IntentRouter.get_stats()
+    assert stats['messages'] == 3 and stats['fast_path'] == 1 and stats['llm_routed'] == 2
+    assert stats['reasons'] == {'no_rule': 1, 'question_rule': 1, 'disabled': 1}
+    assert stats['saved_seconds_estimated'] == 1.0 and stats['avg_llm_hop_seconds'] == 1.0
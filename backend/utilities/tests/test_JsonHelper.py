@@ -0,0 +1,29 @@
+import json
+
+import pytest
+
+from ..helpers.JsonHelper import JsonHelper, SERIALIZERS, StdlibJsonSerializer
+
+PAYLOAD = {"choices": [{"messages": [{"role": "assistant", "content": "PTO balance:\n8 hours – café"}]}],
+           "created": 1698938071}
+
+
+@pytest.mark.parametrize('name', list(SERIALIZERS))
+def test_to_line_is_one_newline_delimited_event(name):
+    serializer = JsonHelper.create_serializer(name)
+    line = serializer.to_line(PAYLOAD)
+    assert line.endswith("\n") and line.count("\n") == 1
+    assert json.loads(line) == PAYLOAD
+    assert serializer.loads(line.encode('utf-8')) == PAYLOAD == serializer.loads(serializer.dumpb(PAYLOAD))
+    assert json.loads(serializer.dumps({1: 'a'})) == {'1': 'a'}
+
+
+def test_stdlib_serializer_matches_the_former_framing():
+    assert StdlibJsonSerializer().to_line(PAYLOAD) == json.dumps(PAYLOAD).replace("\n", "\\n") + "\n"
+
+
+def test_create_serializer():
+    assert JsonHelper.create_serializer('json').name == 'json'
+    assert JsonHelper.create_serializer('auto').name in SERIALIZERS
+    with pytest.raises(ValueError):
+        JsonHelper.create_serializer('ujson')
@@ -0,0 +1,52 @@
+import json
+import os
+
+import pytest
+from ..employee_data.keyword_index import KeywordIndex
+
+config = {
+    "employeeNumber": {"keywords": ["employee", "Number", "number"], "description": " your employee number is {value} "},
+    "absence": {
+        "ptoBalance": {"keywords": ["pto", "balance"], "description": " your PTO balance is {value} hours "},
+        "sickBank": {"keywords": ["sick", "bank", "balance"], "description": " your sick bank is {value} "}
+    }
+}
+
+
+@pytest.fixture
+def config_path(tmp_path):
+    path = f'{tmp_path}/employee.json'
+    with open(path, 'w') as f_out:
+        json.dump(config, f_out)
+    return path
+
+
+def test_keyword_index_lookup(config_path):
+    index = KeywordIndex(config_path)
+    assert index.config == config
+    assert index.lookup({'what', 'is', 'my', 'employee', 'number'}) == {('employeeNumber',): 2}
+    assert index.lookup({'pto', 'balance'}) == {('absence', 'ptoBalance'): 2, ('absence', 'sickBank'): 1}
+    assert index.lookup({'salary'}) == {}
+
+
+def test_keyword_index_rebuilds_on_config_change(config_path):
+    index = KeywordIndex(config_path)
+    version = index.version
+    with open(config_path, 'w') as f_out:
+        json.dump({"salary": {"keywords": ["salary"], "description": "{value}"}}, f_out)
+    os.utime(config_path, ns=(version[0] + 10**9, version[0] + 10**9))
+    assert index.refresh().lookup({'salary', 'pto'}) == {('salary',): 1}
+
+
+def test_keyword_index_snapshot_is_kept_by_its_readers(config_path):
+    index = KeywordIndex(config_path)
+    snapshot = index.get_snapshot()
+    version = snapshot.version
+    with open(config_path, 'w') as f_out:
+        json.dump({"salary": {"keywords": ["salary"], "description": "{value}"}}, f_out)
+    os.utime(config_path, ns=(version[0] + 10**9, version[0] + 10**9))
+    new_snapshot = index.get_snapshot()
+    assert new_snapshot.version != version and new_snapshot.lookup({'salary'}) == {('salary',): 1}
+    # a reader that took the first snapshot keeps its config, postings, templates and version together
+    assert snapshot.version == version and snapshot.config == config
+    assert snapshot.lookup({'pto'}) == {('absence', 'ptoBalance'): 1} and ('salary',) not in snapshot.templates
@@ -0,0 +1,149 @@
+import threading
+import time
+
+from ..common.Answer import Answer
+from ..helpers.PromptBudgetHelper import PromptBudgetHelper
+from ..orchestrator.LangChainAgent import LangChainAgent
+from ..tools.ContentSafetyChecker import ContentSafetyChecker
+
+
+class WaitingQuestionAnswerTool:
+    """Holds every answer until all the requests are inside a tool, so their runs interleave."""
+
+    def __init__(self, requests):
+        self.barrier = threading.Barrier(requests, timeout=10)
+
+    def answer_question(self, question, chat_history, **kwargs):
+        self.barrier.wait()
+        return Answer(question=question, answer=f"{kwargs.get('employee_data')} {chat_history[-1][1]}")
+
+
+class ToolExecutor:
+    """Calls the Question Answering tool with the input, like the agent does."""
+
+    def __init__(self, agent):
+        self.agent = agent
+
+    def run(self, input, **kwargs):
+        return self.agent.run_tool(input)
+
+
+def test_concurrent_messages_keep_their_own_request_state():
+    agent = LangChainAgent()
+    agent.config.prompts.enable_content_safety = False
+    agent.config.prompts.enable_post_answering_prompt = False
+    agent.question_answer_tool = WaitingQuestionAnswerTool(requests=4)
+    agent.agent_executor = ToolExecutor(agent)
+    answers = {}
+
+    def handle(i):
+        messages = agent.handle_message(f"question {i}", [(f"earlier {i}", f"answer {i}")], conversation_id=None,
+                                        employee_data=f"employee {i}")
+        answers[i] = messages[-1]['content']
+
+    threads = [threading.Thread(target=handle, args=(i,)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    for i in range(4):
+        assert answers[i].startswith(f"As per the available data, employee {i}\n\nemployee {i} answer {i}")
+    assert agent.kwargs == {} and agent.chat_history == []
+
+
+class UnusedExecutor:
+    def run(self, input, **kwargs):
+        raise AssertionError(f"the agent was called for {input}")
+
+
+def test_plain_question_goes_to_the_tool_without_the_agent():
+    agent = LangChainAgent()
+    agent.config.prompts.enable_content_safety = False
+    agent.config.prompts.enable_post_answering_prompt = False
+    agent.intent_router.enabled = True
+    agent.question_answer_tool = WaitingQuestionAnswerTool(requests=1)
+    agent.agent_executor = UnusedExecutor()
+    messages = agent.handle_message("What is the parental leave policy?", [("earlier", "answer 0")],
+                                    conversation_id=None)
+    assert messages[-1]['content'].startswith("None answer 0")
+    assert agent.intent.fast_path
+
+
+class SlowContentSafetyChecker(ContentSafetyChecker):
+    def __init__(self, latency):
+        self.latency = latency
+
+    def _filter_text_and_replace(self, text, response_template):
+        time.sleep(self.latency)
+        return response_template if 'hate' in text else text
+
+    def validate_output_and_replace_if_harmful(self, text):
+        return text
+
+
+class SearchingQuestionAnswerTool:
+    """Searches, then generates the answer once the before_answer gate lets it."""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.steps = []
+
+    def answer_question(self, question, chat_history, **kwargs):
+        time.sleep(self.latency)
+        self.steps.append('search')
+        kwargs['before_answer']()
+        self.steps.append('answer')
+        return Answer(question=question, answer="You get 20 days.")
+
+
+def get_parallel_agent():
+    agent = LangChainAgent()
+    agent.config.prompts.enable_content_safety = True
+    agent.config.prompts.enable_post_answering_prompt = False
+    agent.intent_router.enabled = True
+    agent.parallel_input_check = True
+    agent.content_safety_checker = SlowContentSafetyChecker(latency=0.2)
+    agent.question_answer_tool = SearchingQuestionAnswerTool(latency=0.2)
+    agent.agent_executor = UnusedExecutor()
+    return agent
+
+
+def test_parallel_input_check_runs_alongside_the_search():
+    agent = get_parallel_agent()
+    start = time.perf_counter()
+    messages = agent.handle_message("How many vacation days do I get?", [], conversation_id=None)
+    assert time.perf_counter() - start < 0.35
+    assert messages[-1]['content'] == "You get 20 days." and agent.question_answer_tool.steps == ['search', 'answer']
+
+
+def test_flagged_input_stops_the_parallel_work_before_the_answer():
+    agent = get_parallel_agent()
+    messages = agent.handle_message("Why do I hate my vacation days?", [], conversation_id=None)
+    assert messages[-1]['content'].startswith("Unfortunately, I am not able to process your question")
+    assert agent.question_answer_tool.steps == ['search']
+
+
+class RecordingExecutor:
+    def __init__(self):
+        self.inputs = []
+
+    def run(self, input, **kwargs):
+        self.inputs.append(input)
+        return "The agent answered."
+
+
+def test_flagged_input_never_reaches_the_agent_llm():
+    agent = get_parallel_agent()
+    agent.intent_router.enabled = False
+    agent.agent_executor = RecordingExecutor()
+    summaries = []
+    agent.prompt_budget_helper = PromptBudgetHelper(
+        max_history_tokens=1, fold_turns=1, summarizer=lambda summary, turns: summaries.append(turns) or 'summary')
+    chat_history = [(f"earlier question {i}", f"earlier answer {i}") for i in range(3)]
+    messages = agent.handle_message("Why do I hate my vacation days?", chat_history, conversation_id=None)
+    assert messages[-1]['content'].startswith("Unfortunately, I am not able to process your question")
+    assert agent.agent_executor.inputs == [] and summaries == []
+
+    messages = agent.handle_message("Tell me about my vacation days", chat_history, conversation_id=None)
+    assert messages[-1]['content'] == "The agent answered."
+    assert agent.agent_executor.inputs == ["Tell me about my vacation days"] and len(summaries) == 1
@@ -0,0 +1,94 @@
+import pytest
+
+from ..common.LRUCache import LRUCache
+from ..helpers.PromptBudgetHelper import PromptBudgetHelper
+
+
+@pytest.fixture(autouse=True)
+def estimated_tokens(monkeypatch):
+    # about 4 characters a token, the tests do not depend on downloading a tiktoken encoding
+    monkeypatch.setattr(PromptBudgetHelper, '_encoding', False)
+    monkeypatch.setattr(PromptBudgetHelper, '_summaries', LRUCache())
+
+
+def make_history(turns):
+    # 8 tokens a turn
+    return [(f'question {i:02d}.', f'answer {i:02d} is fine.') for i in range(turns)]
+
+
+def test_history_within_budget_is_kept_whole():
+    budget = PromptBudgetHelper(max_history_tokens=100).fit(make_history(5), 'next one')
+    assert len(budget.chat_history) == 5 and not budget.summary and budget.prompt_tokens == 5 * 8 + 2
+
+
+def test_older_turns_are_folded_into_a_summary_by_blocks():
+    calls = []
+
+    def summarize(previous_summary, turns):
+        calls.append((previous_summary, [t[0] for t in turns]))
+        return f'{previous_summary}+{len(turns)}'
+
+    helper = PromptBudgetHelper(max_history_tokens=30, fold_turns=2, summarizer=summarize)
+    budget = helper.fit(make_history(6))
+    # 3 turns fit, the 3 older ones are folded 2 at a time so 4 go into the summary
+    assert budget.folded_turns == 4 and budget.chat_history == make_history(6)[4:]
+    assert budget.summary == '+4' and budget.summary_tokens > 0
+    # the next turn folds the same block, the summary comes from the cache
+    helper.fit(make_history(7))
+    assert len(calls) == 1
+    # two turns later only the new block is summarized, on top of the cached summary
+    assert helper.fit(make_history(8)).summary == '+4+2'
+    assert calls[-1] == ('+4', ['question 04.', 'question 05.'])
+
+
+def test_last_turn_is_kept_even_over_budget_and_failed_summary_drops_the_rest():
+    def summarize(previous_summary, turns):
+        raise ValueError('no model')
+
+    budget = PromptBudgetHelper(max_history_tokens=5, summarizer=summarize).fit(make_history(3))
+    assert budget.chat_history == make_history(3)[2:] and budget.summary == ''
+
+
+def test_fit_messages_puts_the_summary_in_a_system_message():
+    helper = PromptBudgetHelper(max_history_tokens=20, fold_turns=1, summarizer=lambda summary, turns: 'earlier')
+    messages = []
+    for question, answer in make_history(3):
+        messages += [{'role': 'user', 'content': question}, {'role': 'assistant', 'content': answer}]
+    messages.append({'role': 'user', 'content': 'next one'})
+    fitted, budget = helper.fit_messages(messages)
+    assert fitted[0] == {'role': 'system', 'content': 'Summary of the earlier conversation: earlier'}
+    assert fitted[1:] == messages[2:] and budget.folded_turns == 1
+
+
+def test_fit_messages_keeps_uneven_roles_as_they_are():
+    messages = [{'role': 'user', 'content': 'q1'}, {'role': 'user', 'content': 'q2'},
+                {'role': 'assistant', 'content': 'a2'}, {'role': 'user', 'content': 'q3'}]
+    fitted, budget = PromptBudgetHelper(max_history_tokens=100).fit_messages(messages)
+    assert fitted == messages and budget.folded_turns == 0
+
+    summarized = []
+    helper = PromptBudgetHelper(max_history_tokens=2, fold_turns=1,
+                                summarizer=lambda summary, turns: summarized.extend(turns) or 'earlier')
+    fitted, budget = helper.fit_messages(messages)
+    # the unanswered q1 is folded, q2 keeps its own answer
+    assert summarized == [('q1', '')] and budget.folded_turns == 1
+    assert fitted == [{'role': 'system', 'content': 'Summary of the earlier conversation: earlier'}] + messages[1:]
+
+
+def test_summary_calls_are_admitted(monkeypatch):
+    admitted = []
+
+    class Controller:
+        def admit(self, deployment):
+            admitted.append(deployment)
+
+    class FakeLLMHelper:
+        llm_model = 'gpt'
+
+        def get_chat_completion(self, messages):
+            return {'choices': [{'message': {'content': ' short '}}]}
+
+    from ..helpers import LLMHelper
+    monkeypatch.setattr(LLMHelper, 'LLMHelper', FakeLLMHelper)
+    helper = PromptBudgetHelper(admission_controller=Controller())
+    assert helper.summarize_with_llm('', [('q', 'a')]) == 'short' and admitted == ['gpt']
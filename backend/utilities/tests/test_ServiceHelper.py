@@ -0,0 +1,69 @@
+import threading
+import time
+from types import SimpleNamespace
+
+from ..helpers.ServiceHelper import ServiceContainer
+
+
+class FakeOrchestrator:
+    def __init__(self, config):
+        self.config = config
+
+    def handle_message(self, user_message, **kwargs):
+        return [{"role": "assistant", "content": f"{self.config.name}: {user_message}"}]
+
+
+def get_container(built, **kwargs):
+    def load_config():
+        built.append('config')
+        return SimpleNamespace(name=f"v{built.count('config')}",
+                               orchestrator=SimpleNamespace(strategy=SimpleNamespace(value='fake')))
+
+    def create_orchestrator(strategy, config):
+        built.append(strategy)
+        return FakeOrchestrator(config)
+
+    return ServiceContainer(config_loader=load_config, orchestrator_factory=create_orchestrator, **kwargs)
+
+
+def test_services_are_built_once_for_concurrent_requests():
+    built = []
+    services = get_container(built)
+    threads = [threading.Thread(target=services.handle_message, kwargs={'user_message': 'hi'}) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert built == ['config', 'fake']
+    assert services.get_stats()['messages'] == 8
+    assert services.get_config() is services.get_orchestrator().config
+
+
+def test_reload_rebuilds_config_and_orchestrator():
+    built = []
+    services = get_container(built)
+    assert services.handle_message(user_message='hi')[0]['content'] == 'v1: hi'
+    assert services.reload()['version'] == 2
+    assert services.handle_message(user_message='hi')[0]['content'] == 'v2: hi'
+    assert built == ['config', 'fake', 'config', 'fake']
+    assert 'v2' in services.warm_up() and built == ['config', 'fake', 'config', 'fake']
+
+
+def test_services_are_rebuilt_when_the_config_version_changes():
+    built, versions, now = [], ['etag-1'], [0.0]
+    services = get_container(built, version_loader=lambda: versions[-1], check_interval=60, clock=lambda: now[0])
+    assert services.handle_message(user_message='hi')[0]['content'] == 'v1: hi'
+    versions.append('etag-2')
+    now[0] = 30
+    assert services.handle_message(user_message='hi')[0]['content'] == 'v1: hi'
+    now[0] = 61
+    # the request that finds the check due starts it, and is answered with the current services
+    assert services.handle_message(user_message='hi')[0]['content'] == 'v1: hi'
+    for _ in range(100):
+        if services.version == 2:
+            break
+        time.sleep(0.01)
+    assert services.handle_message(user_message='hi')[0]['content'] == 'v2: hi'
+    now[0] = 200
+    assert services.handle_message(user_message='hi')[0]['content'] == 'v2: hi'
+    assert services.get_stats()['config_version'] == 'etag-2' and built.count('config') == 2
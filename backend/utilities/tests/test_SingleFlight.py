@@ -0,0 +1,129 @@
+import asyncio
+import threading
+
+import pytest
+
+from ..common.SingleFlight import SingleFlight
+
+
+def run_threads(count, target):
+    results = [None] * count
+
+    def run(i):
+        try:
+            results[i] = target()
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for t in threads:
+        t.start()
+    return threads, results
+
+
+def test_do_calls_once_for_concurrent_requests():
+    single_flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def call():
+        calls.append(1)
+        release.wait(5)
+        return {'answer': 42}
+
+    threads, results = run_threads(5, lambda: single_flight.do('q', call))
+    while single_flight.coalesced_calls < 4:
+        threading.Event().wait(0.001)
+    release.set()
+    for t in threads:
+        t.join()
+    assert calls == [1] and results == [{'answer': 42}] * 5
+    assert single_flight.get_stats()['coalesced_calls'] == 4 and single_flight.get_stats()['in_flight'] == 0
+    assert single_flight.do('q', lambda: 'new call') == 'new call'
+
+
+def test_do_raises_the_error_for_every_request():
+    single_flight = SingleFlight()
+    with pytest.raises(ValueError):
+        single_flight.do('q', lambda: (_ for _ in ()).throw(ValueError('upstream')))
+    assert single_flight.get_stats()['in_flight'] == 0
+
+
+def test_stream_is_fanned_out_and_replayed_to_late_requests():
+    single_flight = SingleFlight()
+    opened = []
+
+    def open_stream():
+        opened.append(1)
+        yield from (b'line %d' % i for i in range(5))
+
+    leader = single_flight.stream('q', open_stream)
+    assert [next(leader), next(leader)] == [b'line 0', b'line 1']
+    follower = single_flight.stream('q', open_stream)
+    assert list(follower) == [b'line %d' % i for i in range(5)]
+    assert list(leader) == [b'line %d' % i for i in range(2, 5)]
+    assert opened == [1]
+    assert single_flight.get_stats()['coalesced_streams'] == 1
+    assert list(single_flight.stream('q', open_stream)) and opened == [1, 1]
+
+
+def test_stream_outlives_a_disconnected_leader_and_closes_upstream_when_nobody_reads():
+    single_flight = SingleFlight()
+    closed = []
+
+    def open_stream():
+        try:
+            yield from range(10)
+        finally:
+            closed.append(1)
+
+    leader = single_flight.stream('q', open_stream)
+    follower = single_flight.stream('q', open_stream)
+    assert next(leader) == 0
+    leader.close()
+    assert list(follower) == list(range(10)) and closed == [1]
+
+    first, second = single_flight.stream('r', open_stream), single_flight.stream('r', open_stream)
+    next(first)
+    first.close()
+    assert closed == [1]
+    next(second)
+    second.close()
+    assert closed == [1, 1] and single_flight.get_stats()['in_flight'] == 0
+
+
+def test_astream_and_ado_coalesce_on_the_event_loop():
+    single_flight = SingleFlight()
+    opened = []
+
+    async def open_stream():
+        opened.append(1)
+
+        async def lines():
+            for i in range(3):
+                await asyncio.sleep(0)
+                yield i
+        return lines()
+
+    async def read():
+        return [line async for line in await single_flight.astream('q', open_stream)]
+
+    async def answer():
+        await asyncio.sleep(0.01)
+        return len(opened)
+
+    async def main():
+        streamed = await asyncio.gather(*(read() for _ in range(4)))
+        answers = await asyncio.gather(*(single_flight.ado('a', answer) for _ in range(3)))
+        return streamed, answers
+
+    streamed, answers = asyncio.run(main())
+    assert streamed == [[0, 1, 2]] * 4 and opened == [1] and answers == [1, 1, 1]
+    assert single_flight.get_stats()['coalesced_streams'] == 3 and single_flight.coalesced_calls == 2
+
+
+def test_disabled_single_flight_calls_upstream_per_request():
+    single_flight = SingleFlight(enabled=False)
+    assert list(single_flight.stream('q', lambda: iter([1, 2]))) == [1, 2]
+    assert single_flight.do('q', lambda: 3) == 3
+    assert single_flight.get_stats()['calls'] == 0
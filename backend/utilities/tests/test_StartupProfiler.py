@@ -0,0 +1,14 @@
+from ..common.StartupProfiler import StartupProfiler
+
+
+def test_profile_imports_of_a_fresh_interpreter():
+    profile = StartupProfiler('json').profile_imports()
+    assert profile['import_ms'] > 0
+    assert 'json.decoder' in [name for _, name in profile['direct_imports']]
+    assert 'json' in [package for _, package in profile['packages']]
+
+
+def test_profile_construction_finds_constructors():
+    profile = StartupProfiler('argparse', warm_up='ArgumentParser').profile_construction()
+    assert profile['import_ms'] > 0 and profile['warm_up_ms'] > 0
+    assert any(location.startswith('argparse.py:') for _, location in profile['constructors'])
@@ -0,0 +1,84 @@
+import json
+
+from ..helpers.StreamingHelper import is_delta_stream, to_chunk, new_data_stream_response, iter_data_stream_chunks, \
+    format_without_data_chunk, moderate_data_stream_line, moderate_without_data_line
+
+META = {"id": "1", "model": "m", "created": 1, "object": "o"}
+
+
+def get_line(delta):
+    return b'data: ' + json.dumps({**META, "choices": [{"messages": [{"delta": delta}]}]}).encode('utf-8')
+
+
+LINES = [get_line({"role": "tool", "content": '{"citations": []}'}), get_line({"role": "assistant"}),
+         get_line({"content": "Hello"}), get_line({"content": "\nworld"}), get_line({"content": "[DONE]"})]
+
+
+def test_is_delta_stream():
+    assert is_delta_stream({'X-Stream-Mode': 'Delta'})
+    assert not is_delta_stream({}) and not is_delta_stream({'X-Stream-Mode': 'snapshot'})
+
+
+def test_delta_stream_adds_up_to_the_snapshot():
+    response = new_data_stream_response()
+    snapshots = [c for line in LINES for c in iter_data_stream_chunks(line, response, 'pto is 8')]
+    response = new_data_stream_response()
+    deltas = [json.loads(c)['delta'] for line in LINES for c in iter_data_stream_chunks(line, response, delta=True)]
+    assert deltas == [{"index": 0, "role": "tool", "content": '{"citations": []}'},
+                      {"index": 1, "role": "assistant", "content": ""},
+                      {"index": 1, "content": "Hello"}, {"index": 1, "content": "\nworld"}]
+    assert len(snapshots) == len(LINES)
+    assert json.loads(snapshots[-1])["choices"][0]["messages"][1]["content"] == \
+           "As per the available data, pto is 8 \n\nHello\nworld"
+    assert to_chunk(response).count('\n') == 1
+
+
+def test_without_data_delta_chunks():
+    lines = [{**META, "choices": [{"delta": d}]} for d in ({"role": "assistant"}, {"content": "Hi"}, {"content": "!"})]
+    response_text, chunks = "", []
+    for line in lines:
+        response_text, chunk = format_without_data_chunk(line, response_text, delta=True)
+        chunks.append(chunk)
+    assert response_text == "Hi!"
+    assert chunks[0] is None
+    assert [json.loads(c)["delta"] for c in chunks[1:]] == [{"index": 0, "role": "assistant", "content": "Hi"},
+                                                           {"index": 0, "content": "!"}]
+    assert json.loads(format_without_data_chunk(lines[-1], "Hi")[1])["choices"][0]["messages"][0]["content"] == "Hi!"
+
+
+class FlaggingModerator:
+    """Clears every token until 'hate', then retracts the answer."""
+
+    def __init__(self):
+        self.replacement = None
+        self.sent = False
+
+    def push(self, text):
+        if 'hate' in text:
+            self.replacement = "Retracted."
+        return '' if self.replacement else text
+
+    def get_retraction(self):
+        if self.replacement and not self.sent:
+            self.sent = True
+            return self.replacement
+        return None
+
+
+def test_moderated_stream_is_replaced_by_the_retraction():
+    moderator = FlaggingModerator()
+    lines = LINES[:3] + [get_line({"content": " I hate"}), get_line({"content": " it"}), LINES[-1]]
+    framed = [f for line in lines for f in moderate_data_stream_line(line, moderator)]
+    response = new_data_stream_response()
+    deltas = [json.loads(c)['delta'] for line in framed for c in iter_data_stream_chunks(line, response, delta=True)]
+    assert deltas[-2:] == [{"index": 1, "content": "Hello"}, {"index": 1, "content": "Retracted.", "replace": True}]
+    assert response["choices"][0]["messages"][1]["content"] == "Retracted."
+
+    moderator = FlaggingModerator()
+    lines = [{**META, "choices": [{"delta": {"content": d}}]} for d in ("Hi", " hate", "!")]
+    response_text = ""
+    for line in lines:
+        for framed in moderate_without_data_line(line, moderator):
+            response_text, chunk = format_without_data_chunk(framed, response_text)
+    assert response_text == "Retracted."
+    assert json.loads(chunk)["choices"][0]["messages"][0]["content"] == "Retracted."
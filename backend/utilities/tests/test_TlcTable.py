@@ -0,0 +1,72 @@
+import json
+import os
+
+import pytest
+from ..employee_data.tlc_table import TlcTable, TLC_FIELDS
+
+tlc_data = {
+    "1": {**{field: 0 for field in TLC_FIELDS}, "emp_name": "1", "pto": 216, "floating_holiday": 8, "sickb": 1.5},
+    "2": {**{field: 0 for field in TLC_FIELDS}, "emp_name": "2", "caregiver": 0.5, "sick_leave": 3, "vacation": 2.91},
+}
+
+
+def write_tlc_data(file_path, data, version=None):
+    with open(file_path, 'w') as f_out:
+        json.dump(data, f_out)
+    if version:
+        os.utime(file_path, ns=(version[0] + 10**9, version[0] + 10**9))
+
+
+@pytest.fixture
+def tlc_path(tmp_path):
+    file_path = f'{tmp_path}/tlc_data.json'
+    write_tlc_data(file_path, tlc_data)
+    return file_path
+
+
+def test_tlc_table_render_balances(tlc_path):
+    table = TlcTable(tlc_path)
+    assert len(table) == 2 and 1 in table and '3' not in table
+    assert table.get(1)['pto'] == '216' and table.get('2')['vacation'] == '2.91'
+    assert table.get(3) is None
+    assert table.render_balances([1, '2', 3], ['pto']) == [
+        "as per information available in TLC system, Floating Holidays 8, PTO balance is 216",
+        "as per information available in TLC system, PTO balance is 0",
+        "\n\n",
+    ]
+    assert table.render_balances([2], ['sick', 'vacation']) == [
+        "as per information available in TLC system, sick leave balance is 3 and "
+        "sick bank (carry forward sick leave) balance is 0, Vacation balance is 2.91"
+    ]
+    assert table.render_balances([]) == []
+
+
+def test_tlc_table_incremental_reload(tlc_path):
+    table = TlcTable(tlc_path)
+    details = table.details
+    changed = {**tlc_data, "2": {**tlc_data["2"], "pto": 40}, "3": {**tlc_data["1"], "emp_name": "3"}}
+    write_tlc_data(tlc_path, changed, table.version)
+    table.refresh()
+    assert len(table) == 3
+    assert table.render_balances([2, 3], ['pto']) == [
+        "as per information available in TLC system, PTO balance is 40",
+        "as per information available in TLC system, Floating Holidays 8, PTO balance is 216",
+    ]
+    assert table.details[0] is details[0]
+
+    write_tlc_data(tlc_path, {"3": changed["3"]}, table.version)
+    table.refresh()
+    assert len(table) == 1 and 1 not in table
+    assert table.get(3)['pto'] == '216'
+
+
+def test_tlc_table_reload_leaves_the_columns_in_use_untouched(tlc_path):
+    table = TlcTable(tlc_path)
+    details, balances = table.details, table.balances
+    rendered = table.render_balances([1, 2])
+    write_tlc_data(tlc_path, {**tlc_data, "1": {**tlc_data["1"], "pto": 8, "floating_holiday": 0}}, table.version)
+    table.refresh()
+    assert table.render_balances([1], ['pto']) == ["as per information available in TLC system, PTO balance is 8"]
+    # a reader holding the previous columns still renders the previous balances
+    assert details[0] + balances['sick'][0] + balances['pto'][0] + balances['vacation'][0] == rendered[0]
+    assert table.details is not details
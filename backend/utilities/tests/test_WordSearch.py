@@ -0,0 +1,180 @@
+import threading
+import time
+
+import pytest
+from ..common.LRUCache import LRUCache
+from ..employee_data.description_template import DescriptionTemplate
+from ..employee_data import word_search
+from ..employee_data.word_search import compile_words_pattern, find_in_value, is_manager_personal_info, is_user, \
+    is_user_details, compile_gate_pattern, search_json, search_json_batch, get_absence_data, prepare_employee_record, create_dict
+
+
+def test_find_in_value_reuses_compiled_patterns():
+    compile_words_pattern.cache_clear()
+    assert find_in_value({'pto', 'plan'}, 'PTO (Plan 1)') in (['PTO', 'Plan'], ['Plan', 'PTO'])
+    assert find_in_value({'plan', 'pto'}, 'Vacation (Plan 2)') == ['Plan']
+    assert find_in_value(['time', 'off'], 'time-off') == ['time', 'off']
+    assert compile_words_pattern.cache_info().misses == 2
+
+
+@pytest.mark.parametrize('query,expected', [
+    ('What is my pto balance?', False),
+    ("What is my manager's pto balance?", True),
+    ('Are all co-workers time-off plans available?', True),
+])
+def test_is_manager_personal_info(query, expected):
+    assert is_manager_personal_info([w.strip().lower() for w in query.split()]) == expected
+
+
+@pytest.mark.parametrize('query,expected', [
+    ('What is my pto plan?', True),
+    ('Am I eligible to purchase pto?', True),
+    ('What is the PTO Policy?', True),
+    ('What is the parental leave policy?', False),
+])
+def test_is_user(query, expected):
+    assert is_user(query, [w.strip().lower() for w in query.split()]) == expected
+
+
+@pytest.mark.parametrize('query,expected', [
+    ('What are my pto details?', True),
+    ('Tell me more', True),
+    ('What is my pto balance?', False),
+])
+def test_is_user_details(query, expected):
+    assert is_user_details([w.strip().lower() for w in query.split()]) == expected
+
+
+def test_gate_pattern_tells_the_keyword_lists_apart():
+    pattern = compile_gate_pattern(first=[r'\bmy\b', r'\bmanagers\b'], second=[r'\btime\b', r'\boff\b'])
+    assert [m.lastgroup for m in pattern.finditer("my Managers time-off")] == ['first', 'first', 'second', 'second']
+
+
+def test_search_json_batch_matches_search_json():
+    queries = [
+        ('What is my pto balance?', 1007621),
+        ('Am I eligible to purchase pto?', '108554'),
+        ('What is my pto plan?', 1007621),
+        ('What is my pto balance?', 108554),
+        ('Where is the cafeteria?', 1007621),
+    ]
+    assert search_json_batch(queries) == [search_json(query, employee_number) for query, employee_number in queries]
+
+
+def test_search_json_batch_shares_the_answer_cache(monkeypatch):
+    monkeypatch.setattr(word_search, 'answer_cache', LRUCache(16))
+    first, = search_json_batch([('What is my pto balance?', 1007621)])
+    assert word_search.answer_cache.stats()['size'] == 1
+    # answered from the cache, in a list of its own
+    second = search_json('What is my pto balance?', 1007621)
+    assert word_search.answer_cache.stats()['hits'] == 1
+    assert second == first and second is not first
+    first.clear()
+    assert search_json_batch([('What is my pto balance?', 1007621)])[0] == second
+
+
+def test_absence_view_does_not_modify_the_record():
+    absence = {
+        "ptoBalance": "144",
+        "eligibleToPurchasePto": "Not Eligible",
+        "ptoRefreshDate": "2024-08-13-07:00",
+        "timeOffPlanType": "PTO (Plan 1)",
+        "vacationBalance": "0",
+        "purchasedPtoBalance": "0",
+        "sickPlanEligibility": "Not Eligible",
+        "sickPlanBalance": "0",
+    }
+    record = prepare_employee_record({'employeeNumber': 1, 'absence': absence})
+    assert dict(record['absence']) == {
+        "ptoBalance": "144",
+        "eligibleToPurchasePto": "Not Eligible",
+        "ptoRefreshDate": "August 13, 2024",
+        "timeOffPlanType": "PTO (Plan 1)",
+        "sickPlanEligibility": "Not Eligible",
+    }
+    assert len(absence) == 8 and absence['ptoRefreshDate'] == "2024-08-13-07:00"
+    assert get_absence_data(record['absence']) is record['absence']
+    with pytest.raises(TypeError):
+        record['absence']['ptoBalance'] = '0'
+
+
+@pytest.mark.parametrize('key,key_config,value,search_words', [
+    ('ptoBalance', {"keywords": ["pto", "balance"], "score": ["pto", "balance"],
+                    "description": " your PTO balance is {value} hours "}, '144', {'pto', 'balance'}),
+    ('address', {"keywords": ["address"], "description": "your address is {value}"},
+     {'line1': '7601 Penn Ave S', 'city': 'Richfield'}, {'address'}),
+    ('sickPlanEligibility', {"keywords": ["sick"], "isResponseMultiple": True,
+                             "description": {"eligible": "you are eligible", "not_eligible": "you are not eligible",
+                                             "yes": "yes, {value}", "no": "no, {value}"}},
+     'Not Eligible', {'sick', 'eligible'}),
+])
+def test_match_result_reads_like_merged_dict(key, key_config, value, search_words):
+    result = DescriptionTemplate(key, key_config).create_result(value, search_words, 2)
+    expected = legacy_create_dict({key: key_config}, key, value, search_words, 2)
+    assert dict(result) == expected and list(result.items()) == list(expected.items())
+    assert result == create_dict({key: key_config}, key, value, search_words, 2)
+
+
+def legacy_create_dict(config, key, value, search_words, score=1):
+    key_config = config.get(key)
+    for score_word in key_config.get('score', []):
+        score = score + 1 if any(score_word in word for word in search_words) else score - 1
+    aggr_dict = {**key_config, 'score': score, key: value}
+    _desc = aggr_dict.get('description')
+    if 'isResponseMultiple' in key_config:
+        _val = '_'.join(str(value).strip().lower().split())
+        if 'sickPlanEligibility' == key and search_words & {'eligible', 'eligibility'}:
+            _val = 'no' if 'not_eligible' == _val else 'yes'
+        _desc = _desc.get(_val)
+    elif type(value) == dict:
+        value = ' '.join([str(v) for v in value.values()])
+    aggr_dict['description'] = _desc.format(value=value)
+    return aggr_dict
+
+
+def test_search_json_answer_cache(monkeypatch):
+    monkeypatch.setattr(word_search, 'answer_cache', LRUCache(16, 60))
+    employee_number = '1007621'
+    first = search_json('What is my pto balance?', employee_number)
+    second = search_json('what is my PTO balance', employee_number)
+    assert second == first and second is not first
+    assert word_search.answer_cache.stats()['hits'] == 1 and word_search.answer_cache.stats()['misses'] == 1
+
+    # a new employee file version is a new cache key
+    monkeypatch.setattr(word_search.employee_store, 'get_with_version',
+                        lambda emp: (word_search.employee_store.get(emp), (0, 0)))
+    assert search_json('What is my pto balance?', employee_number) == first
+    assert word_search.answer_cache.stats()['misses'] == 2
+
+
+def test_lru_cache_evicts_and_expires():
+    now = [0]
+    cache = LRUCache(2, 10, clock=lambda: now[0])
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert cache.get('b') is None and cache.get('a') == 1 and cache.evictions == 1
+    now[0] = 11
+    assert cache.get('c') is None and len(cache) == 1
+    assert cache.stats()['hits'] == 2 and cache.stats()['misses'] == 2
+
+
+def test_employee_data_is_loaded_once_on_first_use(monkeypatch):
+    loaded = word_search.get_employee_data()
+    loads = []
+
+    def load():
+        loads.append(1)
+        time.sleep(0.05)
+        return loaded
+
+    monkeypatch.setattr(word_search, '_employee_data', None)
+    monkeypatch.setattr(word_search, '_load_employee_data', load)
+    threads = [threading.Thread(target=word_search.get_employee_data) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert loads == [1] and word_search.keyword_index is loaded.keyword_index
+    assert search_json('What is my pto plan?', 1007621) and loads == [1]
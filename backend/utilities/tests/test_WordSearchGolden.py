@@ -0,0 +1,17 @@
+import json
+
+import pytest
+from eds_util import PROJECT_ROOT_DIR
+from ..employee_data.word_search import search_json
+
+# the results of the baseline word_search, see benchmarks/bench_word_search.py
+with open(f'{PROJECT_ROOT_DIR}/benchmarks/golden/sample_questions.json') as f_in:
+    golden = json.load(f_in)
+
+
+@pytest.mark.parametrize('question', sorted({key.split('|', 1)[1] for key in golden}))
+def test_search_json_matches_golden_results(question):
+    for key in [key for key in golden if key.split('|', 1)[1] == question]:
+        result = search_json(question, key.split('|', 1)[0])
+        result = [dict(d) for d in result] if type(result) is list else result
+        assert json.loads(json.dumps(result, default=dict)) == golden[key], key
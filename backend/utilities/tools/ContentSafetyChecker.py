@@ -1,3 +1,9 @@
+import asyncio
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
 from typing import List
 from azure.ai.contentsafety import ContentSafetyClient
 from azure.core.credentials import AzureKeyCredential
@@ -7,7 +13,167 @@ from ..helpers.EnvHelper import EnvHelper
 from .AnswerProcessingBase import AnswerProcessingBase
 from ..common.Answer import Answer
  
+
+class InputFlagged(Exception):
+    """Raised at a safety gate when the input check running alongside the message flagged the input."""
+
+    def __init__(self, filtered_message: str) -> None:
+        super().__init__("The input was flagged by the content safety check")
+        self.filtered_message = filtered_message
+
+
+class PendingInputCheck:
+    """An input check running in the background, the work that depends on it waits at a gate."""
+
+    def __init__(self, future, text: str) -> None:
+        self.future = future
+        self.text = text
+
+    def wait(self, block: bool = True):
+        """Raises InputFlagged once the check flagged the input, without block only if it already finished."""
+        if not block and not self.future.done():
+            return
+        # errors of the check are raised here, like the inline check raises them
+        filtered_message = self.future.result()
+        if filtered_message != self.text:
+            raise InputFlagged(filtered_message)
+
+
+# the end of a sentence and the spaces after it, a window of a moderated stream ends at one
+SENTENCE_END = re.compile(r'[.!?;:]+["\')\]]*\s+|\n+')
+
+
+class StreamModerator:
+    """
+    Moderates an answer streamed token by token in sentence windows. A window is checked in the background as soon
+    as it is complete, and released once its check and the checks of the windows before it passed, so no text is
+    released unchecked. When a check fails, replacement is set and nothing more is released; the text released
+    before has to be retracted. The whole answer is checked once more when the stream closes, which catches
+    harmful content spread over several windows.
+    """
+    _lock = threading.Lock()
+    _stats = {'streams': 0, 'windows': 0, 'flagged': 0, 'retracted': 0, 'first_release_seconds_total': 0.0,
+              'released_streams': 0}
+
+    def __init__(self, checker, min_window_chars: int = 100, max_window_chars: int = 1000) -> None:
+        self.checker = checker
+        self.min_window_chars = min_window_chars
+        self.max_window_chars = max(min_window_chars, max_window_chars)
+        self.text = ''
+        self.buffer = ''
+        self.released = ''
+        self.replacement = None
+        self.retraction_sent = False
+        self.windows = 0
+        # (text checked, text released once it passed, future of the check) in stream order
+        self.pending = deque()
+        self.started = time.perf_counter()
+        self._record('streams')
+
+    def push(self, text: str) -> str:
+        """Adds the text of a streamed token, returns the text cleared since the last call."""
+        if self.replacement is None and text:
+            self.text += text
+            self.buffer += text
+            window = self._cut_window()
+            while window:
+                self._check(window, window)
+                window = self._cut_window()
+        return self.release()
+
+    def _cut_window(self) -> str:
+        if len(self.buffer) < self.min_window_chars:
+            return ''
+        # the first sentence that ends past min_window_chars, the sooner a window is checked the sooner it is released
+        match = SENTENCE_END.search(self.buffer, self.min_window_chars - 1)
+        end = match.end() if match and match.end() <= self.max_window_chars else 0
+        if not end:
+            if len(self.buffer) < self.max_window_chars:
+                return ''
+            end = self.buffer.rfind(' ', 0, self.max_window_chars) + 1 or self.max_window_chars
+        window, self.buffer = self.buffer[:end], self.buffer[end:]
+        return window
+
+    def _check(self, checked: str, released: str):
+        self.windows += 1
+        self._record('windows')
+        future = ContentSafetyChecker.get_executor().submit(self.checker.validate_output_and_replace_if_harmful,
+                                                            checked)
+        self.pending.append((checked, released, future))
+
+    def release(self) -> str:
+        """Returns the text of the windows whose checks finished and passed, in order, without waiting."""
+        released = ''
+        while self.pending and self.pending[0][2].done():
+            checked, text, future = self.pending.popleft()
+            # errors of a check are raised here, the stream fails closed
+            filtered = future.result()
+            if filtered != checked:
+                self._flag(filtered)
+                break
+            released += text
+        if released:
+            if not self.released:
+                self._record('released_streams')
+                self._record('first_release_seconds_total', time.perf_counter() - self.started)
+            self.released += released
+        return released
+
+    def _flag(self, replacement: str):
+        self.replacement = replacement
+        for _, _, future in self.pending:
+            future.cancel()
+        self.pending.clear()
+        self._record('flagged')
+        if self.released:
+            self._record('retracted')
+
+    def _finish(self):
+        if self.replacement is None:
+            if self.buffer:
+                self._check(self.buffer, self.buffer)
+                self.buffer = ''
+            if self.windows > 1:
+                self._check(self.text, '')
+
+    def close(self) -> str:
+        """Checks the rest of the answer and the whole answer, returns the text cleared since the last call."""
+        self._finish()
+        wait([future for _, _, future in self.pending])
+        return self.release()
+
+    async def aclose(self) -> str:
+        """close without blocking the event loop."""
+        self._finish()
+        await asyncio.gather(*[asyncio.wrap_future(future) for _, _, future in self.pending],
+                             return_exceptions=True)
+        return self.release()
+
+    def get_retraction(self):
+        """The replacement of the answer once a window failed, returned a single time."""
+        if self.replacement is None or self.retraction_sent:
+            return None
+        self.retraction_sent = True
+        return self.replacement
+
+    @classmethod
+    def _record(cls, key: str, value=1):
+        with cls._lock:
+            cls._stats[key] += value
+
+    @classmethod
+    def get_stats(cls) -> dict:
+        with cls._lock:
+            stats = dict(cls._stats)
+        stats['avg_first_release_seconds'] = stats['first_release_seconds_total'] / stats['released_streams'] \
+            if stats['released_streams'] else 0.0
+        return stats
+
+
 class ContentSafetyChecker(AnswerProcessingBase):
+    _executor = None
+    _executor_lock = threading.Lock()
+
     def __init__(self):
         env_helper = EnvHelper()
         self.content_safety_client = ContentSafetyClient(env_helper.AZURE_CONTENT_SAFETY_ENDPOINT, AzureKeyCredential(env_helper.AZURE_CONTENT_SAFETY_KEY))
@@ -21,6 +187,24 @@ class ContentSafetyChecker(AnswerProcessingBase):
         response_template = f"Unfortunately, I am not able to process your question, as I have detected sensitive content that I am not allowed to process. This might be a mistake, so please try rephrasing your question."
         return self.process_answer(Answer(question="", answer=text, source_documents=[]), response_template=response_template).answer
         
+    @classmethod
+    def get_executor(cls) -> ThreadPoolExecutor:
+        if cls._executor is None:
+            with cls._executor_lock:
+                if cls._executor is None:
+                    cls._executor = ThreadPoolExecutor(max_workers=EnvHelper().CONTENT_SAFETY_MAX_WORKERS,
+                                                       thread_name_prefix='content-safety')
+        return cls._executor
+
+    def start_input_check(self, text) -> PendingInputCheck:
+        """Runs validate_input_and_replace_if_harmful in the background while the message is being answered."""
+        return PendingInputCheck(self.get_executor().submit(self.validate_input_and_replace_if_harmful, text), text)
+
+    def moderate_stream(self) -> StreamModerator:
+        """A StreamModerator for a streamed answer, its windows are checked with validate_output_and_replace_if_harmful."""
+        env_helper = EnvHelper()
+        return StreamModerator(self, env_helper.CONTENT_SAFETY_WINDOW_MIN_CHARS, env_helper.CONTENT_SAFETY_WINDOW_MAX_CHARS)
+
     def validate_output_and_replace_if_harmful(self, text):
         response_template = f"Unfortunately, I have detected sensitive content in my answer, which I am not allowed to show you. This might be a mistake, so please try again and maybe rephrase your question."
         return self.process_answer(Answer(question="", answer=text, source_documents=[]), response_template=response_template).answer
@@ -6,16 +6,16 @@ from ..helpers.LLMHelper import LLMHelper
 from ..helpers.ConfigHelper import ConfigHelper
 
 class PostPromptTool():
-    def __init__(self) -> None:
-        pass
+    def __init__(self, config=None) -> None:
+        self.config = config if config else ConfigHelper.get_active_config_or_default()
+        self.post_answering_prompt = PromptTemplate(template=self.config.prompts.post_answering_prompt, input_variables=["question", "answer", "sources"])
+        self.llm_helper = LLMHelper()
     
     def validate_answer(self, answer: Answer) -> dict:        
-        config = ConfigHelper.get_active_config_or_default()
-        llm_helper = LLMHelper()
+        config = self.config
         
         was_message_filtered = False
-        post_answering_prompt = PromptTemplate(template=config.prompts.post_answering_prompt, input_variables=["question", "answer", "sources"])
-        post_answering_chain = LLMChain(llm=llm_helper.get_llm(), prompt=post_answering_prompt, output_key="correct", verbose=True)
+        post_answering_chain = LLMChain(llm=self.llm_helper.get_llm(), prompt=self.post_answering_prompt, output_key="correct", verbose=True)
 
         sources = '\n'.join([f"[doc{i+1}]: {source.content}" for i, source in enumerate(answer.source_documents)])
     
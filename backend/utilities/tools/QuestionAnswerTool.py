@@ -13,15 +13,15 @@ from ..common.SourceDocument import SourceDocument
 
 
 class QuestionAnswerTool(AnsweringToolBase):
-    def __init__(self) -> None:
+    def __init__(self, config=None) -> None:
         self.name = "QuestionAnswer"
         self.vector_store = AzureSearchHelper().get_vector_store()
         self.verbose = True
+        self.config = config if config else ConfigHelper.get_active_config_or_default()
+        self.answering_prompt = PromptTemplate(template=self.config.prompts.answering_prompt, input_variables=["question", "sources"])
+        self.llm_helper = LLMHelper()
     
     def answer_question(self, question: str, chat_history: List[dict], **kwargs: dict):
-        config = ConfigHelper.get_active_config_or_default()
-        answering_prompt = PromptTemplate(template=config.prompts.answering_prompt, input_variables=["question", "sources"])
-        llm_helper = LLMHelper()
         # Retrieve documents as sources
         try:
             sources = self.vector_store.similarity_search(query=question, k=4, search_type="hybrid")
@@ -44,7 +44,7 @@ class QuestionAnswerTool(AnsweringToolBase):
         #     sources = self.vector_store.similarity_search(query=question, k=4, search_type="hybrid")
         
         # Generate answer from sources
-        answer_generator = LLMChain(llm=llm_helper.get_llm(), prompt=answering_prompt, verbose=self.verbose)
+        answer_generator = LLMChain(llm=self.llm_helper.get_llm(), prompt=self.answering_prompt, verbose=self.verbose)
         _start = 0
         if 'employee_data' in kwargs:
             _start = 1
@@ -57,6 +57,9 @@ class QuestionAnswerTool(AnsweringToolBase):
             source_documents = [SourceDocument(content=content, source='Employee Data')]
 
         # print(f"Question to LLM: {question}")
+        # the input may still be checked for harmful content, the answer is only generated once it passed
+        if 'before_answer' in kwargs:
+            kwargs['before_answer']()
         with get_openai_callback() as cb:
             result = answer_generator({"question": question, "sources": sources_text})
             
@@ -7,17 +7,17 @@ from ..common.Answer import Answer
 class TextProcessingTool(AnsweringToolBase):
     def __init__(self) -> None:
         self.name = "TextProcessing"
+        self.llm_helper = LLMHelper()
     
     def answer_question(self, question: str, chat_history: List[dict], **kwargs: dict):
         
-        llm_helper = LLMHelper()
         text = kwargs.get('text')
         operation = kwargs.get('operation')
         user_content = f"{operation} the following TEXT: {text}" if question == "" else question
         
         system_message = """You are an AI assistant for the user."""
 
-        result = llm_helper.get_chat_completion(
+        result = self.llm_helper.get_chat_completion(
                    [{"role": "system", "content": system_message}, 
                     {"role": "user", "content": user_content},]
                    )
@@ -0,0 +1,74 @@
+"""
+Per-request cost of the keyword gates app.py runs before searching employee data
+(is_manager_personal_info, is_user and the USER_DETAILS_KEYS check).
+
+"before" recompiles the alternation regex on every find_in_value call, as the gates did originally,
+"after" scans the search words once per gate with the prebuilt patterns from word_search.
+Run from the repository root:
+
+    python -m benchmarks.bench_gates [--number 2000]
+"""
+import argparse
+import re
+import timeit
+
+from backend.utilities.employee_data.word_search import is_manager_personal_info, is_user, is_user_details
+from eds_util import USER_DETAILS_KEYS, EXCLUSION_KEYS_1, EXCLUSION_KEYS_2, USER_KEYS_1, USER_KEYS_2
+
+QUESTIONS = [
+    'What is plan 1?',
+    'What is my pto plan?',
+    'What is my pto balance?',
+    'Am I eligible to purchase pto?',
+    'Find my manager details',
+    'I want to talk to hr',
+    "What is my manager's time-off balance?",
+    'How often I get paid?',
+    'What is the parental leave policy at Best Buy?',
+    'What is my home address on records?',
+]
+
+
+def legacy_find_in_value(_search_words, value):
+    _search_words_boundary = [fr'\b{w}\b' for w in _search_words]
+    r_str = fr"{'|'.join(_search_words_boundary)}"
+    r = re.compile(r_str, flags=re.I | re.X)
+    return r.findall(str(value))
+
+
+def legacy_gates(query):
+    _search_words = [w.strip().lower() for w in query.split()]
+    is_manager = len(legacy_find_in_value(EXCLUSION_KEYS_1, _search_words)) > 1 and len(
+        legacy_find_in_value(EXCLUSION_KEYS_2, _search_words)) > 0
+    user = len(legacy_find_in_value(USER_KEYS_1, _search_words)) > 0 or any(
+        key.lower() in query.lower() for key in USER_KEYS_2)
+    details = len(legacy_find_in_value(USER_DETAILS_KEYS, _search_words)) > 0
+    return is_manager, user, details
+
+
+def gates(query):
+    _search_words = [w.strip().lower() for w in query.split()]
+    return is_manager_personal_info(_search_words), is_user(query, _search_words), is_user_details(_search_words)
+
+
+def run(number):
+    for question in QUESTIONS:
+        assert legacy_gates(question) == gates(question), question
+
+    # re keeps the last 512 compiled patterns, so the legacy gates are measured with that cache warm and purged
+    requests_count = number * len(QUESTIONS)
+    results = {
+        'before (re cache warm)': timeit.timeit(lambda: [legacy_gates(q) for q in QUESTIONS], number=number),
+        'before (re cache purged)': timeit.timeit(lambda: [(re.purge(), legacy_gates(q)) for q in QUESTIONS],
+                                                  number=number),
+        'after': timeit.timeit(lambda: [gates(q) for q in QUESTIONS], number=number),
+    }
+    print(f'{"gates":<28}{"us/request":>12}')
+    for name, seconds in results.items():
+        print(f'{name:<28}{seconds / requests_count * 1e6:>12.2f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--number', type=int, default=2000, help='iterations over the question set')
+    run(parser.parse_args().number)
@@ -0,0 +1,102 @@
+"""
+Latency per message of LangChainAgent with the input content safety check inline, before any other work, and in
+parallel with the routing, the search and the prompt assembly (CONTENT_SAFETY_PARALLEL_INPUT). The content safety
+call, the search, the agent LLM and the answer generation are stubbed with fixed latencies. Plain questions take
+the fast path to the answering tool, follow ups go through the agent LLM hop, which waits for the check, so only
+plain questions gain from the parallel check. A flagged input must not reach an LLM in either mode.
+Run from the repository root:
+
+    python -m benchmarks.bench_input_safety [--messages 10] [--safety-ms 150] [--search-ms 150] [--llm-ms 300]
+"""
+import argparse
+import logging
+import time
+
+from langchain.llms.fake import FakeListLLM
+
+from backend.utilities.common.Answer import Answer
+from backend.utilities.helpers.ConfigHelper import ConfigHelper
+from backend.utilities.orchestrator.LangChainAgent import LangChainAgent
+from backend.utilities.tools.ContentSafetyChecker import ContentSafetyChecker
+
+HISTORY = [("How many vacation days do I get?", "Full time employees get 20 vacation days a year.")]
+CASES = [
+    ("plain question", "What is the parental leave policy?", []),
+    ("follow up", "And how many of them can I carry over?", HISTORY),
+    ("flagged", "What if I hate my manager?", []),
+]
+
+
+class SlowFakeLLM(FakeListLLM):
+    latency: float = 0.0
+
+    def _call(self, *args, **kwargs) -> str:
+        time.sleep(self.latency)
+        return super()._call(*args, **kwargs)
+
+
+class SlowContentSafetyChecker(ContentSafetyChecker):
+    def __init__(self, latency):
+        self.latency = latency
+
+    def _filter_text_and_replace(self, text, response_template):
+        time.sleep(self.latency)
+        return response_template if 'hate' in text else text
+
+
+class SlowQuestionAnswerTool:
+    def __init__(self, search_latency, llm_latency):
+        self.search_latency = search_latency
+        self.llm_latency = llm_latency
+        self.answers = 0
+
+    def answer_question(self, question, chat_history, **kwargs):
+        time.sleep(self.search_latency)
+        if 'before_answer' in kwargs:
+            kwargs['before_answer']()
+        time.sleep(self.llm_latency)
+        self.answers += 1
+        return Answer(question=question, answer="You get 12 weeks of paid parental leave.")
+
+
+def time_messages(agent, messages, user_message, chat_history):
+    start = time.perf_counter()
+    for _ in range(messages):
+        agent.handle_message(user_message, chat_history, conversation_id=None)
+    return (time.perf_counter() - start) / messages * 1e3
+
+
+def run(messages, safety_ms, search_ms, llm_ms):
+    config = ConfigHelper.get_active_config_or_default()
+    config.prompts.enable_content_safety = True
+    config.prompts.enable_post_answering_prompt = False
+    agent = LangChainAgent(config)
+    agent.intent_router.enabled = True
+    agent.agent_executor.agent.llm_chain.llm = SlowFakeLLM(
+        responses=["Action: Question Answering\nAction Input: How many vacation days can I carry over?"],
+        latency=llm_ms / 1e3)
+    agent.content_safety_checker = SlowContentSafetyChecker(safety_ms / 1e3)
+    tool = SlowQuestionAnswerTool(search_ms / 1e3, llm_ms / 1e3)
+    agent.question_answer_tool = tool
+
+    print(f'{"message":<16}{"inline ms":>11}{"parallel ms":>13}{"saved ms":>10}{"answers":>9}')
+    for name, user_message, chat_history in CASES:
+        results = []
+        for parallel in (False, True):
+            agent.parallel_input_check = parallel
+            answers = tool.answers
+            results.append((time_messages(agent, messages, user_message, chat_history), tool.answers - answers))
+        (inline_ms, inline_answers), (parallel_ms, parallel_answers) = results
+        print(f'{name:<16}{inline_ms:>11.1f}{parallel_ms:>13.1f}{inline_ms - parallel_ms:>10.1f}'
+              f'{f"{inline_answers}/{parallel_answers}":>9}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=10)
+    parser.add_argument('--safety-ms', type=int, default=150, help='latency of the content safety call')
+    parser.add_argument('--search-ms', type=int, default=150, help='latency of the search')
+    parser.add_argument('--llm-ms', type=int, default=300, help='latency of each LLM call')
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    run(args.messages, args.safety_ms, args.search_ms, args.llm_ms)
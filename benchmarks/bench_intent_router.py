@@ -0,0 +1,91 @@
+"""
+Latency per message of LangChainAgent with the local IntentRouter off and on, over a mix of plain questions, text
+operations and follow ups. The agent LLM and the answering tool are stubbed with the same fixed latency standing
+for an LLM call, so what the router saves is the agent LLM hop of the messages it sends straight to the tool.
+Content safety is turned off, it calls Azure. Run from the repository root:
+
+    python -m benchmarks.bench_intent_router [--messages 40] [--llm-ms 200]
+"""
+import argparse
+import logging
+import time
+
+from langchain.llms.fake import FakeListLLM
+
+from backend.utilities.common.Answer import Answer
+from backend.utilities.helpers.ConfigHelper import ConfigHelper
+from backend.utilities.orchestrator.IntentRouter import IntentRouter
+from backend.utilities.orchestrator.LangChainAgent import LangChainAgent
+
+HISTORY = [("How many vacation days do I get?", "Full time employees get 20 vacation days a year.")]
+# (message, has chat history)
+MESSAGES = [
+    ("What is the parental leave policy?", False),
+    ("How do I enroll in the 401k plan?", False),
+    ("When are the paychecks deposited?", False),
+    ("Where can I find my W-2 form?", False),
+    ("Who approves my time off requests?", False),
+    ("Can I work remotely on Fridays?", True),
+    ("Is the office open on public holidays?", True),
+    ("Translate the answer to Spanish", True),
+    ("And how many of them can I carry over?", True),
+    ("Thanks", False),
+]
+
+
+class SlowFakeLLM(FakeListLLM):
+    latency: float = 0.0
+
+    def _call(self, *args, **kwargs) -> str:
+        time.sleep(self.latency)
+        return super()._call(*args, **kwargs)
+
+
+class SlowQuestionAnswerTool:
+    def __init__(self, latency):
+        self.latency = latency
+
+    def answer_question(self, question, chat_history, **kwargs):
+        time.sleep(self.latency)
+        return Answer(question=question, answer="You get 12 weeks of paid parental leave.")
+
+
+def time_messages(agent, messages):
+    start = time.perf_counter()
+    for i in range(messages):
+        user_message, with_history = MESSAGES[i % len(MESSAGES)]
+        agent.handle_message(user_message, HISTORY if with_history else [], conversation_id=None)
+    return (time.perf_counter() - start) / messages * 1e3
+
+
+def run(messages, llm_ms):
+    config = ConfigHelper.get_active_config_or_default()
+    config.prompts.enable_content_safety = False
+    config.prompts.enable_post_answering_prompt = False
+    agent = LangChainAgent(config)
+    agent.agent_executor.agent.llm_chain.llm = SlowFakeLLM(
+        responses=["Action: Question Answering\nAction Input: What is the parental leave policy?"],
+        latency=llm_ms / 1e3)
+    agent.question_answer_tool = SlowQuestionAnswerTool(llm_ms / 1e3)
+
+    agent.intent_router.enabled = False
+    off_ms = time_messages(agent, messages)
+    agent.intent_router.enabled = True
+    on_ms = time_messages(agent, messages)
+    stats = IntentRouter.get_stats()
+    print(f'{"router":<10}{"ms/message":>11}')
+    print(f'{"off":<10}{off_ms:>11.1f}')
+    print(f'{"on":<10}{on_ms:>11.1f}')
+    print(f'{stats["fast_path"]}/{messages} messages on the fast path, {off_ms / on_ms:.2f}x faster, '
+          f'saved {stats["saved_seconds_estimated"]:.1f}s estimated from '
+          f'{stats["avg_llm_hop_seconds"] * 1e3:.0f} ms LLM hops')
+    print('reasons', stats['reasons'])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=40)
+    parser.add_argument('--llm-ms', type=int, default=200, help='latency of each stubbed LLM call')
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    run(args.messages, args.llm_ms)
@@ -0,0 +1,62 @@
+"""
+Time per call of the JSON framing of the chat endpoints: the former json.dumps(...).replace("\\n", "\\\\n") path
+against the single-pass to_line of every JsonHelper serializer, on the events a streamed answer is made of.
+Each serializer's output is parsed back and compared with the payload before timing.
+Run from the repository root:
+
+    python -m benchmarks.bench_json [--tokens 500] [--number 2000]
+"""
+import argparse
+import json
+import timeit
+
+from backend.utilities.helpers.JsonHelper import SERIALIZERS
+from backend.utilities.helpers.StreamingHelper import new_data_stream_response
+from benchmarks.bench_streaming import CITATIONS_SIZE, TOKEN, get_data_lines
+
+
+def legacy_to_chunk(obj):
+    return json.dumps(obj).replace("\n", "\\n") + "\n"
+
+
+def get_payloads(tokens):
+    citations = json.dumps({"citations": [{"content": 'x\n' * (CITATIONS_SIZE // 2), "title": "Policy"}]})
+    snapshot = new_data_stream_response()
+    snapshot["choices"][0]["messages"] = [{"role": "tool", "content": citations},
+                                          {"role": "assistant", "content": TOKEN * tokens}]
+    return {
+        'delta event': {"delta": {"index": 1, "content": TOKEN}},
+        'static answer': {"id": "e7d687d1", "model": "gpt-35-turbo-16k", "created": 1698938071,
+                          "object": "chat.completion.chunk", "choices": [{"messages": [
+                              {"role": "assistant", "content": "As per the available data, PTO balance is 8 \n\n"}]}]},
+        f'snapshot {tokens} tokens': snapshot,
+    }
+
+
+def run(tokens, number):
+    serializers = {name: serializer_class() for name, serializer_class in SERIALIZERS.items()}
+    print(f'{"payload":<22}{"bytes":>8}{"serializer":>12}{"us/call":>10}{"speedup":>9}')
+    for payload_name, payload in get_payloads(tokens).items():
+        legacy_us = timeit.timeit(lambda: legacy_to_chunk(payload), number=number) / number * 1e6
+        print(f'{payload_name:<22}{len(legacy_to_chunk(payload)):>8}{"legacy":>12}{legacy_us:>10.2f}{1:>9.1f}')
+        for name, serializer in serializers.items():
+            line = serializer.to_line(payload)
+            assert line.count("\n") == 1 and line.endswith("\n") and json.loads(line) == payload, name
+            us = timeit.timeit(lambda: serializer.to_line(payload), number=number) / number * 1e6
+            print(f'{payload_name:<22}{len(line.encode("utf-8")):>8}{name:>12}{us:>10.2f}{legacy_us / us:>9.1f}')
+
+    line = get_data_lines(1)[-2].lstrip(b'data:')
+    legacy_us = timeit.timeit(lambda: json.loads(line.decode('utf-8')), number=number) / number * 1e6
+    print(f'{"upstream line parse":<22}{len(line):>8}{"legacy":>12}{legacy_us:>10.2f}{1:>9.1f}')
+    for name, serializer in serializers.items():
+        assert serializer.loads(line) == json.loads(line), name
+        us = timeit.timeit(lambda: serializer.loads(line), number=number) / number * 1e6
+        print(f'{"upstream line parse":<22}{len(line):>8}{name:>12}{us:>10.2f}{legacy_us / us:>9.1f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tokens', type=int, default=500, help='tokens of the answer in the snapshot event')
+    parser.add_argument('--number', type=int, default=2000, help='calls per measurement')
+    args = parser.parse_args()
+    run(args.tokens, args.number)
@@ -0,0 +1,76 @@
+"""
+Orchestration overhead per message of LangChainAgent with the LLM stubbed out: the former path, which built the
+prompt, LLMChain, ZeroShotAgent, AgentExecutor, LLMHelper and AzureChatOpenAI client for every message, against
+the agent executor compiled once per orchestrator and only the memory built per message. The stub answers right
+away, so what is measured is everything around the model call. Content safety is turned off, it calls Azure.
+Run from the repository root:
+
+    python -m benchmarks.bench_orchestration [--messages 200] [--turns 5]
+"""
+import argparse
+import logging
+import time
+
+from langchain.llms.fake import FakeListLLM
+
+from backend.utilities.helpers.ConfigHelper import ConfigHelper
+from backend.utilities.helpers.LLMHelper import LLMHelper
+from backend.utilities.orchestrator.LangChainAgent import LangChainAgent
+
+STUB_ANSWER = "Final Answer: You get 12 weeks of paid parental leave."
+
+
+class PerMessageAgent(LangChainAgent):
+    """What orchestrate did before the executor was reused: a new LLMHelper, client and executor per message."""
+    stub_llm = None
+
+    @property
+    def agent_executor(self):
+        LLMHelper()
+        executor = self.create_agent_executor()
+        if self.stub_llm:
+            executor.agent.llm_chain.llm = self.stub_llm
+        return executor
+
+    @agent_executor.setter
+    def agent_executor(self, value):
+        pass
+
+
+def time_messages(agent, messages, user_message, chat_history):
+    start = time.perf_counter()
+    for _ in range(messages):
+        answer = agent.handle_message(user_message, chat_history, conversation_id=None)
+    return (time.perf_counter() - start) / messages * 1e3, answer
+
+
+def run(messages, turns):
+    config = ConfigHelper.get_active_config_or_default()
+    config.prompts.enable_content_safety = False
+    stub_llm = FakeListLLM(responses=[STUB_ANSWER])
+    agent = LangChainAgent(config)
+    agent.agent_executor.agent.llm_chain.llm = stub_llm
+    legacy_agent = PerMessageAgent(config)
+    legacy_agent.stub_llm = stub_llm
+    chat_history = [(f"Question {i} about the leave policy?", f"Answer {i} about the leave policy.")
+                    for i in range(turns)]
+    user_message = "How much parental leave do I get?"
+
+    time_messages(agent, 5, user_message, chat_history)
+    time_messages(legacy_agent, 5, user_message, chat_history)
+    legacy_ms, legacy_answer = time_messages(legacy_agent, messages, user_message, chat_history)
+    reused_ms, answer = time_messages(agent, messages, user_message, chat_history)
+    assert answer == legacy_answer, (answer, legacy_answer)
+    print(f'{"path":<28}{"ms/message":>11}')
+    print(f'{"built per message":<28}{legacy_ms:>11.2f}')
+    print(f'{"executor reused":<28}{reused_ms:>11.2f}')
+    print(f'{legacy_ms / reused_ms:.1f}x less overhead, {turns} turns of history')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=200)
+    parser.add_argument('--turns', type=int, default=5, help='turns of chat history per message')
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    run(args.messages, args.turns)
@@ -0,0 +1,48 @@
+"""
+Conversation tokens a prompt carries turn after turn, the whole chat history against the history fitted by
+PromptBudgetHelper, and the summaries it had to make. The summarizer is stubbed with a fixed size summary, no
+model is called; tokens are counted with tiktoken, estimated when its encoding cannot be downloaded.
+Run from the repository root:
+
+    python -m benchmarks.bench_prompt_budget [--turns 40] [--budget 2000] [--fold-turns 4]
+"""
+import argparse
+import time
+
+from backend.utilities.helpers.PromptBudgetHelper import PromptBudgetHelper
+
+QUESTION = "How many days of parental leave do I get, and does it change if I work part time? "
+ANSWER = "Full time employees get 12 weeks of paid parental leave, part time employees get it pro rata. " * 4
+
+
+def run(turns, budget, fold_turns):
+    summaries = []
+
+    def summarize(previous_summary, folded):
+        summaries.append(len(folded))
+        return "The user asked about parental leave and the assistant explained the policy. " * 3
+
+    helper = PromptBudgetHelper(max_history_tokens=budget, fold_turns=fold_turns, summarizer=summarize)
+    unlimited = PromptBudgetHelper(max_history_tokens=0)
+    chat_history = []
+    print(f'{"turn":>5}{"full tokens":>13}{"fitted tokens":>15}{"kept turns":>12}{"summaries":>11}{"fit ms":>8}')
+    for turn in range(1, turns + 1):
+        question = f"{QUESTION}({turn})"
+        full = unlimited.fit(chat_history, question)
+        start = time.perf_counter()
+        fitted = helper.fit(chat_history, question)
+        fit_ms = (time.perf_counter() - start) * 1e3
+        if turn in (1, 5, 10, 20, 40) or turn == turns:
+            print(f'{turn:>5}{full.prompt_tokens:>13}{fitted.prompt_tokens:>15}{len(fitted.chat_history):>12}'
+                  f'{len(summaries):>11}{fit_ms:>8.2f}')
+        chat_history.append((question, f"{ANSWER}({turn})"))
+    print(f'{sum(summaries)} turns summarized in {len(summaries)} summaries')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--turns', type=int, default=40)
+    parser.add_argument('--budget', type=int, default=2000, help='PROMPT_HISTORY_MAX_TOKENS')
+    parser.add_argument('--fold-turns', type=int, default=4, help='PROMPT_SUMMARY_FOLD_TURNS')
+    args = parser.parse_args()
+    run(args.turns, args.budget, args.fold_turns)
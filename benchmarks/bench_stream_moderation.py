@@ -0,0 +1,77 @@
+"""
+Time to first token and to the last token a client gets from a moderated stream: the answer checked whole once
+generated, as validate_output_and_replace_if_harmful needs, against StreamModerator releasing it in sentence windows
+while it is generated. Tokens arrive at a fixed pace and the content safety call is stubbed with a fixed latency.
+Run from the repository root:
+
+    python -m benchmarks.bench_stream_moderation [--sentences 8] [--token-ms 20] [--safety-ms 150]
+"""
+import argparse
+import time
+
+from backend.utilities.tools.ContentSafetyChecker import ContentSafetyChecker, StreamModerator
+
+SENTENCE = "Full time employees get twelve weeks of paid parental leave after one year of service. "
+
+
+class SlowContentSafetyChecker(ContentSafetyChecker):
+    def __init__(self, latency):
+        self.latency = latency
+        self.calls = 0
+
+    def _filter_text_and_replace(self, text, response_template):
+        self.calls += 1
+        time.sleep(self.latency)
+        return response_template if 'hate' in text else text
+
+
+def iter_tokens(sentences, token_ms, flagged_sentence=None):
+    for i in range(sentences):
+        sentence = "I hate this policy and everyone who wrote it. " if i == flagged_sentence else SENTENCE
+        for word in sentence.split(' ')[:-1]:
+            time.sleep(token_ms / 1e3)
+            yield word + ' '
+
+
+def run_whole(checker, tokens):
+    start = time.perf_counter()
+    answer = ''.join(tokens)
+    released = checker.validate_output_and_replace_if_harmful(answer)
+    elapsed = time.perf_counter() - start
+    return elapsed, elapsed, released == answer
+
+
+def run_windows(checker, tokens, min_window_chars):
+    start = time.perf_counter()
+    moderator = StreamModerator(checker, min_window_chars=min_window_chars)
+    first = None
+    for token in tokens:
+        if moderator.push(token) and first is None:
+            first = time.perf_counter() - start
+    if moderator.close() and first is None:
+        first = time.perf_counter() - start
+    return first, time.perf_counter() - start, moderator.get_retraction() is None
+
+
+def run(sentences, token_ms, safety_ms, min_window_chars):
+    print(f'{"answer":<9}{"mode":<18}{"first token ms":>15}{"last token ms":>15}{"checks":>8}{"passed":>8}')
+    for name, flagged_sentence in (("clean", None), ("flagged", sentences // 2)):
+        for mode in ("whole answer", "sentence windows"):
+            checker = SlowContentSafetyChecker(safety_ms / 1e3)
+            tokens = iter_tokens(sentences, token_ms, flagged_sentence)
+            if mode == "whole answer":
+                first, last, passed = run_whole(checker, tokens)
+            else:
+                first, last, passed = run_windows(checker, tokens, min_window_chars)
+            first = f'{first * 1e3:.0f}' if first is not None else '-'
+            print(f'{name:<9}{mode:<18}{first:>15}{last * 1e3:>15.0f}{checker.calls:>8}{str(passed):>8}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sentences', type=int, default=8)
+    parser.add_argument('--token-ms', type=int, default=20, help='pace of the generated tokens, one per word')
+    parser.add_argument('--safety-ms', type=int, default=150, help='latency of the content safety call')
+    parser.add_argument('--min-window-chars', type=int, default=100, help='CONTENT_SAFETY_WINDOW_MIN_CHARS')
+    args = parser.parse_args()
+    run(args.sentences, args.token_ms, args.safety_ms, args.min_window_chars)
@@ -0,0 +1,100 @@
+"""
+Bytes on the wire and server CPU per streamed answer, for the default stream (the whole response so far on
+every event) and the delta stream negotiated with the `X-Stream-Mode: delta` request header.
+
+Upstream events are generated in memory, so only the framing done by the server is measured, for the
+"on your data" stream (stream_with_data, with a citations tool message) and the plain chat stream
+(stream_without_data). Every delta stream is also replayed to check that it rebuilds the same final response.
+Run from the repository root:
+
+    python -m benchmarks.bench_streaming [--tokens 100 500 2000] [--number 5]
+"""
+import argparse
+import json
+import time
+
+from backend.utilities.helpers.StreamingHelper import to_chunk, new_data_stream_response, iter_data_stream_chunks, \
+    format_without_data_chunk, get_without_data_response
+
+TOKEN = ' word'
+CITATIONS_SIZE = 8000
+
+
+def get_data_lines(tokens):
+    meta = {"id": "chatcmpl-1", "model": "gpt-35-turbo", "created": 1698938071, "object": "chat.completion.chunk"}
+    citations = json.dumps({"citations": [{"content": 'x' * CITATIONS_SIZE, "title": "Policy"}], "intent": "[]"})
+    deltas = [{"role": "tool", "content": citations}, {"role": "assistant"}]
+    deltas += [{"content": TOKEN} for _ in range(tokens)] + [{"content": "[DONE]"}]
+    return [b'data: ' + json.dumps({**meta, "choices": [{"messages": [{"delta": d}]}]}).encode('utf-8')
+            for d in deltas]
+
+
+def get_without_data_lines(tokens):
+    meta = {"id": "chatcmpl-1", "model": "gpt-35-turbo", "created": 1698938071, "object": "chat.completion.chunk"}
+    deltas = [{"role": "assistant"}] + [{"content": TOKEN} for _ in range(tokens)] + [{}]
+    return [{**meta, "choices": [{"delta": d}]} for d in deltas]
+
+
+def stream_with_data(lines, delta):
+    response = new_data_stream_response()
+    for line in lines:
+        yield from iter_data_stream_chunks(line, response, delta=delta)
+    if delta:
+        yield to_chunk(response)
+
+
+def stream_without_data(lines, delta):
+    response_text = ""
+    for line in lines:
+        response_text, chunk = format_without_data_chunk(line, response_text, delta)
+        if chunk:
+            yield chunk
+    if delta:
+        yield to_chunk(get_without_data_response(lines[-1], response_text))
+
+
+def replay_deltas(chunks):
+    """Rebuilds the messages from the delta events, the way a client applies them."""
+    messages = []
+    for chunk in chunks[:-1]:
+        added = dict(json.loads(chunk)["delta"])
+        index = added.pop("index")
+        if "role" in added:
+            messages.insert(index, added)
+        else:
+            messages[index]["content"] += added["content"]
+    return messages
+
+
+def measure(stream, lines, delta, number):
+    chunks = list(stream(lines, delta))
+    start = time.process_time()
+    for _ in range(number):
+        for _ in stream(lines, delta):
+            pass
+    cpu_ms = (time.process_time() - start) / number * 1e3
+    return chunks, sum(len(c.encode('utf-8')) for c in chunks), cpu_ms
+
+
+def run(token_counts, number):
+    print(f'{"stream":<14}{"tokens":>8}{"mode":>10}{"events":>8}{"KiB":>12}{"cpu ms":>10}')
+    for name, stream, get_lines in (('with data', stream_with_data, get_data_lines),
+                                    ('without data', stream_without_data, get_without_data_lines)):
+        for tokens in token_counts:
+            lines = get_lines(tokens)
+            snapshot_chunks, snapshot_bytes, snapshot_ms = measure(stream, lines, False, number)
+            delta_chunks, delta_bytes, delta_ms = measure(stream, lines, True, number)
+            final = json.loads(snapshot_chunks[-1])
+            assert json.loads(delta_chunks[-1]) == final, name
+            assert replay_deltas(delta_chunks) == final["choices"][0]["messages"], name
+            for mode, chunks, size, cpu_ms in (('snapshot', snapshot_chunks, snapshot_bytes, snapshot_ms),
+                                               ('delta', delta_chunks, delta_bytes, delta_ms)):
+                print(f'{name:<14}{tokens:>8}{mode:>10}{len(chunks):>8}{size / 1024:>12.1f}{cpu_ms:>10.2f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tokens', type=int, nargs='+', default=[100, 500, 2000], help='tokens per answer')
+    parser.add_argument('--number', type=int, default=5, help='answers streamed per measurement')
+    args = parser.parse_args()
+    run(args.tokens, args.number)
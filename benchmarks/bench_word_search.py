@@ -0,0 +1,201 @@
+"""
+Latency, allocations and throughput of word_search.search_json, run against every employee in data/employee
+for the sample questions at the bottom of word_search.py and a generated corpus of keyword queries.
+
+Results are checked against the golden files in benchmarks/golden, so an optimization of dict_lookup or
+score_calculation is shown to be both faster and output-identical:
+
+    sample_questions.json   full result lists of the sample questions, per employee
+    corpus_digests.json     sha256 of the corpus result lists, per employee number
+    baseline_crashes.json   the queries the golden results could not be taken from the baseline for
+
+The golden results are those of the word_search of the baseline commit, before any optimization. The baseline
+raises AttributeError on the balance questions of employees without TLC data, e.g. 428569. For those queries,
+listed in baseline_crashes.json, the golden results are the ones of the current word_search. --update-golden
+writes the results of the current word_search, only use it for changes that are meant to change the results.
+
+The answer cache is turned off while measuring. Run from the repository root:
+
+    python -m benchmarks.bench_word_search [--corpus-size 10000] [--seed 0] [--update-golden]
+"""
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from backend.utilities.common.LRUCache import LRUCache
+from backend.utilities.employee_data import word_search
+from eds_util import PROJECT_ROOT_DIR, EMPLOYEE_DATA_DIR, TLC_DATA_FILE
+
+GOLDEN_DIR = f'{PROJECT_ROOT_DIR}/benchmarks/golden'
+SAMPLE_GOLDEN_FILE = f'{GOLDEN_DIR}/sample_questions.json'
+CORPUS_GOLDEN_FILE = f'{GOLDEN_DIR}/corpus_digests.json'
+
+# the sample questions of word_search.py
+QUESTIONS = [
+    'What is plan 1?',
+    'What is my pto plan?',
+    'What is my pto balance?',
+    'Am I eligible to purchase pto?',
+    'Find my manager details',
+    'I want to talk to hr',
+    'What is my employment status?',
+    'How often I get paid?',
+    'What is my pay schedule?',
+    'What is my home address on records?',
+]
+QUERY_PREFIXES = ['What is my', 'what is my', 'Am I', 'How much', 'Tell me my', 'Do I have', 'my', "What's my",
+                  'Who is my', 'When is my']
+QUERY_WORDS = ['what', 'is', 'my', 'am', 'i', 'the', 'how', 'many', 'do', 'have', 'when', 'who', 'time-off',
+               "who's", 'details', 'manager', 'balance', 'hours']
+
+
+def get_employee_numbers():
+    data_dir = f'{PROJECT_ROOT_DIR}/{EMPLOYEE_DATA_DIR}'
+    return sorted(f[:-len('.json')] for f in os.listdir(data_dir) if f.endswith('.json') and f != TLC_DATA_FILE)
+
+
+def get_config_keywords(config):
+    keywords = set()
+    for key_config in config.values():
+        if type(key_config) is dict:
+            keywords.update(key_config.get('keywords') or get_config_keywords(key_config))
+    return keywords
+
+
+def generate_corpus(size, seed=0):
+    """Keyword queries built from the employee config keywords, the same for a given config, size and seed."""
+    rnd = random.Random(seed)
+    keywords = sorted(get_config_keywords(word_search.keyword_index.refresh().config))
+    vocabulary = keywords + QUERY_WORDS
+    corpus = []
+    while len(corpus) < size:
+        form = rnd.randrange(3)
+        if form == 0:
+            query = f'{rnd.choice(QUERY_PREFIXES)} {" ".join(rnd.sample(keywords, rnd.randint(1, 2)))}?'
+        elif form == 1:
+            query = ' '.join(rnd.choice(vocabulary) for _ in range(rnd.randint(1, 6)))
+        else:
+            query = f'{rnd.choice(QUERY_PREFIXES)} {rnd.choice(keywords)} and {rnd.choice(vocabulary)}'
+        corpus.append(query)
+    return corpus
+
+
+def to_json(result):
+    return [dict(d) for d in result] if type(result) is list else result
+
+
+def get_digest(results):
+    data = json.dumps([to_json(r) for r in results], sort_keys=True, default=dict)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+def run_queries(queries, employee_numbers):
+    """Returns the results per employee and the latency of every search_json call in nanoseconds."""
+    results, latencies = {}, []
+    with contextlib.redirect_stdout(io.StringIO()) as out:
+        for employee_number in employee_numbers:
+            employee_results = results[employee_number] = []
+            for query in queries:
+                start = time.perf_counter_ns()
+                result = word_search.search_json(query, employee_number)
+                latencies.append(time.perf_counter_ns() - start)
+                employee_results.append(result)
+                out.seek(0)
+                out.truncate()
+    return results, np.array(latencies, dtype=np.int64)
+
+
+def measure_allocations(queries, employee_numbers):
+    """Returns the peak traced memory of every search_json call, in bytes."""
+    peaks = []
+    tracemalloc.start()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            for employee_number in employee_numbers:
+                for query in queries:
+                    current = tracemalloc.get_traced_memory()[0]
+                    tracemalloc.reset_peak()
+                    word_search.search_json(query, employee_number)
+                    peaks.append(tracemalloc.get_traced_memory()[1] - current)
+                    out.seek(0)
+                    out.truncate()
+    finally:
+        tracemalloc.stop()
+    return np.array(peaks, dtype=np.int64)
+
+
+def report(name, latencies, peaks=None):
+    total_seconds = latencies.sum() / 1e9
+    line = (f'{name:<10}{len(latencies):>10}{np.percentile(latencies, 50) / 1e3:>10.1f}'
+            f'{np.percentile(latencies, 99) / 1e3:>10.1f}{len(latencies) / total_seconds:>12.0f}')
+    if peaks is not None:
+        line += f'{peaks.mean() / 1024:>12.1f}{peaks.max() / 1024:>12.1f}'
+    print(line)
+
+
+def check_golden(file_path, actual, update):
+    if update or not os.path.exists(file_path):
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, 'w') as f_out:
+            json.dump(actual, f_out, indent=1, sort_keys=True, default=dict)
+        print(f'wrote {os.path.relpath(file_path, PROJECT_ROOT_DIR)}')
+        return True
+    with open(file_path) as f_in:
+        expected = json.load(f_in)
+    actual = json.loads(json.dumps(actual, sort_keys=True, default=dict))
+    mismatches = sorted(k for k in expected.keys() | actual.keys() if expected.get(k) != actual.get(k))
+    if mismatches:
+        print(f'{os.path.relpath(file_path, PROJECT_ROOT_DIR)}: results differ for {len(mismatches)} entries, '
+              f'e.g. {mismatches[:5]}')
+        return False
+    print(f'{os.path.relpath(file_path, PROJECT_ROOT_DIR)}: identical')
+    return True
+
+
+def run(corpus_size, seed, update_golden, skip_corpus=False):
+    word_search.answer_cache = LRUCache(0)
+    employee_numbers = get_employee_numbers()
+    print(f'{len(employee_numbers)} employees, {len(QUESTIONS)} sample questions, {corpus_size} corpus queries')
+    print(f'{"set":<10}{"calls":>10}{"p50 us":>10}{"p99 us":>10}{"queries/s":>12}{"mean KiB":>12}{"peak KiB":>12}')
+
+    sample_results, latencies = run_queries(QUESTIONS, employee_numbers)
+    report('sample', latencies, measure_allocations(QUESTIONS, employee_numbers))
+    golden = {f'{employee_number}|{question}': to_json(result)
+              for employee_number, results in sample_results.items()
+              for question, result in zip(QUESTIONS, results)}
+    is_identical = check_golden(SAMPLE_GOLDEN_FILE, golden, update_golden)
+
+    if not skip_corpus:
+        corpus = generate_corpus(corpus_size, seed)
+        corpus_results, latencies = run_queries(corpus, employee_numbers)
+        report('corpus', latencies)
+        digests = {'corpus_size': corpus_size, 'seed': seed,
+                   **{n: get_digest(results) for n, results in corpus_results.items()}}
+        if not update_golden and os.path.exists(CORPUS_GOLDEN_FILE):
+            with open(CORPUS_GOLDEN_FILE) as f_in:
+                golden_corpus = json.load(f_in)
+            if (golden_corpus['corpus_size'], golden_corpus['seed']) != (corpus_size, seed):
+                print(f'corpus golden file is for --corpus-size {golden_corpus["corpus_size"]} '
+                      f'--seed {golden_corpus["seed"]}, not checked')
+                return is_identical
+        is_identical = check_golden(CORPUS_GOLDEN_FILE, digests, update_golden) and is_identical
+    return is_identical
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus-size', type=int, default=10000, help='number of generated queries')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the generated queries')
+    parser.add_argument('--update-golden', action='store_true', help='write the golden files from this run')
+    parser.add_argument('--skip-corpus', action='store_true', help='only run the sample questions')
+    args = parser.parse_args()
+    sys.exit(0 if run(args.corpus_size, args.seed, args.update_golden, args.skip_corpus) else 1)
@@ -12,6 +12,15 @@ EXCLUSION_KEYS_1 = ["my", "manager's", "managers", "colleague's", "colleagues",
                     "co-workers", "coworkers", "all", "available", "best", "buy", "bestbuy"]
 EXCLUSION_KEYS_2 = ["pto", "balance", "timeoff", "time", "time-off", "off"]
 REPLACE_KEYS = {"time-off": "time off", "who's": "who is"}
+TLC_DATA_FILE = 'tlc_data.json'
+# Optional path of an mmap-backed snapshot of all employee records, see EmployeeStore.save_snapshot
+EMPLOYEE_STORE_SNAPSHOT = os.getenv('EMPLOYEE_STORE_SNAPSHOT', '')
+# Optional directory written by convert_employee_data, records and TLC balances are then read lazily from it
+EMPLOYEE_SHARD_DIR = os.getenv('EMPLOYEE_SHARD_DIR', '')
+EMPLOYEE_CACHE_SIZE = int(os.getenv('EMPLOYEE_CACHE_SIZE', 10000))
+# Cached search_json answers, ANSWER_CACHE_SIZE=0 turns the cache off
+ANSWER_CACHE_SIZE = int(os.getenv('ANSWER_CACHE_SIZE', 4096))
+ANSWER_CACHE_TTL = float(os.getenv('ANSWER_CACHE_TTL', 300))
 
 
 # _files = os.listdir(f'{PROJECT_ROOT_DIR}')
@@ -22,5 +31,8 @@ def get_json(file_path):
     return employee_dict
 
 
-employee_config = get_json(f'{PROJECT_ROOT_DIR}/{EMPLOYEE_CONFIG_DIR}/employee.json')
-tlc_data = get_json(f'{PROJECT_ROOT_DIR}/{EMPLOYEE_DATA_DIR}/tlc_data.json')
\ No newline at end of file
+def get_file_version(file_path):
+    # (mtime, size) changes whenever the file is rewritten, stat is much cheaper than re-reading the file
+    stat = os.stat(file_path)
+    return stat.st_mtime_ns, stat.st_size
+
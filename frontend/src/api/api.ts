@@ -7,7 +7,8 @@ export async function conversationApi(options: ConversationRequest, abortSignal:
             "Content-Type": "application/json"
         },
         body: JSON.stringify({
-            messages: options.messages
+            messages: options.messages,
+            conversation_id: options.id
         }),
         signal: abortSignal
     });